@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, session as flask_session, jsonify, flash
+from flask import Flask, render_template, request, redirect, url_for, session as flask_session, jsonify, flash, Response
 import pymysql
 import random
 import logging
@@ -14,8 +14,7 @@ from dotenv import load_dotenv
 from datetime import datetime
 from collections import defaultdict
 import uuid
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+import hmac
 
 from routes.combat import combat_bp
 from routes.map import map_bp
@@ -24,6 +23,13 @@ from routes.town import town_bp
 from routes.dungeon import dungeon_bp
 
 from utils.filters import chance_image
+from services.catalogue import get_catalogue, refresh_catalogue
+from services import random_pick, team_channel, instrumentation
+from services.tiles import viewport_tiles
+from services.movement import MOVE_PATH_MAX_STEPS
+from utils.http_clients import http_session, HTTP_TIMEOUT
+from utils.emails import send_verification_email  # registers the email task
+from services import jobs
 
 
 # Configure logging based on environment
@@ -111,6 +117,15 @@ app.register_blueprint(questions_bp)
 app.register_blueprint(town_bp)
 app.register_blueprint(dungeon_bp)
 
+# Per-request SQL stats, N+1 warnings and sampled profiling
+instrumentation.init_app(app)
+
+# Warm the reference-data catalogue so the first requests don't pay for it
+try:
+    get_catalogue()
+except Exception as e:
+    logging.warning(f"Catalogue warm-up failed, will load on first use: {e}")
+
 # Database connection function
 def get_db_connection():
 
@@ -137,27 +152,6 @@ def calculate_feature_counts(level, quest_id, base_trees=75, base_mountains=50):
 def is_valid_email(email):
     return re.match(r"[^@]+@[^@]+\.[^@]+", email)
 
-def send_verification_email(squire_email, squire_name, token):
-    try:
-        confirm_url = f"https://lawyersquest.proffaith.com/verify?token={token}"
-        message = Mail(
-            from_email='tim@faithatlaw.com',
-            to_emails=squire_email,
-            subject='🛡️ Confirm your registration for Lawyer’s Quest',
-            html_content=f"""
-            <p>Hail, noble {squire_name}!</p>
-            <p>Thank you for registering for <strong>Lawyer’s Quest</strong>.</p>
-            <p>Before you may embark on your legal adventure, you must confirm your email address.</p>
-            <p><a href="{confirm_url}">Click here to verify your account</a></p>
-            <hr>
-            <p>If you did not register for the game, please ignore this message.</p>
-            """
-        )
-        sg = SendGridAPIClient(os.environ.get('SENDGRID_API_KEY'))
-        sg.send(message)
-    except Exception as e:
-        logging.error(f"SendGrid email error: {e}")
-
 
 if __name__ == '__main__':
     app.run(port=5050)
@@ -210,6 +204,64 @@ def get_team_messages(team_id):
         for m in msgs
     ])
 
+@app.route("/team_messages/<int:team_id>/stream")
+def stream_team_messages(team_id):
+    """
+    Server-Sent Events stream of team messages. A reconnecting browser sends
+    Last-Event-ID (or ?last_id=) and first receives what it missed from the DB.
+    """
+    if not team_channel.streaming_enabled():
+        # 204 tells EventSource not to reconnect; the page falls back to polling
+        return Response(status=204)
+
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+
+    return Response(
+        team_channel.stream(team_id, last_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Polled by the browser for the result of a background job it started."""
+    job = jobs.get_job(job_id)
+    if not job or job["owner"] is None or job["owner"] != flask_session.get("squire_id"):
+        return jsonify({"error": "Job not found."}), 404
+
+    return jsonify({
+        "id":     job["id"],
+        "status": job["status"],
+        "result": job["result"],
+        "error":  job["error"]
+    })
+
+@app.route("/admin/refresh_catalogue", methods=["POST"])
+def admin_refresh_catalogue():
+    """
+    Reloads the catalogue and the random-pick id lists after content edits.
+    Requires the ADMIN_TOKEN env var, sent as the X-Admin-Token header.
+    """
+    admin_token = os.getenv("ADMIN_TOKEN")
+    supplied = request.headers.get("X-Admin-Token", "")
+    if not admin_token or not hmac.compare_digest(supplied, admin_token):
+        return jsonify({"error": "Forbidden"}), 403
+
+    catalogue = refresh_catalogue()
+    random_pick.invalidate()
+    return jsonify({
+        "enemies":      len(catalogue.enemies),
+        "shop_items":   len(catalogue.shop_items),
+        "wizard_items": len(catalogue.wizard_items),
+        "jobs":         len(catalogue.jobs),
+        "thresholds":   len(catalogue.thresholds),
+        "quests":       len(catalogue.quests),
+    })
+
 @app.route("/terms")
 def terms():
     return render_template("terms.html")
@@ -312,11 +364,15 @@ def register_squire():
 
         # Verify CAPTCHA
         captcha_verify_url = "https://www.google.com/recaptcha/api/siteverify"
-        response = requests.post(captcha_verify_url, data={
-            'secret': recaptcha,
-            'response': captcha_response
-        })
-        result = response.json()
+        try:
+            response = http_session().post(captcha_verify_url, data={
+                'secret': recaptcha,
+                'response': captcha_response
+            }, timeout=HTTP_TIMEOUT)
+            result = response.json()
+        except Exception as e:
+            logging.warning(f"CAPTCHA verification request failed: {e}")
+            result = {}
 
         #logging.debug("📬 CAPTCHA API response:", response.json())
 
@@ -372,8 +428,8 @@ def register_squire():
             db.add(starter_pizza)
             db.commit()
 
-            # 4) Send a Verification Email
-            send_verification_email(email, squire_name, unique)
+            # 4) Send a Verification Email (in the background)
+            jobs.enqueue("send_verification_email", email, squire_name, unique)
 
 
             flash("🎉 Welcome to the realm, noble squire!")
@@ -433,8 +489,8 @@ def resend_verification():
             flash("You are already verified. Feel free to login with your noble Squire name.")
             return redirect(url_for("login"))
 
-        send_verification_email(squire.email, squire.squire_name, squire.uuid)
-        flash("📬 A new verification email has been sent!")
+        jobs.enqueue("send_verification_email", squire.email, squire.squire_name, squire.uuid)
+        flash("📬 A new verification email is on its way!")
         return redirect(url_for("login"))
 
     except Exception as e:
@@ -607,17 +663,6 @@ def map_view():
     inventory = get_inventory(squire_id)
 
     try:
-        #game_map = display_travel_map(squire_id, quest_id)
-        game_map = get_viewport_map(db, squire_id, quest_id,15)
-        xp, gold = get_squire_stats(squire_id)
-        hunger = get_hunger_bar(squire_id)
-
-        logging.debug("I am on the map just navigating like a navigator does.")
-
-        answered_riddles, total_riddles, progress_percentage = check_quest_progress(squire_id, quest_id)
-
-        progress_bar = display_progress_bar(float(progress_percentage))
-
         x, y, level = (
             db.query(
                 Squire.x_coordinate,
@@ -628,12 +673,24 @@ def map_view():
             .one()
         )
 
+        #game_map = display_travel_map(squire_id, quest_id)
+        map_tiles = viewport_tiles(db, squire_id, quest_id, flask_session.get("squire_quest_id"), (x, y))
+        xp, gold = get_squire_stats(squire_id)
+        hunger = get_hunger_bar(squire_id)
+
+        logging.debug("I am on the map just navigating like a navigator does.")
+
+        answered_riddles, total_riddles, progress_percentage = check_quest_progress(squire_id, quest_id)
+
+        progress_bar = display_progress_bar(float(progress_percentage))
+
         message = flask_session.pop('message', None)  # Retrieve and clear messages after displaying
 
         return render_template(
             "map.html",
             quest_id=quest_id,
-            game_map=game_map,
+            map_tiles=map_tiles,
+            max_path_steps=MOVE_PATH_MAX_STEPS,
             progress_bar=progress_bar,
             xp=xp,
             gold=gold,
@@ -643,6 +700,7 @@ def map_view():
             position=(x,y),
             inventory=inventory,
             team_id=team_id,
+            team_stream=team_channel.streaming_enabled(),
             game_message=game_message
         )
     except Exception as e:
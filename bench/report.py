@@ -0,0 +1,81 @@
+"""Latency / throughput summaries and baseline comparison for bench runs."""
+import json
+import statistics
+from collections import defaultdict
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list (0 for an empty one)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: list, wall_seconds: float) -> dict:
+    """Per-route p50/p95/p99 (ms), request counts and mean statements, plus overall throughput."""
+    by_route = defaultdict(list)
+    for route, seconds, statements, status in samples:
+        by_route[route].append((seconds * 1000, statements, status))
+
+    routes = {}
+    for route, rows in sorted(by_route.items()):
+        latencies = [ms for ms, _, _ in rows]
+        routes[route] = {
+            "requests":   len(rows),
+            "p50_ms":     round(percentile(latencies, 50), 2),
+            "p95_ms":     round(percentile(latencies, 95), 2),
+            "p99_ms":     round(percentile(latencies, 99), 2),
+            "statements": round(statistics.mean(s for _, s, _ in rows), 1),
+            "errors":     sum(1 for _, _, status in rows if status >= 500),
+        }
+
+    all_latencies = [seconds * 1000 for _, seconds, _, _ in samples]
+    return {
+        "requests":       len(samples),
+        "wall_seconds":   round(wall_seconds, 2),
+        "throughput_rps": round(len(samples) / wall_seconds, 1) if wall_seconds else 0.0,
+        "p50_ms":         round(percentile(all_latencies, 50), 2),
+        "p95_ms":         round(percentile(all_latencies, 95), 2),
+        "p99_ms":         round(percentile(all_latencies, 99), 2),
+        "routes":         routes,
+    }
+
+
+def print_summary(summary: dict) -> None:
+    print(f"{'route':<22}{'reqs':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'stmts':>8}{'errors':>8}")
+    for route, r in summary["routes"].items():
+        print(f"{route:<22}{r['requests']:>7}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['statements']:>8}{r['errors']:>8}")
+    print(
+        f"\n{summary['requests']} requests in {summary['wall_seconds']}s → {summary['throughput_rps']} req/s "
+        f"(p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms)"
+    )
+
+
+def save_baseline(summary: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+
+
+def compare(summary: dict, baseline_path: str, tolerance: float = 0.2) -> list[str]:
+    """
+    Returns the regressions against a saved baseline: any route whose p95
+    or mean statements per request grew by more than `tolerance`.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for route, now in summary["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if not before:
+            continue
+        if before["p95_ms"] and now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {before['p95_ms']} → {now['p95_ms']} ms")
+        if now["statements"] > before["statements"] * (1 + tolerance):
+            regressions.append(f"{route}: statements {before['statements']} → {now['statements']}")
+
+    if baseline.get("throughput_rps") and summary["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput {baseline['throughput_rps']} → {summary['throughput_rps']} req/s")
+    return regressions
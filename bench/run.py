@@ -0,0 +1,85 @@
+"""
+Local load test: seeds a throwaway SQLite world and runs scripted player
+sessions concurrently against the Flask app (no server, no remote DB).
+
+    python -m bench.run                                # 20 players, 8 threads
+    python -m bench.run --squires 60 --threads 16 --moves 40
+    python -m bench.run --save-baseline bench/baseline.json
+    python -m bench.run --compare bench/baseline.json  # exit 1 on regressions
+
+Reports p50/p95/p99 latency, throughput and SQL statements per request for
+/login, /start_quest, /ajax_move, /encounter_enemy, /combat,
+/ajax_handle_combat, /answer_question, /shop and /team_messages.
+"""
+import argparse
+import logging
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.world import prepare_environment
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the game's routes against a seeded SQLite world.")
+    parser.add_argument("--squires", type=int, default=20, help="simulated players (one session each)")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent sessions")
+    parser.add_argument("--moves", type=int, default=25, help="/ajax_move calls per session")
+    parser.add_argument("--history", type=int, default=2000, help="pre-seeded travel_history rows per squire")
+    parser.add_argument("--db", default="bench.db", help="SQLite file (recreated every run)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the scripted sessions")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the summary as the new baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    args = parser.parse_args()
+
+    # 1) Fresh database, before anything imports db
+    prepare_environment(args.db)
+    from bench.world import build_world
+    counts = build_world(args.squires, args.history)
+    print(f"Seeded {counts}")
+
+    from app import app
+    from bench.scenario import PlayerSession, Recorder
+    from bench.report import summarize, print_summary, save_baseline, compare
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # 2) Run every session, args.threads at a time
+    recorder = Recorder()
+    sessions = [
+        PlayerSession(app, f"squire{i}", (i - 1) % 10 + 1, recorder, args.moves, random.Random(args.seed + i))
+        for i in range(1, args.squires + 1)
+    ]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        for future in [pool.submit(s.run) for s in sessions]:
+            future.result()
+    wall = time.perf_counter() - start
+
+    # 3) Report
+    summary = summarize(recorder.samples, wall)
+    summary["config"] = {k: v for k, v in vars(args).items() if k not in ("save_baseline", "compare")}
+    print_summary(summary)
+
+    for route, detail in recorder.errors[:10]:
+        print(f"error {route}: {detail}")
+
+    if args.save_baseline:
+        save_baseline(summary, args.save_baseline)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        regressions = compare(summary, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print("No regressions against baseline.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Scripted player sessions driven through the Flask test client.
+
+One PlayerSession per simulated player (each has its own cookie jar):
+log in, start a quest, walk, fight an enemy, answer a question, visit the
+shop and poll team messages. Every request is timed and its SQL statements
+are counted; results are appended to a shared Recorder.
+"""
+import random
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# ────────────── Statement counting ──────────────
+# The test client runs each request on the calling thread, so a thread-local
+# counter attributes every statement to the request that issued it.
+
+_local = threading.local()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    _local.statements = getattr(_local, "statements", 0) + 1
+
+
+class Recorder:
+    """Thread-safe collection of (route, seconds, statements, status) samples."""
+
+    def __init__(self):
+        self.samples = []
+        self.errors  = []
+        self._lock   = threading.Lock()
+
+    def add(self, route: str, seconds: float, statements: int, status: int) -> None:
+        with self._lock:
+            self.samples.append((route, seconds, statements, status))
+
+    def error(self, route: str, detail: str) -> None:
+        with self._lock:
+            self.errors.append((route, detail))
+
+
+class PlayerSession:
+    """One simulated player walking through the game's main loop."""
+
+    DIRECTIONS = "NESW"
+
+    def __init__(self, app, squire_name: str, team_id: int, recorder: Recorder, moves: int, rng: random.Random):
+        self.client   = app.test_client()
+        self.name     = squire_name
+        self.team_id  = team_id
+        self.recorder = recorder
+        self.moves    = moves
+        self.rng      = rng
+
+    def request(self, route: str, method: str, path: str, **kwargs):
+        _local.statements = 0
+        start = time.perf_counter()
+        try:
+            response = self.client.open(path, method=method, **kwargs)
+        except Exception as e:
+            self.recorder.error(route, f"{type(e).__name__}: {e}")
+            return None
+        elapsed = time.perf_counter() - start
+
+        self.recorder.add(route, elapsed, _local.statements, response.status_code)
+        if response.status_code >= 500:
+            self.recorder.error(route, f"HTTP {response.status_code}")
+        return response
+
+    # ── steps ──
+    def login(self):
+        return self.request("/login", "POST", "/login", data={"squire_id": self.name})
+
+    def start_quest(self, quest_id: int = 1):
+        return self.request("/start_quest", "POST", "/start_quest", json={"quest_id": quest_id})
+
+    def walk(self):
+        """Echoes the map token / version back like templates/map.html, so moves get diffs."""
+        world = version = None
+        for _ in range(self.moves):
+            response = self.request("/ajax_move", "POST", "/ajax_move", json={
+                "direction": self.rng.choice(self.DIRECTIONS), "world": world, "version": version
+            })
+            tiles = (response.get_json(silent=True) or {}).get("tiles") if response is not None else None
+            if tiles:
+                world, version = tiles.get("world"), tiles.get("version")
+
+    def meet_enemy(self):
+        """/encounter_enemy picks the foe; /combat initialises the fight (timed separately)."""
+        self.request("/encounter_enemy", "GET", "/encounter_enemy")
+        self.request("/combat", "GET", "/combat")
+
+    def fight(self, max_rounds: int = 30):
+        for _ in range(max_rounds):
+            response = self.request("/ajax_handle_combat", "POST", "/ajax_handle_combat", data={"action": "attack"})
+            if response is None or response.status_code != 200 or "redirect" in (response.get_json(silent=True) or {}):
+                return
+
+    def answer_question(self):
+        self.meet_enemy()
+        self.request("/answer_question", "GET", "/answer_question")
+
+    def shop(self):
+        self.request("/shop", "GET", "/shop")
+
+    def team_messages(self):
+        self.request("/team_messages", "GET", f"/team_messages/{self.team_id}?since=2000-01-01T00:00:00")
+
+    def run(self):
+        self.login()
+        self.start_quest()
+        self.walk()
+        self.meet_enemy()
+        self.fight()
+        self.answer_question()
+        self.shop()
+        self.team_messages()
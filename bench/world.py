@@ -0,0 +1,58 @@
+"""
+Benchmark world: a fresh SQLite database seeded by seed.py, plus long
+travel histories so the per-squire lookups have realistic row counts.
+
+Must be imported before db (directly or via app): prepare_environment()
+points DB_BACKEND / SQLITE_URL at the benchmark file.
+"""
+import os
+
+
+def prepare_environment(db_path: str) -> None:
+    """Points the app at a throwaway SQLite file; call before importing db or app."""
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["SQLITE_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+    os.environ.setdefault("OPENAI_APIKEY", "bench")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+
+def spiral(n: int):
+    """First n tiles of a square spiral around (0, 0), excluding the origin."""
+    x = y = 0
+    dx, dy = 1, 0
+    leg, walked, turns = 1, 0, 0
+    for _ in range(n):
+        x, y = x + dx, y + dy
+        yield x, y
+        walked += 1
+        if walked == leg:
+            walked = 0
+            dx, dy = -dy, dx
+            turns += 1
+            if turns % 2 == 0:
+                leg += 1
+
+
+def build_world(num_squires: int, history: int, num_teams: int = 10, questions: int = 40) -> dict:
+    """Creates every table, seeds the synthetic world and `history` visited tiles per squire."""
+    from sqlalchemy import insert
+    from db import engine, Base, TravelHistory
+    import seed
+
+    Base.metadata.create_all(engine)
+    counts = seed.seed(num_teams=num_teams, num_squires=num_squires, questions_per_quest=questions)
+
+    tiles = list(spiral(history))
+    with engine.begin() as conn:
+        for squire_id in range(1, num_squires + 1):
+            conn.execute(
+                insert(TravelHistory),
+                [{"squire_id": squire_id, "x_coordinate": x, "y_coordinate": y} for x, y in tiles]
+            )
+
+    counts["travel_history"] = num_squires * len(tiles)
+    return counts
@@ -1,14 +1,26 @@
 import os
 import logging
+import secrets
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from urllib.parse import urlparse
 import socks
 import socket
+import threading
+import time
+
+from dotenv import load_dotenv
+# Load environment variables at the start of the application
+load_dotenv()
+
+# DB_BACKEND picks the database: "mysql" (default, production) or "sqlite"
+# (offline play and load testing; SQLITE_URL points at the file).
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+SQLITE_URL = os.getenv("SQLITE_URL", "sqlite:///lawyersquest.db")
 
 bypass_proxy = os.getenv("BYPASS_PROXY") == "1"
 
-if not bypass_proxy:
+if DB_BACKEND == "mysql" and not bypass_proxy:
     fixie_url = os.getenv("QUOTA_GUARD_HOST")
     user_pass, host_port = fixie_url.split('@')
     username, password = user_pass.split(':')
@@ -26,38 +38,180 @@ if not bypass_proxy:
     socket.socket = socks.socksocket  # override *before* pymysql is imported
 
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, ForeignKey, func, Enum, Boolean, UniqueConstraint
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, ForeignKey, func, Enum, Boolean, UniqueConstraint, Index
+from sqlalchemy import insert
 from sqlalchemy.orm import scoped_session, sessionmaker, declarative_base, relationship
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.exc import SQLAlchemyError, DBAPIError
+from flask import g, has_app_context
 import pymysql
 
-from dotenv import load_dotenv
-# Load environment variables at the start of the application
-load_dotenv()
 
-resolved = socket.getaddrinfo(os.getenv('DB_HOST'), 3306)
+# ────────────── Pool sizing ──────────────
+# Each gunicorn worker process has its own pool, and at most one connection
+# per worker thread is in use at a time. So the pool holds one connection per
+# thread, with a little overflow for background threads (team channel poller,
+# catalogue reloads). The overflow is capped so that every worker together
+# stays under DB_MAX_CONNECTIONS.
+
+WEB_CONCURRENCY    = int(os.getenv("WEB_CONCURRENCY", "2"))
+GUNICORN_THREADS   = int(os.getenv("GUNICORN_THREADS", "4"))
+GUNICORN_WORKER_CLASS = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+GUNICORN_WORKER_CONNECTIONS = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "100"))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "60"))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_KEEPALIVE_SECONDS = float(os.getenv("DB_KEEPALIVE_SECONDS", "240"))
+
+
+def pool_settings() -> dict:
+    """QueuePool arguments for one worker process (DB_POOL_* env vars override)."""
+    per_worker_budget = max(2, DB_MAX_CONNECTIONS // max(1, WEB_CONCURRENCY))
+    # gevent: many more concurrent requests than threads; queue them on the pool
+    concurrency  = GUNICORN_WORKER_CONNECTIONS if GUNICORN_WORKER_CLASS == "gevent" else GUNICORN_THREADS
+    pool_size    = int(os.getenv("DB_POOL_SIZE", min(concurrency, per_worker_budget)))
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", max(0, min(2, per_worker_budget - pool_size))))
+    return {
+        "pool_size":     pool_size,
+        "max_overflow":  max_overflow,
+        "pool_timeout":  float(os.getenv("DB_POOL_TIMEOUT", "10")),    # fail fast instead of queueing for 30s
+        "pool_recycle":  int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,                                          # drop connections the proxy closed
+    }
+
+
+# ────────────── Connection handshake metrics ──────────────
+# A new MySQL connection pays the SOCKS handshake, TLS and auth inline.
+# connect() times each one so get_pool_status() can report it.
+
+_connect_stats = {"connects": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0, "failures": 0}
+_connect_lock  = threading.Lock()
+
 
 def connect():
     # Just connect directly now — socket is already patched
-    return pymysql.connect(
-        host=os.getenv('DB_HOST'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        database=os.getenv('DB_NAME'),
-        ssl={"ssl": {}},
-        connect_timeout=10
-    )
+    start = time.perf_counter()
+    try:
+        conn = pymysql.connect(
+            host=os.getenv('DB_HOST'),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASSWORD'),
+            database=os.getenv('DB_NAME'),
+            ssl={"ssl": {}},
+            connect_timeout=DB_CONNECT_TIMEOUT
+        )
+    except Exception:
+        with _connect_lock:
+            _connect_stats["failures"] += 1
+        raise
 
-DB_URI = "mysql+pymysql://"
-engine = create_engine(
-        DB_URI,
+    elapsed = (time.perf_counter() - start) * 1000
+    with _connect_lock:
+        _connect_stats["connects"] += 1
+        _connect_stats["total_ms"] += elapsed
+        _connect_stats["last_ms"]   = elapsed
+        _connect_stats["max_ms"]    = max(_connect_stats["max_ms"], elapsed)
+    logging.debug(f"MySQL connection established in {elapsed:.0f} ms")
+    return conn
+
+
+def _sqlite_pragmas(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")     # readers don't block the writer
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that measures how long each checkout waited for a connection.
+    The wait is added to the current request (g.db_checkout_ms) and to the
+    process-wide totals reported by get_pool_status().
+    """
+
+    checkouts = 0
+    wait_ms   = 0.0
+    _stats_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = (time.perf_counter() - start) * 1000
+            with TimedQueuePool._stats_lock:
+                TimedQueuePool.checkouts += 1
+                TimedQueuePool.wait_ms   += waited
+            if has_app_context():
+                g.db_checkout_ms = g.get("db_checkout_ms", 0.0) + waited
+
+
+def make_engine(backend: str = DB_BACKEND):
+    """
+    Builds the engine for the configured backend:
+    - mysql:  PyMySQL through the (optional) SOCKS proxy, pooled
+    - sqlite: a local file, shareable across threads
+    """
+    if backend == "sqlite":
+        sqlite_engine = create_engine(
+            SQLITE_URL,
+            connect_args={"check_same_thread": False, "timeout": 30},
+            poolclass=TimedQueuePool,
+            **pool_settings()
+        )
+        event.listen(sqlite_engine, "connect", _sqlite_pragmas)
+        return sqlite_engine
+
+    if backend != "mysql":
+        raise ValueError(f"Unsupported DB_BACKEND {backend!r} (expected 'mysql' or 'sqlite')")
+
+    resolved = socket.getaddrinfo(os.getenv('DB_HOST'), 3306)
+
+    return create_engine(
+        "mysql+pymysql://",
         creator=connect,
-        pool_size=5,
-        max_overflow=10,
-        pool_timeout=30,
-        pool_recycle=1800
+        poolclass=TimedQueuePool,
+        **pool_settings()
     )
 
+engine = make_engine()
+
+
+# ────────────── Dialect-neutral helpers ──────────────
+
+def random_order(bind=None):
+    """ORDER BY expression for a random row: RAND() on MySQL, RANDOM() elsewhere."""
+    dialect = (bind or engine).dialect.name
+    return func.rand() if dialect == "mysql" else func.random()
+
+
+def insert_ignore(model, bind=None):
+    """
+    INSERT that silently skips rows hitting a unique key:
+    INSERT IGNORE on MySQL, INSERT ... ON CONFLICT DO NOTHING on SQLite.
+    """
+    dialect = (bind or engine).dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(model).on_conflict_do_nothing()
+    return insert(model).prefix_with("IGNORE")
+
+
+# ────────────── Per-request statement counter ──────────────
+# Counts every statement sent to the database while a Flask app context is
+# active, so a route can check its round-trip budget (see statement_count()).
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.db_statements = g.get("db_statements", 0) + 1
+
+def statement_count() -> int:
+    """Number of statements executed so far in the current request."""
+    return g.get("db_statements", 0) if has_app_context() else 0
+
 
 # Scoped session for ORM
 db_session = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
@@ -134,6 +288,11 @@ class TravelHistory(Base):
     # Relationship back to Squire
     squire = relationship('Squire', back_populates='travel_history')
 
+    __table_args__ = (
+        # one row per visited tile; update_player_position relies on INSERT IGNORE
+        Index('uq_travel_history_squire_xy', 'squire_id', 'x_coordinate', 'y_coordinate', unique=True),
+    )
+
     def __repr__(self):
         ts = self.visited_at.strftime('%Y-%m-%d %H:%M:%S') if self.visited_at else None
         return f"<TravelHistory(squire_id={self.squire_id}, x={self.x_coordinate}, y={self.y_coordinate}, at={ts})>"
@@ -175,6 +334,10 @@ class SquireQuestion(Base):
     # Relationship back to Squire
     squire = relationship('Squire', back_populates='questions')
 
+    __table_args__ = (
+        Index('ix_squire_questions_squire_type_question', 'squire_id', 'question_type', 'question_id'),
+    )
+
     def __repr__(self):
         return (f"<SquireQuestion(squire_id={self.squire_id}, "
                 f"type={self.question_type!r}, id={self.question_id}, "
@@ -194,6 +357,11 @@ class SquireRiddleProgress(Base):
     riddle = relationship('Riddle', back_populates='squire_progress')
     quest  = relationship('Quest', back_populates='riddle_progress')
 
+    __table_args__ = (
+        Index('ix_squire_riddle_progress_squire_quest', 'squire_id', 'quest_id'),
+        Index('ix_squire_riddle_progress_squire_riddle', 'squire_id', 'riddle_id'),
+    )
+
 
 class Riddle(Base):
     __tablename__ = 'riddles'
@@ -244,10 +412,14 @@ class Inventory(Base):
     item_type        = Column(Enum('food','special','gear','arms'), nullable=True)
     effective_against= Column(String(255))
 
+    __table_args__ = (
+        Index('ix_inventory_squire_type', 'squire_id', 'item_type'),
+    )
+
     @property
     def max_uses(self):
-        db = db_session()
-        shop_item = db.query(ShopItem).filter_by(name=self.item_name).first()
+        from services.catalogue import get_catalogue  # services import db, so resolve lazily
+        shop_item = get_catalogue().shop_item_named(self.item_name)
         return shop_item.uses if shop_item else 0
 
     # relationship back to Squire
@@ -291,6 +463,10 @@ class MapFeature(Base):
     # link back to Squire (if you have a Squire model defined)
     squire = relationship('Squire', back_populates='map_features')
 
+    __table_args__ = (
+        Index('ix_map_features_squire_xy', 'squire_id', 'x_coordinate', 'y_coordinate'),
+    )
+
     def __repr__(self):
         return f"<MapFeature(x={self.x_coordinate}, y={self.y_coordinate}, terrain={self.terrain_type!r})>"
 
@@ -314,6 +490,32 @@ class MultipleChoiceQuestion(Base):
         return (f"<MCQ(id={self.id}, quest_id={self.quest_id}, "
                 f"correct={self.correctAnswer!r})>")
 
+class GeneratedQuestion(Base):
+    """A GPT-written multiple choice question, pre-generated into a per-quest pool."""
+    __tablename__ = 'generated_questions'
+
+    id             = Column(Integer, primary_key=True)
+    quest_id       = Column(Integer, ForeignKey('quests.id'), nullable=False)
+    question_text  = Column(Text, nullable=False)
+    optionA        = Column(Text, nullable=False)
+    optionB        = Column(Text, nullable=False)
+    optionC        = Column(Text, nullable=False)
+    optionD        = Column(Text, nullable=False)
+    correctAnswer  = Column(String(1), nullable=False)
+    # provenance
+    book_name      = Column(String(255))
+    page_number    = Column(Integer)
+    model          = Column(String(50))
+    created_at     = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_generated_questions_quest', 'quest_id'),
+    )
+
+    def __repr__(self):
+        return (f"<GeneratedQuestion(id={self.id}, quest_id={self.quest_id}, "
+                f"page={self.page_number}, model={self.model!r})>")
+
 class TrueFalseQuestion(Base):
     __tablename__ = 'true_false_questions'
 
@@ -379,6 +581,10 @@ class TeamMessage(Base):
     # Link back to Team
     team       = relationship('Team', back_populates='messages')
 
+    __table_args__ = (
+        Index('ix_team_messages_team_created', 'team_id', 'created_at'),
+    )
+
     def __repr__(self):
         ts = self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
         return f"<TeamMessage(team_id={self.team_id}, created_at={ts})>"
@@ -401,6 +607,10 @@ class TreasureChest(Base):
     riddle           = relationship('Riddle', back_populates='treasure_chests')
     squire_quest     = relationship('SquireQuestStatus', back_populates='treasure_chests')
 
+    __table_args__ = (
+        Index('ix_treasure_chests_sq_xy_opened', 'squire_quest_id', 'x_coordinate', 'y_coordinate', 'is_opened'),
+    )
+
     def __repr__(self):
         return (f"<TreasureChest(x={self.x_coordinate}, y={self.y_coordinate}, "
                 f"opened={self.is_opened})>")
@@ -433,6 +643,12 @@ class ChestHint(Base):
         back_populates='chest_hints'
     )
 
+    __table_args__ = (
+        # one hint per chest; chest_step and the NPC trader rely on INSERT IGNORE
+        Index('uq_chest_hints_sq_xy', 'squire_quest_id', 'chest_x', 'chest_y', unique=True),
+    )
+
+
 class NPCNegotiation(Base):
     __tablename__ = 'npc_negotiations'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -512,11 +728,64 @@ def safe_commit():
 
 # Add this somewhere accessible for debugging
 def get_pool_status():
-    return {
+    status = {
         'pool_size': engine.pool.size(),
         'checkedin': engine.pool.checkedin(),
         'checkedout': engine.pool.checkedout(),
-        'overflow': engine.pool.overflow()
+        'overflow': engine.pool.overflow(),
+        'checkouts': TimedQueuePool.checkouts,
+        'checkout_wait_ms': round(TimedQueuePool.wait_ms, 1)
     }
+    with _connect_lock:
+        connects = _connect_stats["connects"]
+        status['connects']          = connects
+        status['connect_failures']  = _connect_stats["failures"]
+        status['connect_avg_ms']    = round(_connect_stats["total_ms"] / connects, 1) if connects else 0.0
+        status['connect_max_ms']    = round(_connect_stats["max_ms"], 1)
     logging.info(f"Pool status: {status}")
     return status
+
+
+def warm_pool(connections: int | None = None) -> int:
+    """
+    Opens up to `connections` pooled connections (default: the pool size) and
+    returns them to the pool, so handshakes happen now rather than inside the
+    first requests. Pre-ping replaces any connection that has gone stale.
+    Returns how many connections were checked.
+    """
+    wanted = connections if connections is not None else engine.pool.size()
+    held = []
+    try:
+        for _ in range(wanted):
+            held.append(engine.connect())
+    except Exception as e:
+        logging.warning(f"Pool warm-up stopped after {len(held)} connections: {e}")
+    finally:
+        for conn in held:
+            conn.close()
+    return len(held)
+
+
+_keepalive_thread = None
+
+
+def start_pool_keepalive(interval: float = DB_KEEPALIVE_SECONDS) -> None:
+    """
+    Background thread that re-warms the pool every `interval` seconds, so idle
+    connections are pinged (and recycled or reconnected) off the request path.
+    Keep `interval` below the proxy's and MySQL's idle timeouts.
+    """
+    global _keepalive_thread
+    if _keepalive_thread is not None or interval <= 0:
+        return
+
+    def _loop():
+        while True:
+            time.sleep(interval)
+            # only connections nobody is using; never compete with requests
+            idle = engine.pool.checkedin()
+            if idle:
+                warm_pool(idle)
+
+    _keepalive_thread = threading.Thread(target=_loop, name="db-pool-keepalive", daemon=True)
+    _keepalive_thread.start()
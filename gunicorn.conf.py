@@ -0,0 +1,48 @@
+"""
+Gunicorn settings (Procfile: gunicorn -c gunicorn.conf.py app:app).
+
+GUNICORN_WORKER_CLASS picks the concurrency model:
+- gthread (default): WEB_CONCURRENCY processes x GUNICORN_THREADS threads.
+- gevent: WEB_CONCURRENCY processes x GUNICORN_WORKER_CONNECTIONS greenlets,
+  so requests waiting on OpenAI / SendGrid / reCAPTCHA or holding a team
+  message stream don't tie up a thread each. Needs `pip install gevent`;
+  falls back to gthread when it isn't installed.
+
+db.py sizes its connection pool from the same variables.
+"""
+import importlib.util
+import logging
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+if worker_class == "gevent" and importlib.util.find_spec("gevent") is None:
+    logging.warning("GUNICORN_WORKER_CLASS=gevent but gevent is not installed; using gthread")
+    worker_class = "gthread"
+
+workers            = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads            = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "100"))
+timeout            = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+keepalive          = 5
+bind               = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# The app must be imported after the gevent worker has monkey-patched the
+# standard library (db.py wraps socket.socket for the SOCKS proxy), so never
+# preload it in the master.
+preload_app = False
+
+
+def post_worker_init(worker):
+    """
+    Opens the pool's connections before the worker takes traffic and keeps
+    them warm, and starts the job dispatcher so jobs left queued by a
+    restarted worker are picked up.
+    """
+    from db import warm_pool, start_pool_keepalive, get_pool_status
+    from services import jobs
+
+    warmed = warm_pool()
+    start_pool_keepalive()
+    jobs.start()
+    logging.info(f"Worker {worker.pid}: warmed {warmed} DB connections")
+    get_pool_status()
@@ -0,0 +1,162 @@
+"""
+Index migrations for the hot lookup paths.
+
+    python migrate.py            # create any table or index declared in db.py that is missing
+    python migrate.py --dry-run  # only list what would be created
+    python migrate.py --check    # EXPLAIN every hot query, exit 1 on a full table scan
+
+Safe to run repeatedly: existing tables and indexes are detected by name and skipped.
+Before a unique index is created, duplicate rows are removed, keeping the
+oldest: (squire_id, x, y) in travel_history, (squire_quest_id, chest_x, chest_y)
+in chest_hints. Indexes that a unique one replaces are dropped after it exists.
+"""
+import argparse
+import sys
+
+from sqlalchemy import inspect, select, text
+
+from db import engine, Base, MapFeature, TravelHistory, TreasureChest, ChestHint, SquireRiddleProgress, SquireQuestion, Inventory, TeamMessage
+
+
+# Queries the game runs on every move / encounter, with representative values
+HOT_QUERIES = {
+    "map_features by squire & tile":
+        select(MapFeature.terrain_type).where(MapFeature.squire_id == 1, MapFeature.x_coordinate == 3, MapFeature.y_coordinate == 4),
+    "map_features for a squire's world":
+        select(MapFeature.x_coordinate, MapFeature.y_coordinate, MapFeature.terrain_type).where(MapFeature.squire_id == 1),
+    "travel_history for a squire":
+        select(TravelHistory.x_coordinate, TravelHistory.y_coordinate).where(TravelHistory.squire_id == 1),
+    "treasure_chests by squire_quest & tile":
+        select(TreasureChest.id).where(
+            TreasureChest.squire_quest_id == 1, TreasureChest.x_coordinate == 3,
+            TreasureChest.y_coordinate == 4, TreasureChest.is_opened == False
+        ),
+    "chest_hints for a squire_quest":
+        select(ChestHint.chest_x, ChestHint.chest_y).where(ChestHint.squire_quest_id == 1),
+    "squire_riddle_progress by squire & quest":
+        select(SquireRiddleProgress.id).where(SquireRiddleProgress.squire_id == 1, SquireRiddleProgress.quest_id == 1),
+    "squire_riddle_progress by squire & riddle":
+        select(SquireRiddleProgress.id).where(SquireRiddleProgress.squire_id == 1, SquireRiddleProgress.riddle_id == 1),
+    "squire_questions answered by type":
+        select(SquireQuestion.question_id).where(SquireQuestion.squire_id == 1, SquireQuestion.question_type == 'true_false'),
+    "inventory food for a squire":
+        select(Inventory.id).where(Inventory.squire_id == 1, Inventory.item_type == 'food'),
+    "team_messages since a timestamp":
+        select(TeamMessage.id).where(TeamMessage.team_id == 1, TeamMessage.created_at > '2025-01-01 00:00:00'),
+}
+
+
+def existing_index_names(inspector, table_name: str) -> set:
+    names = {ix["name"] for ix in inspector.get_indexes(table_name)}
+    names.update(uc["name"] for uc in inspector.get_unique_constraints(table_name))
+    return names
+
+
+# Unique indexes whose table may already hold duplicates: table -> key columns
+UNIQUE_KEYS = {
+    TravelHistory.__tablename__: ("squire_id", "x_coordinate", "y_coordinate"),
+    ChestHint.__tablename__:     ("squire_quest_id", "chest_x", "chest_y"),
+}
+
+# Non-unique indexes made redundant by a unique one on the same columns
+REPLACED_INDEXES = {
+    "uq_chest_hints_sq_xy": "ix_chest_hints_sq_xy",
+}
+
+
+def dedupe(conn, table_name: str, columns) -> int:
+    """Deletes rows that repeat another row's `columns`, keeping the lowest id."""
+    key = ", ".join(columns)
+    result = conn.execute(text(f"""
+        DELETE FROM {table_name}
+        WHERE id NOT IN (
+            SELECT keep_id FROM (
+                SELECT MIN(id) AS keep_id
+                FROM {table_name}
+                GROUP BY {key}
+            ) AS keep
+        )
+    """))
+    return result.rowcount or 0
+
+
+def migrate(dry_run: bool = False) -> list[str]:
+    """Creates every declared table and index that the database does not have yet."""
+    created = []
+    inspector = inspect(engine)
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                if dry_run:
+                    print(f"would create table {table.name}")
+                    continue
+                # a new table comes with its indexes
+                table.create(bind=conn)
+                created.append(table.name)
+                print(f"created table {table.name}")
+                continue
+
+            existing = existing_index_names(inspector, table.name)
+            for index in sorted(table.indexes, key=lambda ix: ix.name):
+                if index.name in existing:
+                    continue
+
+                if dry_run:
+                    print(f"would create {index.name} on {table.name}")
+                    continue
+
+                if index.unique and table.name in UNIQUE_KEYS:
+                    removed = dedupe(conn, table.name, UNIQUE_KEYS[table.name])
+                    print(f"removed {removed} duplicate {table.name} rows")
+
+                index.create(bind=conn)
+                created.append(index.name)
+                print(f"created {index.name} on {table.name}")
+
+                replaced = REPLACED_INDEXES.get(index.name)
+                if replaced in existing:
+                    conn.execute(text(f"DROP INDEX {replaced} ON {table.name}" if engine.dialect.name == "mysql"
+                                      else f"DROP INDEX {replaced}"))
+                    print(f"dropped {replaced} on {table.name}")
+
+    return created
+
+
+def full_scans(conn, stmt) -> list[str]:
+    """Returns the plan lines of `stmt` that read a whole table."""
+    sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+
+    if engine.dialect.name == "sqlite":
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+        return [row[-1] for row in plan if row[-1].startswith("SCAN ")]
+
+    # MySQL: access type ALL is a table scan, index is a full index scan
+    plan = conn.exec_driver_sql(f"EXPLAIN {sql}").mappings().all()
+    return [f"{row['table']}: type={row['type']}" for row in plan if row["type"] in ("ALL", "index")]
+
+
+def check() -> bool:
+    """EXPLAINs every hot query; prints the plan problems and returns True if there are none."""
+    ok = True
+    with engine.connect() as conn:
+        for name, stmt in HOT_QUERIES.items():
+            scans = full_scans(conn, stmt)
+            if scans:
+                ok = False
+                print(f"FULL SCAN  {name}: {'; '.join(scans)}")
+            else:
+                print(f"ok         {name}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the hot-path indexes declared in db.py.")
+    parser.add_argument("--dry-run", action="store_true", help="list missing indexes without creating them")
+    parser.add_argument("--check", action="store_true", help="EXPLAIN the hot queries and fail on full scans")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check() else 1)
+
+    migrate(dry_run=args.dry_run)
@@ -2,6 +2,8 @@ from db import Squire, Course, Team, engine, db_session, Team, TravelHistory, Qu
 
 from flask import Blueprint, session as flask_session, request, jsonify, redirect, url_for, render_template
 from services.progress import update_squire_progress
+from services.catalogue import get_catalogue
+from services.combat_profile import load_combat_profile
 import random
 import logging
 from sqlalchemy import or_, func, and_, asc, not_, desc
@@ -10,13 +12,8 @@ from sqlalchemy import or_, func, and_, asc, not_, desc
 from utils.shared import get_squire_stats
 from utils.shared import check_quest_completion
 from utils.shared import complete_quest
-from utils.shared import calculate_hit_chance
 from utils.shared import calculate_enemy_encounter_probability
-from utils.shared import update_work_for_combat
-from utils.shared import get_player_max_hunger
 from utils.shared import mod_enemy_hunger
-from utils.shared import combat_mods
-from utils.shared import hunger_mods
 from utils.shared import degrade_gear
 from utils.shared import ishint
 from utils.shared import iswordcounthint
@@ -25,7 +22,6 @@ from utils.shared import flee_safely
 from utils.shared import calc_flee_safely
 #from utils.filters import chance_image
 from utils.shared import add_team_message
-from utils.shared import question_accuracy
 
 combat_bp = Blueprint('combat', __name__)
 
@@ -224,25 +220,21 @@ def combat():
         logging.debug("No enemy found in session, redirecting to map.")
         return redirect(url_for('map_view'))  # No enemy data? Go back to map.
 
-    x, y, level = (
-        db.query(
-            Squire.x_coordinate,
-            Squire.y_coordinate,
-            Squire.level
-        )
-        .filter(Squire.id == squire_id)
-        .one()
-    )
+    #return necessary initial values for combat, loaded in one query
+    profile = load_combat_profile(db, squire_id, enemy["name"])
+    if not profile:
+        return redirect(url_for('map_view'))
+
+    db.query(Squire) \
+      .filter(Squire.id == squire_id) \
+      .update({ Squire.work_sessions: 0 }, synchronize_session=False)
+    db.commit()
 
-    #return necessary initial values for combat
-    update_work_for_combat(squire_id)
-    max_hunger, food = get_player_max_hunger(squire_id)
-    base_hit_chance = calculate_hit_chance(squire_id, level)
-    hit_chance = int(min(base_hit_chance + combat_mods(squire_id, enemy["name"], level), 95))
-    player_max_hunger = min(max_hunger + hunger_mods(squire_id), 8)
+    hit_chance = profile.hit_chance
+    player_max_hunger = profile.player_max_hunger
 
 
-    mod_for_distance = abs(x * y)
+    mod_for_distance = profile.mod_for_distance
     enemy_max_hunger_base = enemy["max_hunger"]
     enemy_in_forest = enemy.get("in_forest")
     enemy_in_mountain = enemy.get("in_mountain")
@@ -250,7 +242,7 @@ def combat():
     mod_enemy_max_hunger = mod_enemy_hunger(mod_for_distance, enemy_max_hunger_base, enemy_in_forest, enemy_in_mountain)
     logging.debug(f"mod_enemy_max_hunger = {mod_enemy_max_hunger}")
     safe_chances = calc_flee_safely(mod_enemy_max_hunger, player_max_hunger, hit_chance)
-    question_chances = question_accuracy(squire_id)
+    question_chances = profile.question_accuracy
 
     # initialize session variables for battle
     player_current_hunger = 0
@@ -311,15 +303,8 @@ def encounter_enemy():
         )
 
         # 3) Pick a random non‑boss enemy appropriate to level
-        enemy = (
-            db.query(Enemy)
-              .filter(
-                  Enemy.is_boss   == False,
-                  Enemy.min_level <= level
-              )
-              .order_by(func.rand())
-              .first()
-        )
+        enemies = get_catalogue().enemies_for_level(level)
+        enemy = random.choice(enemies) if enemies else None
 
         if enemy:
             # 4) Check for required weapon in inventory
@@ -376,11 +361,7 @@ def encounter_boss():
             )
 
             # 2) Fetch the boss by name pattern
-            boss = (
-                db.query(Enemy)
-                  .filter(Enemy.enemy_name.ilike("%Lexiconis%"))
-                  .first()
-            )
+            boss = get_catalogue().enemy_like("Lexiconis")
 
             if boss:
                 # 3) Store JSON‑safe boss data in session
@@ -416,18 +397,11 @@ def boss_combat():
         logging.debug("Guess the boss is out to lunch: redirecting to map.")
         return redirect(url_for('map_view'))  # No enemy data? Go back to map.
 
-    x, y, level = (
-        db.query(
-            Squire.x_coordinate,
-            Squire.y_coordinate,
-            Squire.level
-        )
-        .filter(Squire.id == squire_id)
-        .one()
-    )
+    profile = load_combat_profile(db, squire_id)
+    if not profile:
+        return redirect(url_for('map_view'))
 
-    max_hunger, food = get_player_max_hunger(squire_id)
-    player_max_hunger = min(max_hunger + hunger_mods(squire_id), 8)
+    player_max_hunger = profile.player_max_hunger
     boss_max_hunger = boss["max_hunger"]
 
     # initialize session variables for battle
@@ -6,6 +6,7 @@ import random
 from sqlalchemy import func
 
 from utils.shared import ishint, iswordcounthint, iswordlengthhint
+from services import random_pick
 
 dungeon_bp = Blueprint('dungeon', __name__)
 
@@ -125,11 +126,9 @@ def present_mcq():
     pos = flask_session.get("dungeon_pos")
     quest_range = (33, 38)
 
-    mcq = (
-        db.query(MultipleChoiceQuestion)
-        .filter(MultipleChoiceQuestion.quest_id.between(*quest_range))
-        .order_by(func.rand())
-        .first()
+    mcq = random_pick.pick(
+        db, MultipleChoiceQuestion, ("quest_range", *quest_range),
+        MultipleChoiceQuestion.quest_id.between(*quest_range)
     )
 
     flask_session["current_question"] = {
@@ -154,11 +153,9 @@ def present_tf():
     pos = flask_session.get("dungeon_pos")
     quest_range = (33, 38)
 
-    question = (
-        db.query(TrueFalseQuestion)
-        .filter(TrueFalseQuestion.quest_id.between(*quest_range))
-        .order_by(func.rand())
-        .first()
+    question = random_pick.pick(
+        db, TrueFalseQuestion, ("quest_range", *quest_range),
+        TrueFalseQuestion.quest_id.between(*quest_range)
     )
 
 
@@ -171,11 +168,9 @@ def present_riddle():
     pos = flask_session.get("dungeon_pos")
     quest_range = (33, 38)
 
-    r = (
-        db.query(Riddle)
-        .filter(Riddle.quest_id.between(*quest_range))
-        .order_by(func.rand())
-        .first()
+    r = random_pick.pick(
+        db, Riddle, ("quest_range", *quest_range),
+        Riddle.quest_id.between(*quest_range)
     )
     show_hint = ishint(db, squire_id)
     show_word_count = iswordcounthint(db, squire_id)
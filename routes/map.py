@@ -2,8 +2,15 @@
 from flask import Blueprint, session as flask_session, request, jsonify, redirect, url_for, render_template, flash
 
 from db import Squire, Course, Team, engine, db_session, Team, TravelHistory, Quest, SquireQuestion, SquireRiddleProgress, Riddle, Enemy, Inventory, WizardItem, Job, MapFeature, MultipleChoiceQuestion, TrueFalseQuestion, ShopItem, SquireQuestStatus, TeamMessage, TreasureChest, XpThreshold, ChestHint, SquireQuestionAttempt, DungeonRooms
+from db import insert_ignore, statement_count
 from sqlalchemy import create_engine, func, and_
-from services.progress import update_player_position
+from services.world import record_hint, record_chest_opened
+from services.movement import load_move_context, step, commit_move, arrival_event, walk_path
+from services.movement import DELTAS, LANDMARKS, MOVE_PATH_MAX_STEPS
+from services.pathfinding import find_route, in_route_bounds
+from services.capabilities import BOOTS, BOAT
+from services import random_pick
+from services.tiles import viewport_tiles, move_tiles
 import logging
 import random
 
@@ -93,12 +100,115 @@ def dungeon_exists(squire_id: int, quest_id: int = 39) -> bool:
     ).first() is not None
 
 
+def _complete_quest_response(squire_id: int, quest_id: int, x: int, y: int, message: str) -> dict | None:
+    """Completes the quest the last step finished; a redirect to quest select if it went through."""
+    flask_session["quest_completed"] = True
+    completed, messages = complete_quest(squire_id, quest_id)
+    if not completed:
+        return None
+
+    for msg in messages:
+        flash(msg, "success")  # or use "quest" if you're styling categories
+    return {
+        "redirect": url_for("quest_select"),
+        "position": (x, y),
+        "message": message
+    }
+
+
+def _resolve_event(db, ctx, event: str | None, chest_id: int | None, message: str) -> tuple[dict | None, str]:
+    """
+    Applies the event a move ended in (see services.movement.arrival_event).
+    Returns a response for events that leave the map (bosses, town, redirects),
+    else None, along with the message to show.
+    """
+    squire_id, quest_id, squire_quest_id = ctx.squire_id, ctx.quest_id, ctx.squire_quest_id
+    x, y = ctx.position
+
+    # Boss fights
+    if event == "q14bossfight":
+        logging.debug("🏰 Boss fight triggered! Player reached (40,40) during quest 14.")
+        return {
+            "boss_fight": True,
+            "message": "You have reached the stronghold! Prepare to face the boss!",
+            "position": (x, y),
+            "event": event
+        }, message
+    if event in ("q28tourney", "q32tourney"):
+        logging.debug(f"🏰 The Tourney Has Been Reached in quest {quest_id}.")
+        return {
+            "boss_fight": True,
+            "message": "You have reached the Tournament where Squires show their true mettle!",
+            "position": (x, y),
+            "event": event
+        }, message
+
+    if event == "dungeon":
+        logging.debug("Welcome to the FINAL Dungeon, Squire!")
+        if not dungeon_exists(squire_id=squire_id, quest_id=39):
+            room_data = generate_dungeon(squire_id=squire_id)
+            insert_dungeon_to_db(room_data, squire_id)
+
+        flask_session["in_dungeon"] = True
+        flask_session["dungeon_pos"] = (0, 0)  # Start of dungeon
+        return {
+            "boss_fight": True,
+            "message": "You have reached the Dungeon!",
+            "event": event
+        }, message
+
+    if event == "town":
+        # Redirect to town
+        return {
+            "redirect": url_for("town.visit_town"),
+            "position": (x, y),
+            "message": message
+        }, message
+
+    # Treasure (the chest hint was recorded by commit_move)
+    if event == "treasure":
+        logging.debug(f"Found a treasure chest at {x},{y}.")
+        flask_session["current_treasure_id"] = chest_id  # Store chest in session
+
+    elif event == "npc":
+        # Unopened chests (from the world cache) whose riddle is not yet answered
+        solved = random_pick.solved_riddle_ids(db, squire_id)
+        candidates = [
+            coord for coord, (_, riddle_id, is_opened) in ctx.world.chests.items()
+            if not is_opened and riddle_id not in solved
+        ]
+        coords = random.choice(candidates) if candidates else None
+
+        if coords:
+            chest_x, chest_y = coords
+            message = f"🌿 A wandering trader appears: 'There's a chest at ({chest_x},{chest_y}). I tried to open it but couldn't figure out the riddle. Good luck!'"
+            flask_session['npc_message'] = message
+            flask_session.modified = True
+            logging.debug(f"NPC Message Set: {message}")
+
+            # Add chest hint (skipped if the squire already has one for that chest)
+            db.execute(
+                insert_ignore(ChestHint, db.get_bind()),
+                {"squire_quest_id": squire_quest_id, "chest_x": chest_x, "chest_y": chest_y}
+            )
+            db.commit()
+            record_hint(squire_quest_id, chest_x, chest_y)
+
+    elif event == "blacksmith":
+        return {"redirect": url_for("town.blacksmith"), "message": message}, message
+
+    elif event == "npc_trader":
+        return {"redirect": url_for("town.wandering_trader"), "message": message}, message
+
+    return None, message
+
+
 @map_bp.route('/ajax_move', methods=['POST'])
 def ajax_move():
     """Handle player movement with proper database transaction management."""
     event = None
     message = ""
-    x = y = tm = None
+    x = y = tm = stats = None
 
     # Get session data
     squire_id = flask_session.get("squire_id")
@@ -109,210 +219,64 @@ def ajax_move():
     if not squire_id:
         return jsonify({"error": "Session expired. Please log in again."}), 400
 
-    # Get movement direction from AJAX request
+    # Get movement direction (and the map version the client holds) from AJAX request
     direction = request.json.get("direction")
+    client_world = request.json.get("world")
+    client_version = request.json.get("version")
 
     # Create database session with context manager for proper cleanup
     with db_session() as db:
+        current_position = None
         try:
-            # Get current level
-            level = db.query(Squire.level).filter(Squire.id == squire_id).scalar()
+            # Load the squire, inventory, riddle counts and cached world once
+            ctx = load_move_context(db, squire_id, quest_id, squire_quest_id)
+            if not ctx:
+                return jsonify({"error": "Squire not found."}), 400
+
+            level = ctx.level
             flask_session["level"] = level
 
-            # Get current position (used as fallback)
-            current_position = db.query(Squire.x_coordinate, Squire.y_coordinate).filter(Squire.id == squire_id).one()
+            # Current position (used as fallback)
+            current_position = ctx.position
             x, y = current_position
 
             # Process movement based on direction
             if direction in ("N", "S", "E", "W"):
-                # Check food requirement
-                ok, food_message = consume_food(squire_id)
-                if not ok:
-                    game_map = get_viewport_map(db, squire_id, quest_id, 15)
+                # Food, position, encounter odds, completion and chest in memory
+                result = step(db, ctx, direction)
+                stats = ctx.stats()
+                if not result["ok"]:
+                    # nobody moved, so the client's tiles are still current
                     return jsonify({
-                        "map": game_map,
                         "position": (x, y),
-                        "message": food_message,      # "You have no food!"
+                        "message": result["food_message"],      # "You have no food!"
                         "level": level,
+                        "stats": stats,
                     })
 
-                # Update player position (with transaction)
-                x, y, tm = update_player_position(db, squire_id, direction)
-                db.commit()  # Ensure position update is committed
+                # Flush food, position, travel history and chest hint in one commit
+                commit_move(db, ctx)
+                logging.debug(f"ajax_move: {statement_count()} statements after commit")
 
-                if food_message:
-                    message = f"{food_message} \n {tm}"
+                x, y = result["position"]
+                tm = result["message"]
+                if result["food_message"]:
+                    message = f"{result['food_message']} \n {tm}"
 
-                # Calculate combat probability
-                p = calculate_enemy_encounter_probability(squire_id, quest_id, x, y, squire_quest_id)
-                logging.debug(f"Combat Probability: {p}")
+                # Combat probability
+                logging.debug(f"Combat Probability: {result['probability']}")
 
                 # Check for quest completion
-                if check_quest_completion(squire_id, quest_id):
-                    flask_session["quest_completed"] = True
-                    completed, messages = complete_quest(squire_id, quest_id)
-
-                    if completed:
-                        for msg in messages:
-                            flash(msg, "success")  # or use "quest" if you're styling categories
-
-                        return jsonify({
-                            "redirect": url_for("quest_select"),
-                            "position": (x, y),
-                            "message": message
-                        })
-
-                # Check for boss fight
-                if quest_id == 14 and x == 40 and y == 40:
-                    logging.debug("🏰 Boss fight triggered! Player reached (40,40) during quest 14.")
-                    event = "q14bossfight"
-                    return jsonify({
-                        "boss_fight": True,
-                        "message": "You have reached the stronghold! Prepare to face the boss!",
-                        "position": (x, y),
-                        "event": event
-                    })
-                if quest_id == 28 and x == -35 and y == -35:
-                    logging.debug("🏰 The Tourney Has Been Reached in quest 28.")
-                    event = "q28tourney"
-                    return jsonify({
-                        "boss_fight": True,
-                        "message": "You have reached the Tournament where Squires show their true mettle!",
-                        "position": (x, y),
-                        "event": event
-                    })
+                if result["completed"]:
+                    response = _complete_quest_response(squire_id, quest_id, x, y, message)
+                    if response:
+                        return jsonify(response)
 
-                if quest_id == 32 and x == -35 and y == -35:
-                    logging.debug("🏰 The Tourney Has Been Reached in quest 32.")
-                    event = "q32tourney"
-                    return jsonify({
-                        "boss_fight": True,
-                        "message": "You have reached the Tournament where Squires show their true mettle!",
-                        "position": (x, y),
-                        "event": event
-                    })
-
-                if quest_id == 39 and x == -25 and y == 50:
-                    logging.debug("Welcome to the FINAL Dungeon, Squire!")
-                    event = "dungeon"
-                    if not dungeon_exists(squire_id=squire_id, quest_id=39):
-                        room_data = generate_dungeon(squire_id=squire_id)
-                        insert_dungeon_to_db(room_data, squire_id)
-
-                    flask_session["in_dungeon"] = True
-                    flask_session["dungeon_pos"] = (0, 0)  # Start of dungeon
-                    return jsonify({
-                        "boss_fight": True,
-                        "message": "You have reached the Dungeon!",
-                        "event": event
-                        })
-
-                if x == 0 and y == 0:
-                    # Redirect to town
-                    return jsonify({
-                        "redirect": url_for("town.visit_town"),
-                        "position": (x, y),
-                        "message": message
-                    })
-
-                # Check for treasure
-                chest = check_for_treasure_at_location(squire_id, x, y, quest_id, squire_quest_id)
-                if chest:
-                    logging.debug(f"Found a treasure chest at {x},{y}.")
-                    flask_session["current_treasure_id"] = chest.id  # Store chest in session
-                    event = "treasure"
-
-                    # Record chest hint (only if new)
-                    existing = db.query(ChestHint).filter_by(
-                        squire_quest_id=squire_quest_id,
-                        chest_x=x,
-                        chest_y=y
-                    ).first()
-
-                    if not existing:
-                        hint = ChestHint(
-                            squire_quest_id=squire_quest_id,
-                            chest_x=x,
-                            chest_y=y
-                        )
-                        db.add(hint)
-                        db.commit()
-                    else:
-                        logging.debug("👍 ChestHint already recorded for that location.")
-                else:
-                    # Random encounters
-                    eligible_events = []
-
-                    # 🏞️ NPC Encounter
-                    if random.random() < 0.02:
-                        eligible_events.append("npc")
-
-                    if random.random() < 0.03:
-                        eligible_events.append("npc_trader")
-
-                    # 🧙‍♂️ Riddle Encounter
-                    if random.random() < 0.02:
-                        eligible_events.append("riddle")
-
-                    # ⚔️ Combat
-                    if random.random() < p:
-                        eligible_events.append("enemy")
-
-                    if random.random() < 0.02 and level > 3:
-                        eligible_events.append("blacksmith")
-
-                    if eligible_events:
-                        event = random.choice(eligible_events)
-
-                    # Process selected event
-                    if event == "npc":
-                        coords = (
-                            db.query(
-                                TreasureChest.x_coordinate,
-                                TreasureChest.y_coordinate
-                            )
-                            .join(
-                                Riddle,
-                                TreasureChest.riddle_id == Riddle.id
-                            )
-                            .outerjoin(
-                                SquireRiddleProgress,
-                                and_(
-                                    SquireRiddleProgress.riddle_id == Riddle.id,
-                                    SquireRiddleProgress.squire_id == squire_id
-                                )
-                            )
-                            .filter(
-                                SquireRiddleProgress.riddle_id == None,           # not yet answered
-                                Riddle.quest_id == quest_id,
-                                TreasureChest.is_opened == False,
-                                TreasureChest.squire_quest_id == squire_quest_id
-                            )
-                            .order_by(func.rand())  # MySQL's RAND()
-                            .limit(1)
-                            .first()
-                        )
-
-                        if coords:
-                            chest_x, chest_y = coords
-                            message = f"🌿 A wandering trader appears: 'There's a chest at ({chest_x},{chest_y}). I tried to open it but couldn't figure out the riddle. Good luck!'"
-                            flask_session['npc_message'] = message
-                            flask_session.modified = True
-                            logging.debug(f"NPC Message Set: {message}")
-
-                            # Add chest hint
-                            db.add(ChestHint(
-                                squire_quest_id=squire_quest_id,
-                                chest_x=chest_x,
-                                chest_y=chest_y
-                            ))
-                            db.commit()
-
-                    elif event == "blacksmith":
-                        return jsonify({"redirect": url_for("town.blacksmith"), "message": message})
-
-                    elif event == "npc_trader":
-                        return jsonify({"redirect": url_for("town.wandering_trader"), "message": message})
+                # Scripted landmarks, town, treasure or a random encounter
+                event = arrival_event(ctx, result)
+                response, message = _resolve_event(db, ctx, event, result["chest_id"], message)
+                if response:
+                    return jsonify(response)
 
             # Non-directional or town-related commands
             else:
@@ -345,19 +309,26 @@ def ajax_move():
                     event = "inventory"
                     return jsonify({"redirect": url_for("town.inventory"), "message": message})
 
-            # Generate updated map view
-            game_map = get_viewport_map(db, squire_id, quest_id, 15)
-            if not game_map:
-                logging.error("❌ ERROR: get_viewport_map() returned None!")
+            # Map update: the strip that scrolled into view plus the tiles changed since
+            # the client's version; the full viewport if the client is out of sync
+            map_tiles = None
+            if squire_quest_id:
+                map_tiles = move_tiles(ctx.world, current_position, (x, y), direction,
+                                       client_world, client_version)
+            if not map_tiles:
+                map_tiles = viewport_tiles(db, squire_id, quest_id, squire_quest_id, (x, y))
+            if not map_tiles:
+                logging.error("❌ ERROR: viewport_tiles() returned None!")
                 return jsonify({"error": "Failed to load the updated map."}), 500
 
             # Build and return response
             return jsonify({
-                "map": game_map,
+                "tiles": map_tiles,
                 "message": message,
                 "position": (x, y),
                 "event": event,
-                "level": level
+                "level": level,
+                "stats": stats
             })
 
         except Exception as e:
@@ -367,6 +338,170 @@ def ajax_move():
                 "error": "An error occurred while processing your movement.",
                 "position": current_position  # Return the last known good position
             }), 500
+
+
+def _walk_response(db, ctx, path: str, current_position, route_length: int | None = None) -> dict:
+    """
+    Walks `path` for /ajax_move_path and /ajax_travel_to: every step in
+    memory, one commit, then whatever the last step ran into.
+    """
+    squire_id, quest_id, squire_quest_id = ctx.squire_id, ctx.quest_id, ctx.squire_quest_id
+
+    # 1) Every step in memory, then one commit for the whole walk
+    result, steps, stop = walk_path(db, ctx, path)
+    stats = ctx.stats()
+    commit_move(db, ctx)
+    logging.debug(f"walk: {steps}/{len(path)} steps ({stop}), {statement_count()} statements")
+
+    x, y = ctx.position
+    if not result["ok"]:
+        message = result["food_message"]
+    else:
+        message = f"{result['food_message']} \n {result['message']}" if result["food_message"] else ""
+
+    reply = {"position": (x, y), "steps": steps, "stop": stop, "level": ctx.level, "stats": stats}
+    if route_length is not None:
+        reply["remaining"] = route_length - steps
+
+    # 2) Whatever the last step ran into, as /ajax_move would handle it
+    if stop == "quest_complete":
+        response = _complete_quest_response(squire_id, quest_id, x, y, message)
+        if response:
+            return {**reply, **response}
+
+    event = result.get("event")
+    response, message = _resolve_event(db, ctx, event, result["chest_id"], message)
+    if response:
+        return {**reply, **response}
+
+    # 3) Map update relative to the client's version
+    map_tiles = None
+    if squire_quest_id:
+        map_tiles = move_tiles(ctx.world, current_position, (x, y), path[0],
+                               request.json.get("world"), request.json.get("version"))
+    if not map_tiles:
+        map_tiles = viewport_tiles(db, squire_id, quest_id, squire_quest_id, (x, y))
+    if not map_tiles:
+        raise RuntimeError("viewport_tiles() returned None")
+
+    return {**reply, "tiles": map_tiles, "message": message, "event": event}
+
+
+@map_bp.route('/ajax_move_path', methods=['POST'])
+def ajax_move_path():
+    """
+    Walks up to MOVE_PATH_MAX_STEPS steps in one request, running the same
+    food / position / encounter / chest checks as /ajax_move for each tile
+    and stopping at the first event. Travel history and the final position
+    are committed once, and the reply says why the walk stopped.
+    """
+    squire_id = flask_session.get("squire_id")
+    quest_id = flask_session.get("quest_id")
+    squire_quest_id = flask_session.get("squire_quest_id")
+    if not squire_id:
+        return jsonify({"error": "Session expired. Please log in again."}), 400
+
+    # A string like "NNEE" or a list of directions
+    path = list(request.json.get("path") or [])
+    if not path or len(path) > MOVE_PATH_MAX_STEPS or any(d not in DELTAS for d in path):
+        return jsonify({"error": f"A path must be 1-{MOVE_PATH_MAX_STEPS} steps of N, S, E or W."}), 400
+
+    with db_session() as db:
+        current_position = None
+        try:
+            ctx = load_move_context(db, squire_id, quest_id, squire_quest_id)
+            if not ctx:
+                return jsonify({"error": "Squire not found."}), 400
+            flask_session["level"] = ctx.level
+            current_position = ctx.position
+
+            return jsonify(_walk_response(db, ctx, "".join(path), current_position))
+
+        except Exception as e:
+            db.rollback()
+            logging.exception(f"Error in /ajax_move_path: {e}")
+            return jsonify({
+                "error": "An error occurred while processing your movement.",
+                "position": current_position
+            }), 500
+
+
+@map_bp.route('/ajax_travel_to', methods=['POST'])
+def ajax_travel_to():
+    """
+    Click-to-travel: plans a legal route to (x, y) around the terrain the
+    squire can't cross, then walks its first MOVE_PATH_MAX_STEPS steps like
+    /ajax_move_path. "remaining" tells the client how much of the route is left.
+    """
+    squire_id = flask_session.get("squire_id")
+    quest_id = flask_session.get("quest_id")
+    squire_quest_id = flask_session.get("squire_quest_id")
+    if not squire_id:
+        return jsonify({"error": "Session expired. Please log in again."}), 400
+    if not squire_quest_id:
+        return jsonify({"error": "Start a quest before travelling."}), 400
+
+    try:
+        goal = (int(request.json.get("x")), int(request.json.get("y")))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Travel needs whole-number x and y coordinates."}), 400
+
+    with db_session() as db:
+        current_position = None
+        try:
+            ctx = load_move_context(db, squire_id, quest_id, squire_quest_id)
+            if not ctx:
+                return jsonify({"error": "Squire not found."}), 400
+            flask_session["level"] = ctx.level
+            current_position = ctx.position
+
+            if not in_route_bounds(ctx.world, current_position, goal):
+                return jsonify({"error": f"({goal[0]}, {goal[1]}) is beyond the edge of your map."}), 400
+
+            # 1) Route around what the squire can't cross, and past the town / landmarks
+            avoid = {(0, 0)} | {(lx, ly) for q, lx, ly in LANDMARKS if q == quest_id}
+            route = find_route(ctx.world, current_position, goal,
+                               boots=ctx.capabilities.has(BOOTS), boat=ctx.capabilities.has(BOAT), avoid=avoid)
+            if not route:
+                arrived = route == ""
+                return jsonify({
+                    "position": current_position,
+                    "steps": 0,
+                    "remaining": 0,
+                    "stop": "arrived" if arrived else "no_route",
+                    "message": "" if arrived else f"🧭 You can't find a way to ({goal[0]}, {goal[1]}) with what you carry."
+                })
+
+            # 2) Walk the first stretch of it
+            return jsonify(_walk_response(db, ctx, route[:MOVE_PATH_MAX_STEPS], current_position, len(route)))
+
+        except Exception as e:
+            db.rollback()
+            logging.exception(f"Error in /ajax_travel_to: {e}")
+            return jsonify({
+                "error": "An error occurred while processing your movement.",
+                "position": current_position
+            }), 500
+
+
+@map_bp.route('/map_tiles', methods=['GET'])
+def map_tiles():
+    """Full encoded viewport around the squire (page load and client resync)."""
+    squire_id = flask_session.get("squire_id")
+    if not squire_id:
+        return jsonify({"error": "Session expired. Please log in again."}), 400
+
+    db = db_session()
+    try:
+        position = db.query(Squire.x_coordinate, Squire.y_coordinate).filter(Squire.id == squire_id).one()
+        tiles = viewport_tiles(db, squire_id, flask_session.get("quest_id"),
+                               flask_session.get("squire_quest_id"), tuple(position))
+        if not tiles:
+            return jsonify({"error": "Failed to load the map."}), 500
+        return jsonify(tiles)
+    finally:
+        db.close()
+
 ## riddles and treasure encounters here
 
 @map_bp.route('/riddle_encounter', methods=['GET'])
@@ -379,22 +514,11 @@ def riddle_encounter():
 
     db = db_session()
     try:
-        # 1) Query one random Riddle not yet in SquireRiddleProgress for this squire
-        r = (
-            db.query(Riddle)
-              .outerjoin(
-                  SquireRiddleProgress,
-                  and_(
-                      SquireRiddleProgress.riddle_id == Riddle.id,
-                      SquireRiddleProgress.squire_id  == squire_id
-                  )
-              )
-              .filter(
-                  SquireRiddleProgress.riddle_id == None,
-                  Riddle.quest_id               == quest_id
-              )
-              .order_by(func.rand())
-              .first()
+        # 1) One random Riddle not yet in SquireRiddleProgress for this squire
+        r = random_pick.pick(
+            db, Riddle, ("quest", quest_id),
+            Riddle.quest_id == quest_id,
+            exclude=random_pick.solved_riddle_ids(db, squire_id)
         )
 
         if not r:
@@ -698,6 +822,7 @@ def check_treasure():
             # 6) Mark chest opened
             chest = db.query(TreasureChest).get(chest_id)
             chest.is_opened = True
+            opened_at = (chest.squire_quest_id, chest.x_coordinate, chest.y_coordinate)
 
             # 7) Commit all changes
             new_attempt = SquireQuestionAttempt(
@@ -711,6 +836,7 @@ def check_treasure():
             try:
                 db.add(new_attempt)
                 db.commit()
+                record_chest_opened(*opened_at)
             except Exception as e:
                 logging.error(f"Error committing for FITB question {e}")
 
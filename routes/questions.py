@@ -15,6 +15,7 @@ from utils.shared import update_squire_question
 
 from utils.api_calls import generate_openai_question
 from services.progress import update_squire_progress
+from services import random_pick, question_pool
 
 questions_bp = Blueprint('questions', __name__)
 
@@ -49,29 +50,12 @@ def handle_true_false_question():
 
     db = db_session()
     try:
-        # 1) Fetch a random True/False question not yet seen twice
-        #    (assumes your SquireQuestion model has a times_encountered field)
-        tq = (
-            db.query(
-                TrueFalseQuestion.id,
-                TrueFalseQuestion.question,
-                TrueFalseQuestion.correct_answer
-            )
-            .outerjoin(
-                SquireQuestion,
-                and_(
-                    SquireQuestion.question_id == TrueFalseQuestion.id,
-                    SquireQuestion.squire_id  == squire_id
-                )
-            )
-            .filter(
-                TrueFalseQuestion.quest_id == quest_id,
-                # either never seen or seen fewer than 2 times
-                (SquireQuestion.times_encountered == None) |
-                (SquireQuestion.times_encountered < 2)
-            )
-            .order_by(func.rand())
-            .first()
+        # 1) Fetch a random True/False question, preferring ones not yet seen
+        tq = random_pick.pick(
+            db, TrueFalseQuestion, ("quest", quest_id),
+            TrueFalseQuestion.quest_id == quest_id,
+            exclude=random_pick.answered_question_ids(db, squire_id, 'true_false'),
+            allow_repeats=True
         )
 
         # 2) No question available
@@ -225,69 +209,62 @@ def answer_question():
 
     db = db_session()
 
-    if pending_job:
-        if pending_job["job_id"] > 2:
-            question_type = random.choice(["true_false", "multiple_choice"])
-        else:
-            question_type = "true_false"
-
-    else:
-        enemy = flask_session.get("enemy")
-        enemylevel = enemy["min_level"]
+    try:
+        if pending_job:
+            if pending_job["job_id"] > 2:
+                question_type = random.choice(["true_false", "multiple_choice"])
+            else:
+                question_type = "true_false"
 
-        if level > 2 and enemylevel > 2:
-            question_type = random.choice(["true_false", "multiple_choice", "api_question"])
         else:
-            question_type = "true_false"
-
-    if question_type == "true_false":
-        try:
-            # 1) Total questions in this quest
-            total_qs = (
-                db.query(TrueFalseQuestion)
-                  .filter(TrueFalseQuestion.quest_id == quest_id)
-                  .count()
-            )
+            enemy = flask_session.get("enemy")
+            enemylevel = enemy["min_level"]
 
-            # 2) Which question_ids has this squire already encountered?
-            answered_rows = (
-                db.query(SquireQuestion.question_id)
-                  .filter(
-                      SquireQuestion.squire_id   == squire_id,
-                      SquireQuestion.question_type == 'true_false'
-                  )
-                  # only consider those tied to this quest
-                  .join(TrueFalseQuestion,
-                        SquireQuestion.question_id == TrueFalseQuestion.id)
-                  .filter(TrueFalseQuestion.quest_id == quest_id)
-                  .all()
-            )
-            answered_ids = {qid for (qid,) in answered_rows}
-            answered_count = len(answered_ids)
-
-            # 3) Build the base query
-            q = (
-                db.query(
-                    TrueFalseQuestion.id,
-                    TrueFalseQuestion.question,
-                    TrueFalseQuestion.correct_answer
-                )
-                .filter(TrueFalseQuestion.quest_id == quest_id)
-            )
+            if level > 2 and enemylevel > 2:
+                question_type = random.choice(["true_false", "multiple_choice", "api_question"])
+            else:
+                question_type = "true_false"
+
+        # API questions come from the pre-generated pool (no GPT call here); fall
+        # back to the multiple choice bank while the quest's pool is being filled
+        if question_type == "api_question":
+            pooled = question_pool.draw(db, squire_id, quest_id)
+            if pooled:
+                flask_session["current_question"] = {
+                    "id": "api",  # validated against the session copy
+                    "pool_id": pooled.id,
+                    "type": "api_generated",
+                    "text": pooled.question_text,
+                    "options": {
+                        "A": pooled.optionA,
+                        "B": pooled.optionB,
+                        "C": pooled.optionC,
+                        "D": pooled.optionD
+                    },
+                    "correct_answer": pooled.correctAnswer,
+                    "hint": f"📖 See page {pooled.page_number} of {pooled.book_name}." if pooled.page_number else None
+                }
+                return render_template("answer_question_mc.html", question=flask_session["current_question"])
+            question_type = "multiple_choice"
 
-            # 4) If not yet answered all, exclude those already seen
-            if answered_count < total_qs:
-                q = q.filter(~TrueFalseQuestion.id.in_(answered_ids))
+        if question_type == "true_false":
+            # 1) Which question_ids has this squire already encountered?
+            answered_ids = random_pick.answered_question_ids(db, squire_id, 'true_false')
 
-            # 5) Grab a random one
-            question_row = q.order_by(func.rand()).first()
+            # 2) Grab a random unseen one (any one, once all have been seen)
+            question_row = random_pick.pick(
+                db, TrueFalseQuestion, ("quest", quest_id),
+                TrueFalseQuestion.quest_id == quest_id,
+                exclude=answered_ids,
+                allow_repeats=True
+            )
 
-            # 6) No question left?
+            # 3) No question left?
             if not question_row:
                 flask_session["battle_summary"] = "No question available. You must fight!"
                 return redirect(url_for("combat.combat"))
 
-            # 7) Store for validation and render
+            # 4) Store for validation and render
             flask_session["current_question"] = {
                 "id":   question_row.id,
                 "text": question_row.question
@@ -300,79 +277,33 @@ def answer_question():
                     # note: template probably doesn’t need correct_answer
                 }
             )
-        finally:
-            db.close()
 
-    elif question_type == "api_question":
-
-        try:
-            q_data = generate_openai_question(quest_id)
+        else:
+            # Random unseen multiple choice question (any one, once all have been seen)
+            mc_question = random_pick.pick(
+                db, MultipleChoiceQuestion, ("quest", quest_id),
+                MultipleChoiceQuestion.quest_id == quest_id,
+                exclude=random_pick.answered_question_ids(db, squire_id, 'multiple_choice'),
+                allow_repeats=True
+            )
+            if not mc_question:
+                flask_session["battle_summary"] = "No question available. You must fight!"
+                return redirect(url_for("combat.combat"))
 
-            # Save it in session for validation
             flask_session["current_question"] = {
-                "id": "api",  # No DB ID
-                "type": "api_generated",
-                "text": q_data["question"],
-                "options": q_data["options"],
-                "correct_answer": q_data["correct_answer"]
+                "id": mc_question.id,
+                "text": mc_question.question_text,
+                "type": "multiple_choice",
+                "options": {
+                    "A": mc_question.optionA,
+                    "B": mc_question.optionB,
+                    "C": mc_question.optionC,
+                    "D": mc_question.optionD
+                }
             }
-
             return render_template("answer_question_mc.html", question=flask_session["current_question"])
-        except Exception as e:
-            flask_session["battle_summary"] = f"OpenAI Error: {e}"
-            return redirect(url_for("ajax_handle_combat"))
-
-    else:
-        # Grab answered multiple choice question IDs
-        mc_answered_rows = (
-            db.query(SquireQuestion.question_id)
-              .filter(
-                  SquireQuestion.squire_id == squire_id,
-                  SquireQuestion.question_type == 'multiple_choice'
-              )
-              .join(MultipleChoiceQuestion,
-                    SquireQuestion.question_id == MultipleChoiceQuestion.id)
-              .filter(MultipleChoiceQuestion.quest_id == quest_id)
-              .all()
-        )
-        mc_answered_ids = {qid for (qid,) in mc_answered_rows}
-        mc_total_qs = (
-            db.query(MultipleChoiceQuestion)
-              .filter(MultipleChoiceQuestion.quest_id == quest_id)
-              .count()
-        )
-        mc_q = (
-            db.query(
-                MultipleChoiceQuestion.id,
-                MultipleChoiceQuestion.question_text,
-                MultipleChoiceQuestion.optionA,
-                MultipleChoiceQuestion.optionB,
-                MultipleChoiceQuestion.optionC,
-                MultipleChoiceQuestion.optionD,
-                MultipleChoiceQuestion.correctAnswer
-            )
-            .filter(MultipleChoiceQuestion.quest_id == quest_id)
-        )
-        if len(mc_answered_ids) < mc_total_qs:
-            mc_q = mc_q.filter(~MultipleChoiceQuestion.id.in_(mc_answered_ids))
-
-        mc_question = mc_q.order_by(func.rand()).first()
-        if not mc_question:
-            flask_session["battle_summary"] = "No question available. You must fight!"
-            return redirect(url_for("combat.combat"))
-
-        flask_session["current_question"] = {
-            "id": mc_question.id,
-            "text": mc_question.question_text,
-            "type": "multiple_choice",
-            "options": {
-                "A": mc_question.optionA,
-                "B": mc_question.optionB,
-                "C": mc_question.optionC,
-                "D": mc_question.optionD
-            }
-        }
-        return render_template("answer_question_mc.html", question=flask_session["current_question"])
+    finally:
+        db.close()
 
 @questions_bp.route('/check_true_false_question', methods=['POST'])
 def check_true_false_question():
@@ -582,7 +513,7 @@ def check_MC_question_enemy():
             correct = (user_answer == current_q["correct_answer"])
 
             if correct:
-                new_attempt = update_squire_question_attempt(db, squire_id, -1, 'api_generated', True, quest_id)
+                new_attempt = update_squire_question_attempt(db, squire_id, current_q.get("pool_id", -1), 'api_generated', True, quest_id)
                 new_question = update_squire_question(db, squire_id, -int(uuid.uuid4().int % 1000000000), 'api_generated', True)
 
                 team = db.query(Team).get(flask_session['team_id'])
@@ -623,7 +554,7 @@ def check_MC_question_enemy():
             else:
                 # Damage gear and penalize XP
                 degrade_gear(squire_id, enemy.get("weakness"))
-                new_attempt = update_squire_question_attempt(db, squire_id, -1, 'api_generated', False, quest_id)
+                new_attempt = update_squire_question_attempt(db, squire_id, current_q.get("pool_id", -1), 'api_generated', False, quest_id)
 
                 squire = db.query(Squire).get(squire_id)
                 if source == "dungeon":
@@ -641,6 +572,7 @@ def check_MC_question_enemy():
                     if enemy
                     else "❌ Wrong answer: you lose some experience points!\n"
                 )
+                hint = current_q.get("hint")
                 hint_text = f"{hint}" if hint else ""
                 flask_session["combat_result"] = base_message + hint_text
                 flask_session["success"] = False
@@ -837,56 +769,23 @@ def answer_MC_question():
     db = db_session()
     try:
         # 1) Find which MC questions this squire has already seen
-        answered_rows = (
-            db.query(SquireQuestion.question_id)
-              .filter(
-                  SquireQuestion.squire_id    == squire_id,
-                  SquireQuestion.question_type == 'multiple_choice'
-              )
-              .all()
-        )
-        answered_ids = {qid for (qid,) in answered_rows}
+        answered_ids = random_pick.answered_question_ids(db, squire_id, 'multiple_choice')
         mode = flask_session.get("mode")
 
-        # 2) Fetch a random MCQ with quest_id < current and not yet seen
-
+        # 2) Fetch a random MCQ from the quests this fight draws on, not yet seen
         if  mode == "tournament" and quest_id == 28:
-            mcq = (
-                db.query(MultipleChoiceQuestion)
-                    .filter(
-                        MultipleChoiceQuestion.quest_id.in_([23, 24, 25, 26, 27]),
-                        ~MultipleChoiceQuestion.id.in_(answered_ids)
-                        )
-                        .order_by(func.rand())
-                        .first()
-                    )
+            quest_ids = [23, 24, 25, 26, 27]
+            key, criteria = ("quests", *quest_ids), MultipleChoiceQuestion.quest_id.in_(quest_ids)
         elif mode == "combat" and quest_id == 14:
-            mcq = (
-                db.query(MultipleChoiceQuestion)
-                    .filter(
-                        MultipleChoiceQuestion.quest_id.in_([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 12, 13]),
-                        ~MultipleChoiceQuestion.id.in_(answered_ids)
-                        )
-                        .order_by(func.rand())
-                        .first()
-                    )
+            quest_ids = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 12, 13]
+            key, criteria = ("quests", *quest_ids), MultipleChoiceQuestion.quest_id.in_(quest_ids)
         elif mode == "tournament" and quest_id == 32:
-            mcq = (
-                db.query(MultipleChoiceQuestion)
-                    .filter(
-                        MultipleChoiceQuestion.quest_id.in_([15, 16, 17, 18, 19, 20, 21, 22, 29, 30, 31]),
-                        ~MultipleChoiceQuestion.id.in_(answered_ids)
-                        )
-                        .order_by(func.rand())
-                        .first()
-                    )
+            quest_ids = [15, 16, 17, 18, 19, 20, 21, 22, 29, 30, 31]
+            key, criteria = ("quests", *quest_ids), MultipleChoiceQuestion.quest_id.in_(quest_ids)
         else:
-            mcq = ( db.query(MultipleChoiceQuestion)
-            .filter(MultipleChoiceQuestion.quest_id < quest_id,
-            ~MultipleChoiceQuestion.id.in_(answered_ids))
-            .order_by(func.rand())
-            .first()
-            )
+            key, criteria = ("before_quest", quest_id), MultipleChoiceQuestion.quest_id < quest_id
+
+        mcq = random_pick.pick(db, MultipleChoiceQuestion, key, criteria, exclude=answered_ids)
 
         if not mcq:
             flask_session["battle_summary"] = "No question available. You must flee!"
@@ -5,7 +5,6 @@ import random
 from collections import defaultdict
 from sqlalchemy import create_engine, func, and_, select
 from dotenv import load_dotenv
-from openai import OpenAI
 
 import re
 import os
@@ -13,11 +12,11 @@ import json
 import logging
 
 
-client = OpenAI(api_key=os.getenv("OPENAI_APIKEY"))
-
-
 from utils.shared import get_inventory
-from utils.api_calls import generate_npc_response
+from utils.api_calls import blacksmith_haggle
+from services import jobs, leaderboard
+from services.catalogue import get_catalogue
+from types import SimpleNamespace
 
 load_dotenv()
 
@@ -86,7 +85,7 @@ def get_repair_quote():
         if not item or "magic" in item.description.lower():
             return jsonify({"error": "Invalid or magical item"}), 400
 
-        shop_item = db.query(ShopItem).filter_by(item_name=item.item_name).first()
+        shop_item = get_catalogue().shop_item_named(item.item_name)
         if not shop_item:
             return jsonify({"error": "Original item data not found"}), 404
 
@@ -152,7 +151,7 @@ def blacksmith():
         max_uses = squire.level * 4
 
         # Exclude wizard items
-        wizard_item_names = db.query(WizardItem.item_name)
+        wizard_item_names = get_catalogue().wizard_item_names()
         broken_items = (
             db.query(Inventory)
             .filter(
@@ -221,40 +220,37 @@ def blacksmith():
             "rounds": rounds
         }
 
-        result = generate_npc_response("blacksmith", context)
-        reply_text = result["reply_text"]
-        counteroffer = result.get("counteroffer")
-
-        # FIX: Better fallback logic when GPT doesn't return a counteroffer
-        if not counteroffer:
-            # Calculate a reasonable counteroffer instead of using user's offer
-            original_quote = flask_session.get("blacksmith_quote", 100)
-            previous_offer = flask_session.get("blacksmith_offer", original_quote)
-
-            if offer < previous_offer:
-                # User offered less, blacksmith comes down a bit
-                reduction = (previous_offer - offer) * 0.3  # 30% of the gap
-                counteroffer = max(
-                    round(previous_offer - reduction),
-                    offer + 5,  # At least 5 more than user's offer
-                    round(original_quote * 0.4)  # Never go below 40% of original
-                )
-            else:
-                # User offered more than or equal to current offer, accept it
-                counteroffer = offer
-
-        flask_session["blacksmith_offer"] = counteroffer
-        flask_session["blacksmith_reply"] = reply_text
-        flask_session.modified = True
+        # The page sends back the blacksmith's last counteroffer it displayed
+        if request.form.get("last_offer", "").isdigit():
+            flask_session["blacksmith_offer"] = int(request.form["last_offer"])
+
+        # Fallback counteroffer, used when GPT doesn't return one
+        original_quote = flask_session.get("blacksmith_quote", 100)
+        previous_offer = flask_session.get("blacksmith_offer", original_quote)
+
+        if offer < previous_offer:
+            # User offered less, blacksmith comes down a bit
+            reduction = (previous_offer - offer) * 0.3  # 30% of the gap
+            fallback_offer = max(
+                round(previous_offer - reduction),
+                offer + 5,  # At least 5 more than user's offer
+                round(original_quote * 0.4)  # Never go below 40% of original
+            )
+        else:
+            # User offered more than or equal to current offer, accept it
+            fallback_offer = offer
 
+        # AJAX: reply in the background, the page polls /jobs/<id>
         if accept_json:
-            return jsonify({
-                "reply": reply_text,
-                "offer": counteroffer,
-                "rounds": rounds
-            })
-        else:
-            return redirect(url_for('town.blacksmith'))
+            job_id = jobs.enqueue("blacksmith_haggle", context, fallback_offer, owner=squire_id)
+            return jsonify({"job_id": job_id, "rounds": rounds}), 202
+
+        # Plain form post: wait for the reply
+        result = blacksmith_haggle(context, fallback_offer)
+        flask_session["blacksmith_offer"] = result["offer"]
+        flask_session["blacksmith_reply"] = result["reply"]
+        flask_session.modified = True
+        return redirect(url_for('town.blacksmith'))
 
     except Exception as e:
         logging.error(f"Error in blacksmith: {e}")
@@ -279,7 +275,7 @@ def wandering_trader():
     if request.method == 'POST':
         item_id = int(request.form['item_id'])
         agreed_price = int(request.form.get('agreed_price') or 0)
-        shop_item = db.query(ShopItem).get(item_id)
+        shop_item = get_catalogue().shop_item(item_id)
 
         if agreed_price <= 0:
             agreed_price = int(request.form.get(f'price_{item_id}', shop_item.price))
@@ -304,16 +300,9 @@ def wandering_trader():
         flask_session['game_message'] = message
         return redirect(url_for('map_view'))
 
-    trader_items = (
-    db.query(ShopItem)
-        .filter(
-            ShopItem.available_to_trader == True,
-            ShopItem.min_level <= squire.level  # Only show items at or below the squire's level
-        )
-        .order_by(func.rand())
-        .limit(3)
-        .all()
-    )
+    # Only show items at or below the squire's level
+    trader_stock = get_catalogue().trader_items_for_level(squire.level)
+    trader_items = random.sample(trader_stock, min(3, len(trader_stock)))
 
     item_info = [
         {
@@ -402,44 +391,16 @@ def negotiate(npc_type):
         })
 
 
-    personality = {
-        "blacksmith": "gruff but fair, values honesty",
-        "trader": "wily, smooth-talking, always looking for a profit"
-    }.get(npc_type, "neutral")
-
-    system_prompt = f"You are a {npc_type}, {personality}. You're haggling over an item in a fantasy town."
-
-    user_prompt = (
-        f"The player offered {offer} gold for '{item}', normally worth {base_price} gold. "
-        "Respond as a clever NPC, and include a number for your counteroffer in the reply. "
-        "Your response should be short, and end with: [Counteroffer: <amount>]"
-    )
-
-    try:
-        response = client.chat.completions.create(model="gpt-4",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ])
-        npc_reply = response.choices[0].message.content
-
-        match = re.search(r"\[Counteroffer:\s*(\d+)", npc_reply)
-        counteroffer = int(match.group(1)) if match else base_price
-
-        print("🤖 NPC reply:", npc_reply)
-        print("🔍 Parsed counteroffer:", counteroffer)
-
-
-    except Exception as e:
-        print(f"💥 GPT API error: {e}")
-        return jsonify({"error": "NPC is refusing to talk right now."}), 500
+    # GPT reply runs in the background; the page polls /jobs/<id> for it
+    job_id = jobs.enqueue("npc_haggle", npc_type, item, offer_val, base_price, owner=squire_id)
 
     return jsonify({
-        "npc_reply": npc_reply,
+        "job_id": job_id,
         "final_price": offer_val,
         "reputation_awarded": reputation_change,
-        "counteroffer": counteroffer
-    })
+        "trader_gone": False,
+        "trader_is_gone": False
+    }), 202
 
 
 # 🚶 Game Actions (Movement, Shop, Town, Combat)
@@ -462,39 +423,19 @@ def inventory():
 @town_bp.route('/hall_of_fame', methods=['GET'])
 def hall_of_fame():
     """Displays the Hall of Fame leaderboard."""
-    db = db_session()
-    try:
-        # Fetch top 10 players by experience_points
-        leaders = (
-            db.query(Squire)
-              .order_by(Squire.experience_points.desc())
-              .limit(10)
-              .all()
-        )
-    finally:
-        db.close()
+    # Top 10 players by experience_points, from the in-memory leaderboard
+    leaders = leaderboard.top_squires(10)
 
-    # You can pass ORM objects directly to Jinja:
     # in the template: {{ leader.squire_name }} & {{ leader.experience_points }}
     return render_template("hall_of_fame.html", leaders=leaders)
 
 @town_bp.route('/team_fame', methods=['GET'])
 def team_fame():
     """Displays the Hall of Fame leaderboard for Teams Based on Reputation."""
-    db = db_session()
-    try:
-        # Fetch top 10 players by experience_points
-        leaders = (
-            db.query(Team)
-              .order_by(Team.reputation.desc())
-              .limit(10)
-              .all()
-        )
-    finally:
-        db.close()
+    # Top 10 teams by reputation, from the in-memory leaderboard
+    leaders = leaderboard.top_teams(10)
 
-    # You can pass ORM objects directly to Jinja:
-    # in the template: {{ leader.squire_name }} & {{ leader.experience_points }}
+    # in the template: {{ team.team_name }} & {{ team.reputation }}
     return render_template("team_hall.html", leaders=leaders)
 
 @town_bp.route('/town_work', methods=['GET', 'POST'])
@@ -532,7 +473,7 @@ def town_work():
         # 3) Handle job selection (POST)
         if request.method == 'POST':
             job_id = request.form.get("job_id", type=int)
-            job = db.query(Job).get(job_id)
+            job = get_catalogue().job(job_id)
             if not job:
                 flask_session["job_message"] = "❌ Invalid job selection!"
                 return redirect(url_for("town.town_work"))
@@ -548,16 +489,15 @@ def town_work():
 
             return redirect(url_for("questions.answer_question"))
 
-        # 4) GET: fetch all jobs
-        jobs = db.query(Job).all()
-
-        for job in jobs:
-            job.scaled_min = job.min_payout * level
-            job.scaled_max = job.max_payout * level
+        # 4) GET: all jobs, scaled per request (the catalogue rows are shared)
+        job_rows = [
+            SimpleNamespace(**vars(job), scaled_min=job.min_payout * level, scaled_max=job.max_payout * level)
+            for job in get_catalogue().jobs
+        ]
 
         return render_template(
             "town_work.html",
-            jobs=jobs
+            jobs=job_rows
         )
 
     finally:
@@ -576,12 +516,8 @@ def shop():
         squire = db.query(Squire).get(squire_id)
         level  = squire.level
 
-        # 2) Fetch available shop items
-        items = (
-            db.query(ShopItem)
-              .filter(ShopItem.min_level <= level)
-              .all()
-        )
+        # 2) Available shop items
+        items = get_catalogue().shop_items_for_level(level)
 
         grouped_items = defaultdict(list)
         for item in items:
@@ -615,8 +551,8 @@ def buy_item():
 
     db = db_session()
     try:
-        # 1) Load the shop item
-        item = db.query(ShopItem).get(item_id)
+        # 1) Look up the shop item
+        item = get_catalogue().shop_item(item_id)
         if not item:
             return jsonify(success=False, message="Item not found"), 404
 
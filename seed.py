@@ -0,0 +1,160 @@
+"""
+Synthetic world for local play and load testing.
+
+    DB_BACKEND=sqlite python seed.py                  # create tables + seed lawyersquest.db
+    DB_BACKEND=sqlite python seed.py --squires 200    # more players
+    DB_BACKEND=sqlite python seed.py --reset          # drop everything first
+
+Creates a course with a handful of quests, their riddles and question banks,
+enemies (including the Lexiconis boss), shop/wizard items, jobs, XP
+thresholds, teams and verified squires named squire1, squire2, ... that can
+log in straight away. Refuses to touch a non-SQLite database unless --force.
+"""
+import argparse
+import logging
+import random
+import sys
+
+from db import (engine, db_session, Base, Course, Quest, Riddle, TrueFalseQuestion, MultipleChoiceQuestion,
+                Enemy, ShopItem, WizardItem, Job, XpThreshold, Team, Squire, Inventory)
+
+
+LAW_WORDS = ["consideration", "estoppel", "tort", "negligence", "contract", "mens rea", "habeas corpus",
+             "stare decisis", "due process", "equity", "easement", "liability", "precedent", "jurisdiction"]
+
+SHOP_ITEMS = [
+    # item_name, item_type, price, uses, min_level
+    ("Bread Loaf",        "food",    5,  5, 1),
+    ("Large Pizza",       "food",   12, 12, 1),
+    ("Traveler's Stew",   "food",   20, 20, 3),
+    ("Hiking Boots",      "gear",   50, 30, 1),
+    ("River Boat",        "gear",   80, 30, 2),
+    ("Quill Pen",         "arms",   10, 15, 1),
+    ("Casebook Shield",   "arms",   40, 25, 2),
+    ("Gavel of Order",    "arms",   90, 30, 4),
+]
+
+WIZARD_ITEMS = ["Lexiconis Scroll", "four-leaf clover", "Word Length Hint", "Word Count Hint", "Riddle Hint"]
+
+JOBS = [("Court Clerk", 2, 6), ("Scrivener", 3, 8), ("Bailiff", 5, 12)]
+
+
+def seed(num_quests: int = 4, riddles_per_quest: int = 12, questions_per_quest: int = 40,
+         num_teams: int = 10, num_squires: int = 50, seed_value: int = 42) -> dict:
+    """Inserts the synthetic world into empty tables; returns row counts."""
+    rng = random.Random(seed_value)
+    db = db_session()
+    try:
+        # 1) Course and quests (the first one active, the rest locked)
+        db.add(Course(id=1, course_name="Law 101", description="Synthetic course for local play"))
+        for q in range(1, num_quests + 1):
+            db.add(Quest(
+                id=q, quest_name=f"Quest {q}", description=f"Synthetic quest {q}",
+                learning_objective=f"Understand {LAW_WORDS[q % len(LAW_WORDS)]}",
+                status='active' if q == 1 else 'locked', reward="Gavel of Order",
+                effective_against="Troll", course_id=1
+            ))
+
+        # 2) Enemies: regular foes by level plus the final boss
+        enemies = [
+            Enemy(id=i, enemy_name=f"Troll of Clause {i}", description="A pedantic troll",
+                  weakness="Quill Pen", gold_reward=5 * i, xp_reward=5 * i, max_hunger=3 + i,
+                  is_boss=False, min_level=i)
+            for i in range(1, 6)
+        ]
+        enemies.append(Enemy(id=6, enemy_name="Lexiconis", description="Keeper of the final word",
+                             weakness="Gavel of Order", gold_reward=200, xp_reward=200, max_hunger=10,
+                             is_boss=True, min_level=1))
+        db.add_all(enemies)
+
+        # 3) Riddles and question banks per quest
+        difficulties = ["Easy", "Medium", "Hard"]
+        rid = tf_id = mc_id = 0
+        for q in range(1, num_quests + 1):
+            for _ in range(riddles_per_quest):
+                rid += 1
+                answer = rng.choice(LAW_WORDS)
+                db.add(Riddle(
+                    id=rid, riddle_text=f"Riddle {rid}: what doctrine is this?", answer=answer,
+                    hint=f"Think about {answer[0]}...", reward=50, quest_id=q,
+                    difficulty=difficulties[rid % 3],
+                    word_length_hint=" ".join(str(len(w)) for w in answer.split()),
+                    word_count=len(answer.split())
+                ))
+            for _ in range(questions_per_quest):
+                tf_id += 1
+                db.add(TrueFalseQuestion(id=tf_id, question=f"Statement {tf_id} is true.",
+                                         correct_answer=bool(tf_id % 2), hint="See chapter 1",
+                                         quest_id=q, enemy_id=rng.randint(1, 5)))
+                mc_id += 1
+                db.add(MultipleChoiceQuestion(id=mc_id, question_text=f"Question {mc_id}?",
+                                              optionA="Alpha", optionB="Bravo", optionC="Charlie",
+                                              optionD="Delta", correctAnswer=rng.choice("ABCD"),
+                                              hint="See chapter 2", quest_id=q))
+
+        # 4) Shop, wizard items, jobs, thresholds
+        for i, (name, item_type, price, uses, min_level) in enumerate(SHOP_ITEMS, start=1):
+            db.add(ShopItem(id=i, item_name=name, description=name, price=price, uses=uses,
+                            item_type=item_type, min_level=min_level, available_to_trader=True))
+        for i, name in enumerate(WIZARD_ITEMS, start=1):
+            db.add(WizardItem(id=i, item_name=name, uses=5, min_level=1))
+        for i, (name, low, high) in enumerate(JOBS, start=1):
+            db.add(Job(id=i, job_name=name, description=name, min_payout=low, max_payout=high))
+        for level in range(2, 21):
+            db.add(XpThreshold(level=level, min=50 * (level - 1) ** 2))
+
+        # 5) Teams and verified squires with starting supplies
+        for t in range(1, num_teams + 1):
+            db.add(Team(id=t, team_name=f"Team {t}", gold=100, reputation=rng.randint(0, 20)))
+        db.flush()
+
+        for s in range(1, num_squires + 1):
+            db.add(Squire(
+                id=s, squire_name=f"squire{s}", real_name=f"Squire {s}", email=f"squire{s}@example.com",
+                team_id=(s - 1) % num_teams + 1, experience_points=0, level=1,
+                x_coordinate=0, y_coordinate=0, work_sessions=0, uuid=f"seed-{s}",
+                consent_to_TOS=True, verified_email=True, beta_survey=False
+            ))
+        db.flush()
+
+        for s in range(1, num_squires + 1):
+            db.add(Inventory(squire_id=s, item_name="Large Pizza", description="Large Pizza",
+                             uses_remaining=200, item_type='food'))
+            db.add(Inventory(squire_id=s, item_name="Quill Pen", description="Quill Pen",
+                             uses_remaining=15, item_type='arms'))
+
+        db.commit()
+        counts = {
+            "quests": num_quests, "riddles": rid, "true_false": tf_id, "multiple_choice": mc_id,
+            "enemies": len(enemies), "teams": num_teams, "squires": num_squires,
+        }
+        logging.info(f"Seeded {counts}")
+        return counts
+
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a synthetic Lawyer's Quest world.")
+    parser.add_argument("--quests", type=int, default=4)
+    parser.add_argument("--riddles", type=int, default=12, help="riddles per quest")
+    parser.add_argument("--questions", type=int, default=40, help="true/false and multiple choice per quest")
+    parser.add_argument("--teams", type=int, default=10)
+    parser.add_argument("--squires", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--reset", action="store_true", help="drop and recreate every table first")
+    parser.add_argument("--force", action="store_true", help="allow seeding a non-SQLite database")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "sqlite" and not args.force:
+        sys.exit(f"Refusing to seed a {engine.dialect.name} database; set DB_BACKEND=sqlite or pass --force.")
+
+    if args.reset:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    print(seed(args.quests, args.riddles, args.questions, args.teams, args.squires, args.seed))
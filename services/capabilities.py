@@ -0,0 +1,158 @@
+from db import Inventory
+from collections import OrderedDict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+import logging
+import os
+import threading
+import time
+
+
+# ────────────── Inventory capabilities ──────────────
+#
+# Whether a squire may cross mountains, sees riddle hints or carries gold coin
+# pouches depends only on which items they hold, yet each check used to be its
+# own `item_name ILIKE '%…%'` count. The whole set is now derived once from
+# the squire's item names (one SELECT) as a bitmask plus the pouch count, and
+# cached per squire.
+#
+# Any committed ORM change that adds, removes, renames or re-homes an
+# Inventory row drops the owner's entry (collected in after_flush, applied in
+# after_commit, as services.leaderboard does), so buy_item, degrade_gear,
+# consume_food, chest rewards, calculate_riddle_reward, complete_quest and any
+# later write path are covered. Other gunicorn workers don't see those
+# invalidations, so entries also expire after CAPABILITY_CACHE_TTL seconds.
+
+CAPABILITY_CACHE_SIZE = int(os.getenv("CAPABILITY_CACHE_SIZE", "1024"))
+CAPABILITY_CACHE_TTL  = float(os.getenv("CAPABILITY_CACHE_TTL", "120"))
+
+BOOTS            = 1 << 0   # cross mountains
+BOAT             = 1 << 1   # cross rivers
+RIDDLE_HINT      = 1 << 2   # banishment / decoder: riddle hints
+WORD_LENGTH_HINT = 1 << 3   # four-leaf clover
+WORD_COUNT_HINT  = 1 << 4   # Keys to the Kingdom
+LEXICON          = 1 << 5   # any Lexicon item: word-length clue in the riddle CLI
+LEXICONIS        = 1 << 6   # word-length clue on CLI treasure chests
+
+# Flags granted by a fragment anywhere in the item name (what the ILIKE '%…%' checks matched)
+NAME_FRAGMENTS = (
+    ("boots", BOOTS),
+    ("boat", BOAT),
+    ("banishment", RIDDLE_HINT),
+    ("decoder", RIDDLE_HINT),
+    ("keys to the kingdom", WORD_COUNT_HINT),
+    ("lexicon", LEXICON),
+    ("lexiconis", LEXICONIS),
+)
+# ... and by an exact item name
+EXACT_NAMES = {"four-leaf clover": WORD_LENGTH_HINT}
+GOLD_COIN_POUCH = "gold coin pouch"
+
+
+class Capabilities:
+    """What a squire's inventory lets them do."""
+
+    __slots__ = ("flags", "pouches", "loaded_at")
+
+    def __init__(self, flags: int = 0, pouches: int = 0):
+        self.flags     = flags
+        self.pouches   = pouches    # gold coin pouches, each one raises max hunger
+        self.loaded_at = time.monotonic()
+
+    def has(self, flag: int) -> bool:
+        return bool(self.flags & flag)
+
+    def is_fresh(self) -> bool:
+        return time.monotonic() - self.loaded_at < CAPABILITY_CACHE_TTL
+
+
+def from_item_names(names) -> Capabilities:
+    flags = pouches = 0
+    for name in names:
+        name = (name or "").lower()
+        for fragment, flag in NAME_FRAGMENTS:
+            if fragment in name:
+                flags |= flag
+        flags |= EXACT_NAMES.get(name, 0)
+        if name == GOLD_COIN_POUCH:
+            pouches += 1
+    return Capabilities(flags, pouches)
+
+
+def from_items(items) -> Capabilities:
+    """Capabilities of already-loaded Inventory rows (e.g. Squire.inventory)."""
+    return from_item_names(item.item_name for item in items)
+
+
+_cache = OrderedDict()   # squire_id -> Capabilities
+_lock  = threading.Lock()
+
+
+def get_capabilities(db, squire_id: int) -> Capabilities:
+    """
+    Cached Capabilities for the squire, read with one SELECT of their item
+    names on a miss or once the entry has expired.
+    """
+    with _lock:
+        caps = _cache.get(squire_id)
+        if caps is not None and caps.is_fresh():
+            _cache.move_to_end(squire_id)
+            return caps
+
+    names = [name for (name,) in db.query(Inventory.item_name).filter(Inventory.squire_id == squire_id)]
+    caps = from_item_names(names)
+    logging.debug(f"Capabilities for squire={squire_id}: flags={caps.flags:#x}, pouches={caps.pouches}")
+
+    with _lock:
+        _cache[squire_id] = caps
+        _cache.move_to_end(squire_id)
+        while len(_cache) > CAPABILITY_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return caps
+
+
+def invalidate(squire_id: int) -> None:
+    with _lock:
+        _cache.pop(squire_id, None)
+
+
+# ── invalidation from ORM flushes ──
+
+@event.listens_for(Inventory.squire_id, "set", active_history=True)
+def _load_previous_owner(target, value, oldvalue, initiator):
+    """active_history loads the old owner before reassignment, so the flush history has it."""
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_owners(session, flush_context):
+    owners = set()
+    for obj in session.new:
+        if isinstance(obj, Inventory):
+            owners.add(obj.squire_id)
+    for obj in session.deleted:
+        if isinstance(obj, Inventory):
+            owners.add(obj.squire_id)
+    for obj in session.dirty:
+        if not isinstance(obj, Inventory):
+            continue
+        state = inspect(obj)
+        if state.attrs.item_name.history.has_changes():
+            owners.add(obj.squire_id)
+        moved = state.attrs.squire_id.history
+        if moved.has_changes():
+            owners.update(moved.added)
+            owners.update(moved.deleted)
+    if owners:
+        session.info.setdefault("capability_owners", set()).update(owners)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session):
+    for squire_id in session.info.pop("capability_owners", ()):
+        invalidate(squire_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session):
+    session.info.pop("capability_owners", None)
@@ -0,0 +1,169 @@
+from db import db_session, Enemy, ShopItem, WizardItem, Job, XpThreshold, Quest, TrueFalseQuestion, Riddle
+from sqlalchemy import inspect, select, func
+from types import SimpleNamespace
+
+import logging
+import os
+import threading
+import time
+
+
+# ────────────── Reference-data catalogue ──────────────
+#
+# Enemies, shop and wizard items, jobs, XP thresholds, quests and the size of
+# the question banks only change when an instructor edits content, yet almost
+# every request re-read them.
+# The catalogue keeps a process-wide, read-only snapshot of those tables
+# (plain SimpleNamespace rows, safe to share between threads and sessions)
+# and reloads it after CATALOGUE_TTL seconds or on refresh_catalogue().
+#
+# Quest.status changes during play (complete_quest unlocks the next quest),
+# so callers that care about status should still ask the database.
+
+CATALOGUE_TTL = float(os.getenv("CATALOGUE_TTL", "600"))
+
+
+def _snapshot(row):
+    return SimpleNamespace(**{attr.key: getattr(row, attr.key) for attr in inspect(row).mapper.column_attrs})
+
+
+class Catalogue:
+    """One immutable snapshot of the reference tables, with typed lookups."""
+
+    def __init__(self, enemies, shop_items, wizard_items, jobs, thresholds, quests,
+                 true_false_count: int = 0, riddle_count: int = 0):
+        self.enemies      = tuple(enemies)
+        self.shop_items   = tuple(shop_items)
+        self.wizard_items = tuple(wizard_items)
+        self.jobs         = tuple(jobs)
+        self.thresholds   = tuple(sorted(thresholds, key=lambda t: t.level or 0))
+        self.quests       = tuple(quests)
+        self.true_false_count = true_false_count
+        self.riddle_count     = riddle_count
+        self.loaded_at    = time.monotonic()
+
+        self._enemy_by_id  = {e.id: e for e in self.enemies}
+        self._shop_by_id   = {i.id: i for i in self.shop_items}
+        self._shop_by_name = {i.item_name: i for i in self.shop_items}
+        self._job_by_id    = {j.id: j for j in self.jobs}
+        self._quest_by_id  = {q.id: q for q in self.quests}
+
+    def is_fresh(self) -> bool:
+        return time.monotonic() - self.loaded_at < CATALOGUE_TTL
+
+    # ── enemies ──
+    def enemy(self, enemy_id: int):
+        return self._enemy_by_id.get(enemy_id)
+
+    def enemies_for_level(self, level: int) -> list:
+        """Non-boss enemies a squire of `level` can meet."""
+        return [e for e in self.enemies if not e.is_boss and (e.min_level or 1) <= level]
+
+    def enemy_like(self, fragment: str):
+        """First enemy whose name contains `fragment` (case-insensitive)."""
+        fragment = fragment.lower()
+        return next((e for e in self.enemies if fragment in e.enemy_name.lower()), None)
+
+    # ── shop & wizard items ──
+    def shop_item(self, item_id: int):
+        return self._shop_by_id.get(item_id)
+
+    def shop_item_named(self, item_name: str):
+        return self._shop_by_name.get(item_name)
+
+    def shop_items_for_level(self, level: int, item_type: str | None = None) -> list:
+        return [
+            i for i in self.shop_items
+            if (i.min_level or 1) <= level
+            and (item_type is None or (i.item_type or "").lower() == item_type)
+        ]
+
+    def trader_items_for_level(self, level: int) -> list:
+        return [i for i in self.shop_items_for_level(level) if i.available_to_trader]
+
+    def wizard_items_for_level(self, level: int) -> list:
+        return [w for w in self.wizard_items if (w.min_level or 1) <= level]
+
+    def wizard_item_names(self) -> list:
+        return [w.item_name for w in self.wizard_items]
+
+    # ── jobs ──
+    def job(self, job_id: int):
+        return self._job_by_id.get(job_id)
+
+    # ── XP thresholds ──
+    def next_level(self, current_level: int, xp: int) -> int | None:
+        """
+        The level a squire at `current_level` with `xp` should move up to,
+        or None: the lowest threshold above their level whose minimum is met.
+        """
+        for threshold in self.thresholds:
+            if current_level < threshold.level and xp >= threshold.min:
+                return threshold.level
+        return None
+
+    # ── quests ──
+    def quest(self, quest_id: int):
+        return self._quest_by_id.get(quest_id)
+
+    # ── question banks ──
+    def question_bank_size(self) -> int:
+        """True/false questions plus riddles, across every quest (the hit-chance denominator)."""
+        return self.true_false_count + self.riddle_count
+
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+
+def load_catalogue() -> Catalogue:
+    """Reads every reference table in its own short-lived session."""
+    db = db_session.session_factory()
+    try:
+        true_false_count, riddle_count = db.query(
+            select(func.count(TrueFalseQuestion.id)).scalar_subquery(),
+            select(func.count(Riddle.id)).scalar_subquery()
+        ).one()
+
+        catalogue = Catalogue(
+            enemies      = [_snapshot(r) for r in db.query(Enemy).all()],
+            shop_items   = [_snapshot(r) for r in db.query(ShopItem).order_by(ShopItem.id).all()],
+            wizard_items = [_snapshot(r) for r in db.query(WizardItem).order_by(WizardItem.id).all()],
+            jobs         = [_snapshot(r) for r in db.query(Job).order_by(Job.id).all()],
+            thresholds   = [_snapshot(r) for r in db.query(XpThreshold).all()],
+            quests       = [_snapshot(r) for r in db.query(Quest).all()],
+            true_false_count = true_false_count or 0,
+            riddle_count     = riddle_count or 0,
+        )
+    finally:
+        db.close()
+
+    logging.debug(
+        f"Catalogue loaded: {len(catalogue.enemies)} enemies, {len(catalogue.shop_items)} shop items, "
+        f"{len(catalogue.wizard_items)} wizard items, {len(catalogue.jobs)} jobs, "
+        f"{len(catalogue.thresholds)} thresholds, {len(catalogue.quests)} quests, "
+        f"{catalogue.question_bank_size()} true/false questions and riddles"
+    )
+    return catalogue
+
+
+def get_catalogue() -> Catalogue:
+    """Returns the current catalogue, reloading it once it is older than CATALOGUE_TTL."""
+    global _catalogue
+    catalogue = _catalogue
+    if catalogue is not None and catalogue.is_fresh():
+        return catalogue
+
+    with _catalogue_lock:
+        # another thread may have reloaded while we waited
+        if _catalogue is None or not _catalogue.is_fresh():
+            _catalogue = load_catalogue()
+        return _catalogue
+
+
+def refresh_catalogue() -> Catalogue:
+    """Forces a reload (e.g. right after an instructor edits content)."""
+    global _catalogue
+    with _catalogue_lock:
+        _catalogue = load_catalogue()
+        return _catalogue
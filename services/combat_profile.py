@@ -0,0 +1,162 @@
+from db import Squire, Inventory, SquireQuestion, SquireQuestionAttempt
+from services.catalogue import get_catalogue
+from services.leaderboard import team_rank
+from sqlalchemy import select, func, case, literal, false
+
+import logging
+
+
+# ────────────── Combat stat snapshot ──────────────
+#
+# Opening a fight used to run update_work_for_combat, get_player_max_hunger,
+# calculate_hit_chance, combat_mods, hunger_mods and question_accuracy, each
+# with its own session and 1-3 queries. load_combat_profile() reads the same
+# numbers with one SELECT (an inventory aggregate plus scalar subqueries);
+# the global question-bank size comes from the catalogue and the team rank
+# from the leaderboard. The route stores the
+# derived chances in the Flask session, where the combat screen and the
+# per-turn AJAX handler reuse them.
+
+MAX_HIT_CHANCE    = 95
+MAX_PLAYER_HUNGER = 8
+GOLD_COIN_POUCH   = 'gold coin pouch'
+
+
+def team_rank_bonus(rank: int | None) -> int:
+    """Hit-chance bonus for the squire's team standing (1 = best reputation)."""
+    if rank is None:
+        return 0
+    if rank <= 3:
+        return 5
+    if rank <= 8:
+        return 3
+    if rank <= 18:
+        return 1
+    return 0
+
+
+class CombatProfile:
+    """A squire's combat numbers at the start of one encounter."""
+
+    def __init__(self, squire_id: int, level: int, x: int, y: int, food_uses: int, gear: int, specials: int,
+                 pouches: int, team_rank: int | None, correct: int, attempts: int, attempts_correct: int,
+                 question_bank: int):
+        self.squire_id        = squire_id
+        self.level            = level
+        self.position         = (x, y)
+        self.food_uses        = food_uses
+        self.gear             = gear
+        self.specials         = specials
+        self.pouches          = pouches
+        self.team_rank        = team_rank
+        self.correct          = correct
+        self.attempts         = attempts
+        self.attempts_correct = attempts_correct
+        self.question_bank    = question_bank
+
+    @property
+    def mod_for_distance(self) -> int:
+        x, y = self.position
+        return abs(x * y)
+
+    @property
+    def base_hit_chance(self) -> float:
+        """calculate_hit_chance(): 2% per level plus the share of the question bank answered."""
+        if self.question_bank == 0:
+            return 0.0
+        return min(self.level * 2 + self.correct / self.question_bank, 95.0)
+
+    @property
+    def combat_mods(self) -> int:
+        """combat_mods(): usable gear, specials against this enemy, level and team rank."""
+        return self.gear + self.specials * 5 + 2 * self.level + team_rank_bonus(self.team_rank)
+
+    @property
+    def hit_chance(self) -> int:
+        return int(min(self.base_hit_chance + self.combat_mods, MAX_HIT_CHANCE))
+
+    @property
+    def player_max_hunger(self) -> int:
+        return min(self.food_uses + self.pouches, MAX_PLAYER_HUNGER)
+
+    @property
+    def question_accuracy(self) -> float:
+        return round(self.attempts_correct / self.attempts * 100, 1) if self.attempts > 0 else 0
+
+
+def load_combat_profile(db, squire_id: int, enemy_name: str | None = None) -> CombatProfile | None:
+    """
+    One SELECT for the squire's position and level, an aggregate over their
+    inventory and their question history; the team rank comes from the leaderboard.
+    `enemy_name` selects which 'special' items count against the enemy.
+    """
+    # 1) Inventory totals in a single pass
+    against_enemy = Inventory.effective_against == enemy_name if enemy_name else false()
+    inv = (
+        select(
+            func.coalesce(func.sum(case((Inventory.item_type == 'food', Inventory.uses_remaining), else_=0)), 0)
+                .label("food_uses"),
+            func.count(case(((Inventory.item_type == 'gear') & (Inventory.uses_remaining > 0), Inventory.id)))
+                .label("gear"),
+            func.count(case(((Inventory.item_type == 'special') & against_enemy, Inventory.id)))
+                .label("specials"),
+            func.count(case((Inventory.item_name == GOLD_COIN_POUCH, Inventory.id))).label("pouches"),
+        )
+        .where(Inventory.squire_id == squire_id)
+        .subquery()
+    )
+
+    # 2) Question history
+    correct = (
+        select(func.count(func.distinct(SquireQuestion.question_id)))
+        .where(SquireQuestion.squire_id == squire_id, SquireQuestion.answered_correctly == True)
+        .scalar_subquery()
+    )
+    attempts = (
+        select(func.count(SquireQuestionAttempt.id))
+        .where(SquireQuestionAttempt.squire_id == squire_id)
+        .scalar_subquery()
+    )
+    attempts_correct = (
+        select(func.count(SquireQuestionAttempt.id))
+        .where(SquireQuestionAttempt.squire_id == squire_id, SquireQuestionAttempt.answered_correctly == True)
+        .scalar_subquery()
+    )
+
+    row = (
+        db.query(
+            Squire.level, Squire.x_coordinate, Squire.y_coordinate, Squire.team_id,
+            inv.c.food_uses, inv.c.gear, inv.c.specials, inv.c.pouches,
+            correct, attempts, attempts_correct
+        )
+        .join(inv, literal(True))
+        .filter(Squire.id == squire_id)
+        .first()
+    )
+    if not row:
+        logging.error(f"load_combat_profile: squire {squire_id} not found")
+        return None
+
+    (level, x, y, team_id, food_uses, gear, specials, pouches,
+     correct_count, attempt_count, correct_attempts) = row
+
+    profile = CombatProfile(
+        squire_id        = squire_id,
+        level            = level or 1,
+        x                = x or 0,
+        y                = y or 0,
+        food_uses        = int(food_uses or 0),
+        gear             = gear or 0,
+        specials         = specials or 0,
+        pouches          = pouches or 0,
+        team_rank        = team_rank(team_id),
+        correct          = correct_count or 0,
+        attempts         = attempt_count or 0,
+        attempts_correct = correct_attempts or 0,
+        question_bank    = get_catalogue().question_bank_size()
+    )
+    logging.debug(
+        f"combat_profile → squire={squire_id}, enemy={enemy_name}, hit={profile.hit_chance}, "
+        f"max_hunger={profile.player_max_hunger}, team_rank={profile.team_rank}"
+    )
+    return profile
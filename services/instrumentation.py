@@ -0,0 +1,166 @@
+from db import statement_count
+from collections import Counter
+from flask import g, request, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import traceback
+
+
+# ────────────── Request-scoped SQL instrumentation ──────────────
+#
+# For every Flask request we collect, via SQLAlchemy engine events:
+#   - statements executed (db.statement_count())
+#   - total time spent inside cursor.execute
+#   - time spent waiting for a pooled connection (db.TimedQueuePool)
+#   - rows returned / affected (cursor.rowcount; drivers that report -1
+#     for SELECTs, like sqlite3, only count writes)
+#   - how often each distinct statement ran, to flag N+1 patterns
+#
+# The numbers go into one structured "request_stats" log line and, with
+# DB_STATS_HEADERS=1, into X-DB-* response headers.
+#
+# PROFILE_SAMPLE_RATE (0..1) profiles that share of requests with cProfile;
+# the profile is logged only when the request took longer than
+# PROFILE_SLOW_MS. Only one request is profiled at a time.
+
+DB_STATS_HEADERS    = os.getenv("DB_STATS_HEADERS") == "1"
+N_PLUS_ONE_MIN      = int(os.getenv("N_PLUS_ONE_MIN", "5"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS     = float(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_TOP         = 25
+
+_profile_lock = threading.Lock()
+_repo_root    = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger("lawyersquest.requests")
+
+
+# ── engine events ──
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_app_context():
+        return
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+    if executemany:
+        return  # one bulk round trip, not a loop
+
+    seen = g.setdefault("db_statement_counts", Counter())
+    seen[statement] += 1
+    # remember where the repeated statement comes from, once
+    if seen[statement] == N_PLUS_ONE_MIN:
+        g.setdefault("db_repeat_sites", {})[statement] = _call_site()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_app_context() or not conn.info.get("query_start"):
+        return
+    g.db_time_ms = g.get("db_time_ms", 0.0) + (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+    if cursor.rowcount and cursor.rowcount > 0:
+        g.db_rows = g.get("db_rows", 0) + cursor.rowcount
+
+
+def _call_site() -> str:
+    """Innermost frame of our own code (not SQLAlchemy / site-packages) that issued the query."""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if frame.filename.startswith(_repo_root) and "site-packages" not in frame.filename \
+                and not frame.filename.endswith("instrumentation.py"):
+            return f"{os.path.relpath(frame.filename, _repo_root)}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+# ── per-request summary ──
+
+def repeated_statements() -> list[dict]:
+    """Statements that ran at least N_PLUS_ONE_MIN times in this request."""
+    counts = g.get("db_statement_counts") or Counter()
+    sites  = g.get("db_repeat_sites") or {}
+    return [
+        {"count": n, "sql": " ".join(sql.split())[:160], "site": sites.get(sql, "unknown")}
+        for sql, n in counts.most_common()
+        if n >= N_PLUS_ONE_MIN
+    ]
+
+
+def request_stats() -> dict:
+    return {
+        "statements":       statement_count(),
+        "db_ms":            round(g.get("db_time_ms", 0.0), 2),
+        "checkout_wait_ms": round(g.get("db_checkout_ms", 0.0), 2),
+        "rows":             g.get("db_rows", 0),
+    }
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.profiler = None
+
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE and _profile_lock.acquire(blocking=False):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def _finish_request(response):
+    elapsed_ms = (time.perf_counter() - g.get("request_started", time.perf_counter())) * 1000
+    stats = request_stats()
+    repeats = repeated_statements()
+
+    # 1) Profile, if this request was sampled
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+        if elapsed_ms >= PROFILE_SLOW_MS:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            logger.warning(f"Slow request {request.method} {request.path} ({elapsed_ms:.0f} ms) profile:\n{out.getvalue()}")
+
+    # 2) N+1 warnings
+    for r in repeats:
+        logger.warning(f"Possible N+1 in {request.endpoint}: {r['count']}x at {r['site']}: {r['sql']}")
+
+    # 3) Structured log line and optional headers
+    logger.info("request_stats " + json.dumps({
+        "method":     request.method,
+        "path":       request.path,
+        "endpoint":   request.endpoint,
+        "status":     response.status_code,
+        "elapsed_ms": round(elapsed_ms, 2),
+        **stats,
+        "repeated":   len(repeats),
+    }))
+
+    if DB_STATS_HEADERS:
+        response.headers["X-DB-Statements"]       = str(stats["statements"])
+        response.headers["X-DB-Time-ms"]          = str(stats["db_ms"])
+        response.headers["X-DB-Checkout-Wait-ms"] = str(stats["checkout_wait_ms"])
+        response.headers["X-DB-Rows"]             = str(stats["rows"])
+        response.headers["X-DB-Repeated"]         = str(len(repeats))
+        response.headers["X-Request-Time-ms"]     = str(round(elapsed_ms, 2))
+    return response
+
+
+def _abandon_profile(exc=None):
+    """Releases the profiler if the request died before after_request ran."""
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+
+
+def init_app(app) -> None:
+    """Registers the per-request hooks on the Flask app."""
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_abandon_profile)
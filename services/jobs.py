@@ -0,0 +1,304 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+
+# ────────────── Background jobs ──────────────
+#
+# Slow side effects (verification emails, GPT calls) are enqueued by the
+# request handler, which returns immediately with a job id; the browser polls
+# GET /jobs/<id> for the result.
+#
+# Job records live in a small SQLite file (JOB_DB_PATH) so every gunicorn
+# worker on the host can answer a poll, whichever worker ran the job.
+# JOB_BACKEND picks who runs them:
+#   - thread (default): a dispatcher thread in every web process claims due
+#     jobs from the store and runs them on a pool of JOB_WORKERS threads
+#   - sqlite: a separate `python -m services.jobs` process on the same host
+# Either way jobs are only ever started through _claim(), so a retry, or a
+# job still queued when its process restarted, is picked up by whichever
+# process polls next.
+#
+# Tasks are plain functions registered with @task; they can still be called
+# directly. A task that raises is re-queued with exponential backoff up to
+# its `retries`. A call is given `timeout` seconds and then reported as
+# failed (its thread is abandoned and its result, if it ever arrives, is
+# discarded); running rows whose process died are failed the same way once
+# they are past their timeout.
+
+JOB_BACKEND       = os.getenv("JOB_BACKEND", "thread")
+JOB_DB_PATH       = os.getenv("JOB_DB_PATH", "jobs.db")
+JOB_WORKERS       = int(os.getenv("JOB_WORKERS", "4"))
+JOB_POLL_SECONDS  = float(os.getenv("JOB_POLL_SECONDS", "0.5"))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "2"))
+JOB_RESULT_TTL    = float(os.getenv("JOB_RESULT_TTL", "3600"))
+
+# modules whose @task functions the standalone worker must import
+TASK_MODULES = ("utils.emails", "utils.api_calls", "services.question_pool")
+
+
+class Task:
+    def __init__(self, name: str, fn, retries: int, timeout: float):
+        self.name    = name
+        self.fn      = fn
+        self.retries = retries
+        self.timeout = timeout
+
+
+_tasks    = {}
+_local    = threading.local()
+_executor = None   # thread backend: runs claimed jobs
+_calls    = None   # runs the task functions, so a hung call can be timed out
+_executor_lock = threading.Lock()
+
+_dispatcher = None
+_slots = threading.BoundedSemaphore(JOB_WORKERS)   # free _executor threads
+_wake  = threading.Event()                         # set by enqueue()
+
+
+def task(name: str | None = None, retries: int = 2, timeout: float = 60):
+    """Registers a function as a background task (the function itself is returned unchanged)."""
+    def register(fn):
+        _tasks[name or fn.__name__] = Task(name or fn.__name__, fn, retries, timeout)
+        return fn
+    return register
+
+
+# ── store ──
+
+def _db() -> sqlite3.Connection:
+    """One autocommit connection per thread."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(JOB_DB_PATH, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id          TEXT PRIMARY KEY,
+                task        TEXT NOT NULL,
+                args        TEXT NOT NULL,
+                owner       INTEGER,
+                status      TEXT NOT NULL,
+                attempts    INTEGER NOT NULL DEFAULT 0,
+                result      TEXT,
+                error       TEXT,
+                created_at  REAL NOT NULL,
+                started_at  REAL,
+                finished_at REAL,
+                run_after   REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status_run_after ON jobs (status, run_after)")
+        _local.conn = conn
+    return conn
+
+
+def _purge_old() -> None:
+    _db().execute(
+        "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+        (time.time() - JOB_RESULT_TTL,)
+    )
+
+
+def enqueue(name: str, *args, owner: int | None = None, **kwargs) -> str:
+    """
+    Stores a job for task `name` and (thread backend) starts it right away.
+    `owner` is the squire allowed to read its result via /jobs/<id>.
+    """
+    if name not in _tasks:
+        raise ValueError(f"Unknown task {name!r}")
+
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    _db().execute(
+        "INSERT INTO jobs (id, task, args, owner, status, created_at, run_after) VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+        (job_id, name, json.dumps({"args": args, "kwargs": kwargs}), owner, now, now)
+    )
+    if random.random() < 0.01:
+        _purge_old()
+
+    if JOB_BACKEND == "thread":
+        start()
+        _wake.set()
+    return job_id
+
+
+def get_job(job_id: str) -> dict | None:
+    """Current state of a job: id, task, owner, status (queued/running/done/failed), result, error."""
+    row = _db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+
+    job = dict(row)
+    t = _tasks.get(job["task"])
+    if job["status"] == "running" and t and time.time() - job["started_at"] > t.timeout:
+        _finish(job_id, "failed", error=f"timed out after {t.timeout:.0f}s")
+        job["status"], job["error"] = "failed", f"timed out after {t.timeout:.0f}s"
+
+    return {
+        "id":       job["id"],
+        "task":     job["task"],
+        "owner":    job["owner"],
+        "status":   job["status"],
+        "attempts": job["attempts"],
+        "result":   json.loads(job["result"]) if job["result"] else None,
+        "error":    job["error"] if job["status"] == "failed" else None,
+    }
+
+
+# ── execution ──
+
+def _reap_expired(conn, now: float) -> None:
+    """Fails running jobs past their task's timeout (their process died or the call hung)."""
+    for t in _tasks.values():
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+            "WHERE task = ? AND status = 'running' AND started_at < ?",
+            (f"timed out after {t.timeout:.0f}s", now, t.name, now - t.timeout)
+        )
+
+
+def _claim():
+    """Reaps expired jobs, then marks the oldest due queued job as running and returns it."""
+    conn = _db()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _reap_expired(conn, now)
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE status = 'queued' AND run_after <= ? ORDER BY created_at LIMIT 1", (now,)
+        ).fetchone()
+        job_id = row["id"] if row else None
+        claimed = job_id is not None and conn.execute(
+            "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ? AND status = 'queued'",
+            (now, job_id)
+        ).rowcount == 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone() if claimed else None
+
+
+def _finish(job_id: str, status: str, result=None, error: str | None = None) -> None:
+    _db().execute(
+        "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+        (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+    )
+
+
+def _execute(row) -> None:
+    """Runs one claimed job within its task's timeout; a failed attempt is re-queued for _claim()."""
+    t = _tasks.get(row["task"])
+    if t is None:
+        _finish(row["id"], "failed", error=f"unknown task {row['task']}")
+        return
+
+    payload = json.loads(row["args"])
+    future = _call_pool().submit(t.fn, *payload["args"], **payload["kwargs"])
+    try:
+        result = future.result(timeout=t.timeout)
+    except FutureTimeout:
+        future.cancel()   # still waiting for a call thread, or abandoned if it hung
+        logging.error(f"Job {row['id']} ({t.name}) timed out after {t.timeout:.0f}s")
+        _finish(row["id"], "failed", error=f"timed out after {t.timeout:.0f}s")
+        return
+    except Exception as e:
+        if row["attempts"] <= t.retries:
+            delay = JOB_RETRY_BACKOFF * 2 ** (row["attempts"] - 1)
+            logging.warning(f"Job {row['id']} ({t.name}) attempt {row['attempts']} failed, retrying in {delay:.0f}s: {e}")
+            _db().execute(
+                "UPDATE jobs SET status = 'queued', error = ?, run_after = ? WHERE id = ? AND status = 'running'",
+                (str(e), time.time() + delay, row["id"])
+            )
+            return
+        logging.error(f"Job {row['id']} ({t.name}) failed after {row['attempts']} attempts: {e}")
+        _finish(row["id"], "failed", error=str(e))
+        return
+
+    _finish(row["id"], "done", result=result)
+
+
+def _run(row) -> None:
+    """Thread backend: runs one claimed job and frees its slot."""
+    try:
+        _execute(row)
+    except Exception as e:
+        logging.error(f"Job {row['id']} could not be run: {e}")
+    finally:
+        _slots.release()
+
+
+def _dispatch() -> None:
+    """Thread backend: claims due jobs whenever a pool thread is free."""
+    while True:
+        _slots.acquire()
+        _wake.clear()
+        try:
+            row = _claim()
+        except Exception as e:
+            logging.error(f"Job dispatcher could not claim a job: {e}")
+            row = None
+        if row is None:
+            _slots.release()
+            _wake.wait(JOB_POLL_SECONDS)
+            continue
+        _pool().submit(_run, row)
+
+
+def start() -> None:
+    """Thread backend: starts this process's dispatcher (safe to call repeatedly)."""
+    global _dispatcher
+    if JOB_BACKEND != "thread":
+        return
+    with _executor_lock:
+        if _dispatcher is None or not _dispatcher.is_alive():
+            _dispatcher = threading.Thread(target=_dispatch, name="job-dispatch", daemon=True)
+            _dispatcher.start()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        return _executor
+
+
+def _call_pool() -> ThreadPoolExecutor:
+    """Threads for the task calls; twice JOB_WORKERS so a few hung calls don't starve the rest."""
+    global _calls
+    with _executor_lock:
+        if _calls is None:
+            _calls = ThreadPoolExecutor(max_workers=2 * JOB_WORKERS, thread_name_prefix="job-call")
+        return _calls
+
+
+def run_worker() -> None:
+    """Standalone worker loop for JOB_BACKEND=sqlite."""
+    import importlib
+    for module in TASK_MODULES:
+        importlib.import_module(module)
+
+    logging.info(f"Job worker started on {JOB_DB_PATH} with tasks: {', '.join(sorted(_tasks))}")
+    while True:
+        row = _claim()
+        if row is None:
+            time.sleep(JOB_POLL_SECONDS)
+            continue
+        _execute(row)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+    # run against the importable module so @task registrations land in the same registry
+    from services import jobs
+    jobs.run_worker()
@@ -0,0 +1,178 @@
+from db import db_session, Squire, Team
+from bisect import bisect_left, insort
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from types import SimpleNamespace
+
+import logging
+import os
+import threading
+import time
+
+
+# ────────────── Leaderboard ──────────────
+#
+# combat_mods needs one team's rank and the halls of fame need the top ten,
+# yet both used to sort the whole teams / squires table per request. The
+# leaderboard keeps both rankings in memory as sorted (-score, id) lists:
+# rank lookups are a bisect, top-N is a slice.
+#
+# It stays current without touching every write site: ORM flushes that
+# change Squire.experience_points or Team.reputation (or add a squire/team)
+# are collected per session and applied once that session commits.
+# Bulk query.update() calls bypass those events, and other gunicorn workers
+# don't see this process's changes, so the whole board is also reloaded
+# after LEADERBOARD_TTL seconds.
+#
+# Ties share a rank: rank = 1 + number of entries with a strictly higher score.
+
+LEADERBOARD_TTL = float(os.getenv("LEADERBOARD_TTL", "60"))
+
+
+class Ranking:
+    """Ids ordered by score, highest first, with O(log n) rank lookups."""
+
+    def __init__(self, rows, name_attr: str, score_attr: str):
+        self.name_attr  = name_attr
+        self.score_attr = score_attr
+        self._score = {}
+        self._name  = {}
+        for entry_id, name, score in rows:
+            self._score[entry_id] = score or 0
+            self._name[entry_id]  = name
+        self._keys = sorted((-score, entry_id) for entry_id, score in self._score.items())
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def score(self, entry_id: int) -> int | None:
+        return self._score.get(entry_id)
+
+    def rank(self, entry_id: int) -> int | None:
+        """1-based rank, or None if the id isn't on the board."""
+        score = self._score.get(entry_id)
+        if score is None:
+            return None
+        return bisect_left(self._keys, (-score,)) + 1
+
+    def set(self, entry_id: int, score: int, name: str | None = None) -> None:
+        score = score or 0
+        old = self._score.get(entry_id)
+        if old is not None:
+            i = bisect_left(self._keys, (-old, entry_id))
+            if i < len(self._keys) and self._keys[i] == (-old, entry_id):
+                del self._keys[i]
+        insort(self._keys, (-score, entry_id))
+        self._score[entry_id] = score
+        if name is not None or entry_id not in self._name:
+            self._name[entry_id] = name
+
+    def top(self, n: int = 10) -> list:
+        """The n best entries as objects with id, name and score attributes (as the templates expect)."""
+        return [
+            SimpleNamespace(**{"id": entry_id, self.name_attr: self._name.get(entry_id), self.score_attr: -neg})
+            for neg, entry_id in self._keys[:n]
+        ]
+
+
+class Leaderboard:
+    def __init__(self, teams: Ranking, squires: Ranking):
+        self.teams     = teams
+        self.squires   = squires
+        self.loaded_at = time.monotonic()
+
+    def is_fresh(self) -> bool:
+        return time.monotonic() - self.loaded_at < LEADERBOARD_TTL
+
+
+_board = None
+_board_lock = threading.Lock()
+
+
+def load_leaderboard() -> Leaderboard:
+    """Reads both rankings in their own short-lived session."""
+    db = db_session.session_factory()
+    try:
+        teams   = db.query(Team.id, Team.team_name, Team.reputation).all()
+        squires = db.query(Squire.id, Squire.squire_name, Squire.experience_points).all()
+    finally:
+        db.close()
+
+    logging.debug(f"Leaderboard loaded: {len(teams)} teams, {len(squires)} squires")
+    return Leaderboard(
+        Ranking(teams, "team_name", "reputation"),
+        Ranking(squires, "squire_name", "experience_points")
+    )
+
+
+def get_leaderboard() -> Leaderboard:
+    """Returns the current leaderboard, reloading it once it is older than LEADERBOARD_TTL."""
+    global _board
+    board = _board
+    if board is not None and board.is_fresh():
+        return board
+
+    with _board_lock:
+        if _board is None or not _board.is_fresh():
+            _board = load_leaderboard()
+        return _board
+
+
+def refresh_leaderboard() -> Leaderboard:
+    global _board
+    with _board_lock:
+        _board = load_leaderboard()
+        return _board
+
+
+def team_rank(team_id: int | None) -> int | None:
+    return get_leaderboard().teams.rank(team_id) if team_id is not None else None
+
+
+def top_teams(n: int = 10) -> list:
+    return get_leaderboard().teams.top(n)
+
+
+def top_squires(n: int = 10) -> list:
+    return get_leaderboard().squires.top(n)
+
+
+# ── incremental updates from ORM flushes ──
+
+_TRACKED = {
+    Team:   ("teams", "team_name", "reputation"),
+    Squire: ("squires", "squire_name", "experience_points"),
+}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty):
+        tracked = _TRACKED.get(type(obj))
+        if tracked is None:
+            continue
+        ranking, name_attr, score_attr = tracked
+        state = inspect(obj)
+        if obj not in session.new and not state.attrs[score_attr].history.has_changes():
+            continue
+        # a SQL expression assigned to the attribute is expired by now; leave those to the TTL reload
+        score = state.dict.get(score_attr)
+        if obj.id is None or not isinstance(score, int):
+            continue
+        session.info.setdefault("leaderboard_changes", {})[(ranking, obj.id)] = (score, state.dict.get(name_attr))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session):
+    changes = session.info.pop("leaderboard_changes", None)
+    board = _board
+    if not changes or board is None:
+        return
+    with _board_lock:
+        for (ranking, entry_id), (score, name) in changes.items():
+            getattr(board, ranking).set(entry_id, score, name)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("leaderboard_changes", None)
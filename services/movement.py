@@ -0,0 +1,352 @@
+from db import insert_ignore, Squire, Team, Inventory, Riddle, SquireRiddleProgress, TravelHistory, ChestHint
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+from services.world import get_world_state, record_visit, record_hint
+from services.capabilities import from_items, BOOTS, BOAT
+
+import logging
+import os
+import random
+
+
+# Longest path /ajax_move_path will walk in one request
+MOVE_PATH_MAX_STEPS = int(os.getenv("MOVE_PATH_MAX_STEPS", "25"))
+
+# Tiles that end a move with a scripted event instead of the usual
+# chest / random-encounter roll: (quest_id, x, y)
+LANDMARKS = {(14, 40, 40), (28, -35, -35), (32, -35, -35), (39, -25, 50)}
+
+DELTAS = {"N": (0, 1), "S": (0, -1), "E": (1, 0), "W": (-1, 0)}
+
+
+class MoveContext:
+    """
+    Everything one /ajax_move needs, loaded once:
+    the Squire row (with inventory), the cached WorldState and the
+    riddle counts used for the quest-completion check.
+    """
+
+    def __init__(self, squire, world, required: int, answered: int, quest_id: int, squire_quest_id: int,
+                 gold: int = 0):
+        self.squire          = squire
+        self.world           = world
+        self.required        = required
+        self.answered        = answered
+        self.quest_id        = quest_id
+        self.squire_quest_id = squire_quest_id
+
+        # plain copies so nothing has to be refreshed after the commit
+        self.squire_id = squire.id
+        self.level     = squire.level or 1
+        self.position  = (squire.x_coordinate, squire.y_coordinate)
+        self.xp        = squire.experience_points or 0
+        self.gold      = gold or 0
+        self.capabilities = from_items(squire.inventory)   # from the joined rows, no extra SELECT
+
+        # write-through to the world cache once the commit succeeds
+        self.new_visits = []
+        self.new_hints  = []
+
+    def can_cross(self, terrain: str | None) -> bool:
+        """Mountains need boots and rivers a boat (as can_enter_tile)."""
+        if terrain == 'mountain':
+            return self.capabilities.has(BOOTS)
+        if terrain == 'river':
+            return self.capabilities.has(BOAT)
+        return True
+
+    def stats(self) -> dict:
+        """
+        Status-bar numbers for the map page. Call before commit_move(): the
+        inventory is read from memory and expires with the commit.
+        """
+        food = sum(
+            item.uses_remaining or 0 for item in self.squire.inventory
+            if item.item_type == 'food' and (item.uses_remaining or 0) > 0
+        )
+        return {
+            "food":     food,
+            "xp":       self.xp,
+            "gold":     self.gold,
+            "answered": self.answered,
+            "required": self.required,
+            "level":    self.level,
+        }
+
+
+def load_move_context(db, squire_id: int, quest_id: int, squire_quest_id: int) -> MoveContext | None:
+    """
+    One SELECT for the squire, their inventory (joined), the team's gold
+    and the required / answered riddle counts (scalar subqueries), plus the
+    world cache (no SELECT when warm).
+    """
+    team_gold = (
+        select(Team.gold)
+        .where(Team.id == Squire.team_id)
+        .scalar_subquery()
+    )
+    total_hard = (
+        select(func.count(Riddle.id))
+        .where(Riddle.quest_id == quest_id, Riddle.difficulty == 'Hard')
+        .scalar_subquery()
+    )
+    answered = (
+        select(func.count(SquireRiddleProgress.id))
+        .where(
+            SquireRiddleProgress.squire_id == squire_id,
+            SquireRiddleProgress.quest_id == quest_id,
+            SquireRiddleProgress.answered_correctly == True
+        )
+        .scalar_subquery()
+    )
+
+    row = (
+        db.query(Squire, total_hard, answered, team_gold)
+          .options(joinedload(Squire.inventory))
+          .filter(Squire.id == squire_id)
+          .first()
+    )
+    if not row:
+        logging.error(f"load_move_context: squire {squire_id} not found")
+        return None
+
+    squire, hard_count, answered_count, gold = row
+    world = get_world_state(db, squire_id, squire_quest_id)
+    return MoveContext(squire, world, (hard_count or 0) + 6, answered_count or 0, quest_id, squire_quest_id,
+                       gold)
+
+
+def consume_food_step(db, ctx: MoveContext) -> tuple[bool, str]:
+    """In-memory version of consume_food(); changes are flushed by commit_move()."""
+    # 1) Level-based chance to skip consumption
+    avoid_chance = min(ctx.level * 3, 75)
+    if random.randint(1, 100) <= avoid_chance:
+        return True, "🌟 Your experience helps you travel efficiently! You avoid hunger this time."
+
+    # 2) First available food item
+    food_item = next(
+        (item for item in ctx.squire.inventory
+         if item.item_type == 'food' and (item.uses_remaining or 0) > 0),
+        None
+    )
+    if not food_item:
+        return False, "🚫 No food available! You feel the pangs of hunger."
+
+    # 3) Consume one use
+    food_item.uses_remaining -= 1
+    item_name = food_item.item_name
+
+    if food_item.uses_remaining <= 0:
+        db.delete(food_item)
+        return True, f"🗑️ You finished your {item_name}."
+    return True, f"🍽️ You used your {item_name}. Remaining uses: {food_item.uses_remaining}."
+
+
+def move_step(db, ctx: MoveContext, direction: str) -> tuple[int, int, str]:
+    """
+    In-memory version of update_player_position(): checks the target tile
+    against the cached terrain and the loaded inventory, moves the squire
+    and queues a travel_history row for tiles not visited before.
+    """
+    x_orig, y_orig = ctx.position
+    dx, dy = DELTAS.get(direction, (0, 0))
+    x, y = x_orig + dx, y_orig + dy
+
+    logging.debug(f"Moving {direction} from ({x_orig},{y_orig}) → ({x},{y})")
+
+    # 1) Tile entry permission
+    if not ctx.can_cross(ctx.world.terrain.get((x, y))):
+        return x_orig, y_orig, "❌ Sorry, but you have to take the long way around that map feature."
+
+    # 2) Position
+    ctx.squire.x_coordinate = x
+    ctx.squire.y_coordinate = y
+    ctx.position = (x, y)
+
+    # 3) Travel history, only for new tiles (inserted by commit_move)
+    if (x, y) not in ctx.world.visited and (x, y) not in ctx.new_visits:
+        ctx.new_visits.append((x, y))
+
+    return x, y, f"🌿 You travel unhindered towards the {direction}."
+
+
+def encounter_probability(ctx: MoveContext, proximity: int = 2) -> float:
+    """calculate_enemy_encounter_probability() against the cached world."""
+    x, y = ctx.position
+    probability = 0.05
+    weights = {"forest": 0.02, "mountain": 0.03, "river": 0.04}
+
+    for cx in range(x - proximity, x + proximity + 1):
+        for cy in range(y - proximity, y + proximity + 1):
+            probability += weights.get(ctx.world.terrain.get((cx, cy)), 0)
+            chest = ctx.world.chests.get((cx, cy))
+            if chest and not chest[2]:
+                probability += 0.04
+
+    return min(max(probability, 0.0), 0.9)
+
+
+def chest_step(db, ctx: MoveContext) -> int | None:
+    """
+    Returns the id of the chest under the squire if its riddle is still
+    unsolved, queueing a ChestHint for it unless the world cache already has
+    one. Costs one SELECT, and only on tiles that hold a chest.
+    """
+    chest = ctx.world.chests.get(ctx.position)
+    if not chest:
+        return None
+
+    chest_id, riddle_id, _ = chest
+    solved = (
+        db.query(SquireRiddleProgress.id)
+          .filter(
+              SquireRiddleProgress.squire_id == ctx.squire_id,
+              SquireRiddleProgress.riddle_id == riddle_id
+          )
+          .first()
+    )
+    if solved:
+        return None
+
+    x, y = ctx.position
+    if (x, y) not in ctx.world.hints and (x, y) not in ctx.new_hints:
+        ctx.new_hints.append((x, y))
+    else:
+        logging.debug("👍 ChestHint already recorded for that location.")
+    return chest_id
+
+
+def step(db, ctx: MoveContext, direction: str) -> dict:
+    """
+    Runs one move against the loaded context without committing:
+    food → position → encounter odds → completion → chest.
+    Returns a dict describing what happened.
+    """
+    result = {
+        "ok": True,
+        "food_message": "",
+        "message": "",
+        "probability": 0.0,
+        "completed": False,
+        "chest_id": None,
+    }
+
+    # 1) Food
+    ok, result["food_message"] = consume_food_step(db, ctx)
+    if not ok:
+        result["ok"] = False
+        result["position"] = ctx.position
+        return result
+
+    # 2) Position + travel history
+    x, y, result["message"] = move_step(db, ctx, direction)
+    result["position"] = (x, y)
+
+    # 3) Encounter odds
+    result["probability"] = encounter_probability(ctx)
+
+    # 4) Quest completion
+    result["completed"] = ctx.answered >= ctx.required
+    logging.debug(f"{ctx.required} {ctx.answered}")
+
+    # 5) Chest, unless the tile is the town or a scripted landmark
+    if not result["completed"] and (x, y) != (0, 0) and (ctx.quest_id, x, y) not in LANDMARKS:
+        result["chest_id"] = chest_step(db, ctx)
+
+    return result
+
+
+def arrival_event(ctx: MoveContext, result: dict) -> str | None:
+    """
+    The event a completed step ends in, checked in the order /ajax_move
+    always used: scripted landmarks, town, chest, then the random encounters.
+    Quest completion is checked by the caller before this.
+    """
+    x, y = result["position"]
+    if ctx.quest_id == 14 and (x, y) == (40, 40):
+        return "q14bossfight"
+    if ctx.quest_id == 28 and (x, y) == (-35, -35):
+        return "q28tourney"
+    if ctx.quest_id == 32 and (x, y) == (-35, -35):
+        return "q32tourney"
+    if ctx.quest_id == 39 and (x, y) == (-25, 50):
+        return "dungeon"
+    if (x, y) == (0, 0):
+        return "town"
+    if result["chest_id"]:
+        return "treasure"
+    return roll_encounter(result["probability"], ctx.level)
+
+
+def roll_encounter(probability: float, level: int) -> str | None:
+    """One roll per step for the random encounters; `probability` is the enemy chance."""
+    eligible_events = []
+
+    # 🏞️ NPC Encounter
+    if random.random() < 0.02:
+        eligible_events.append("npc")
+    if random.random() < 0.03:
+        eligible_events.append("npc_trader")
+
+    # 🧙‍♂️ Riddle Encounter
+    if random.random() < 0.02:
+        eligible_events.append("riddle")
+
+    # ⚔️ Combat
+    if random.random() < probability:
+        eligible_events.append("enemy")
+
+    if random.random() < 0.02 and level > 3:
+        eligible_events.append("blacksmith")
+
+    return random.choice(eligible_events) if eligible_events else None
+
+
+def walk_path(db, ctx: MoveContext, directions) -> tuple[dict | None, int, str]:
+    """
+    Runs step() for each direction without committing, stopping at the first
+    step that runs out of food, is blocked, completes the quest or ends in
+    an event. Returns (last step result, steps taken, stop reason); the stop
+    reason is "path_end" when every step was walked without incident.
+    """
+    result = None
+    for taken, direction in enumerate(directions):
+        before = ctx.position
+        result = step(db, ctx, direction)
+        if not result["ok"]:
+            return result, taken, "no_food"
+        if result["position"] == before:
+            return result, taken, "blocked"
+        if result["completed"]:
+            return result, taken + 1, "quest_complete"
+
+        result["event"] = arrival_event(ctx, result)
+        if result["event"]:
+            return result, taken + 1, result["event"]
+    return result, len(directions), "path_end"
+
+
+def commit_move(db, ctx: MoveContext) -> None:
+    """
+    Writes the queued travel history and chest hints (one INSERT each) and
+    flushes every other queued change in the same commit, then updates the
+    world cache. Both inserts skip rows that already exist: the world cache
+    may be stale when another worker recorded them.
+    """
+    if ctx.new_visits:
+        db.execute(
+            insert_ignore(TravelHistory, db.get_bind()),
+            [{"squire_id": ctx.squire_id, "x_coordinate": x, "y_coordinate": y} for x, y in ctx.new_visits]
+        )
+    if ctx.new_hints:
+        db.execute(
+            insert_ignore(ChestHint, db.get_bind()),
+            [{"squire_quest_id": ctx.squire_quest_id, "chest_x": x, "chest_y": y} for x, y in ctx.new_hints]
+        )
+    db.commit()
+    for x, y in ctx.new_visits:
+        record_visit(ctx.squire_id, x, y)
+    for x, y in ctx.new_hints:
+        record_hint(ctx.squire_quest_id, x, y)
+    ctx.new_visits = []
+    ctx.new_hints  = []
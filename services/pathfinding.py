@@ -0,0 +1,161 @@
+from array import array
+from heapq import heappush, heappop
+
+import logging
+import time
+
+
+# ────────────── Route planning ──────────────
+#
+# Click-to-travel needs a legal route across the squire's map: mountains need
+# boots and rivers a boat (the same rule move_step / can_enter_tile apply).
+# The terrain of a world is packed once into a TerrainGrid, one byte per tile
+# over the bounding box of its map features, and kept on the WorldState
+# (terrain never changes for a cached world). Tiles outside the box are open
+# ground. find_route() runs A* with a Manhattan heuristic over flat arrays
+# sized to the box spanned by the grid, the start and the goal.
+#
+# The goal comes from the client, so it must lie within ROUTE_MARGIN tiles of
+# the box spanned by the world's features and the squire (route_bounds), and
+# no search allocates buffers for more than ROUTE_MAX_AREA tiles.
+
+ROUTE_MARGIN   = 10
+ROUTE_MAX_AREA = 250_000   # tiles, ~1.5 MB of search buffers
+
+OPEN, FOREST, MOUNTAIN, RIVER = range(4)
+TERRAIN_CODES = {"forest": FOREST, "mountain": MOUNTAIN, "river": RIVER}
+
+# (direction, dx, dy); the index + 1 is what came_from stores
+STEPS = (("N", 0, 1), ("S", 0, -1), ("E", 1, 0), ("W", -1, 0))
+
+
+class TerrainGrid:
+    """Terrain codes for the bounding box of one world's map features."""
+
+    def __init__(self, terrain: dict):
+        if terrain:
+            xs = [x for x, _ in terrain]
+            ys = [y for _, y in terrain]
+            self.x0, self.y0 = min(xs), min(ys)
+            self.width  = max(xs) - self.x0 + 1
+            self.height = max(ys) - self.y0 + 1
+        else:
+            self.x0 = self.y0 = self.width = self.height = 0
+
+        self.cells = bytearray(self.width * self.height)
+        for (x, y), terrain_type in terrain.items():
+            self.cells[(y - self.y0) * self.width + (x - self.x0)] = TERRAIN_CODES.get(terrain_type, OPEN)
+
+    def code(self, x: int, y: int) -> int:
+        cx, cy = x - self.x0, y - self.y0
+        if 0 <= cx < self.width and 0 <= cy < self.height:
+            return self.cells[cy * self.width + cx]
+        return OPEN
+
+
+def terrain_grid(world) -> TerrainGrid:
+    """The world's TerrainGrid, built on first use."""
+    grid = world.terrain_grid
+    if grid is None:
+        grid = world.terrain_grid = TerrainGrid(world.terrain)
+    return grid
+
+
+def route_bounds(world, start: tuple[int, int]) -> tuple[int, int, int, int]:
+    """(x_min, x_max, y_min, y_max) a travel goal may lie in."""
+    grid = terrain_grid(world)
+    if grid.width:
+        x_min, x_max = min(grid.x0, start[0]), max(grid.x0 + grid.width - 1, start[0])
+        y_min, y_max = min(grid.y0, start[1]), max(grid.y0 + grid.height - 1, start[1])
+    else:
+        x_min = x_max = start[0]
+        y_min = y_max = start[1]
+    return x_min - ROUTE_MARGIN, x_max + ROUTE_MARGIN, y_min - ROUTE_MARGIN, y_max + ROUTE_MARGIN
+
+
+def in_route_bounds(world, start: tuple[int, int], goal: tuple[int, int]) -> bool:
+    x_min, x_max, y_min, y_max = route_bounds(world, start)
+    return x_min <= goal[0] <= x_max and y_min <= goal[1] <= y_max
+
+
+def find_route(world, start: tuple[int, int], goal: tuple[int, int], boots: bool = False, boat: bool = False,
+               avoid=()) -> str | None:
+    """
+    Shortest route from `start` to `goal` as a string of N/S/E/W steps ("" if
+    already there), or None if the terrain blocks every way. Tiles in `avoid`
+    (town, scripted landmarks) are only entered if they are the goal.
+    """
+    started = time.perf_counter()
+    grid = terrain_grid(world)
+
+    # 1) Which terrain codes the squire can cross
+    passable = bytearray([1, 1, 1 if boots else 0, 1 if boat else 0])
+    if not passable[grid.code(*goal)]:
+        return None
+
+    # 2) Search box: the grid plus start and goal, with a ring of open ground around it
+    x_min = min(grid.x0, start[0], goal[0]) - 1
+    y_min = min(grid.y0, start[1], goal[1]) - 1
+    x_max = max(grid.x0 + grid.width - 1, start[0], goal[0]) + 1
+    y_max = max(grid.y0 + grid.height - 1, start[1], goal[1]) + 1
+    width, height = x_max - x_min + 1, y_max - y_min + 1
+    if width * height > ROUTE_MAX_AREA:
+        logging.warning(f"find_route: {width}x{height} search box for {start} → {goal} exceeds ROUTE_MAX_AREA")
+        return None
+
+    blocked = bytearray(width * height)
+    for y in range(grid.y0, grid.y0 + grid.height):
+        row, base = (y - grid.y0) * grid.width, (y - y_min) * width + (grid.x0 - x_min)
+        for i in range(grid.width):
+            if not passable[grid.cells[row + i]]:
+                blocked[base + i] = 1
+    for x, y in avoid:
+        if (x, y) != tuple(goal) and x_min <= x <= x_max and y_min <= y <= y_max:
+            blocked[(y - y_min) * width + (x - x_min)] = 1
+
+    # 3) A*
+    start_i = (start[1] - y_min) * width + (start[0] - x_min)
+    goal_i  = (goal[1] - y_min) * width + (goal[0] - x_min)
+    gx, gy  = goal[0] - x_min, goal[1] - y_min
+
+    best = array("i", [-1]) * (width * height)   # cost so far, -1 = unseen
+    came = bytearray(width * height)             # STEPS index + 1 of the step into the tile
+    best[start_i] = 0
+    h = abs(start[0] - goal[0]) + abs(start[1] - goal[1])
+    heap = [(h, h, start_i)]   # (f, h, tile): on equal f, the tile nearer the goal first
+
+    while heap:
+        _, _, i = heappop(heap)
+        if i == goal_i:
+            break
+        cost = best[i] + 1
+        cy, cx = divmod(i, width)
+        for k, (_, dx, dy) in enumerate(STEPS):
+            nx, ny = cx + dx, cy + dy
+            if not (0 <= nx < width and 0 <= ny < height):
+                continue
+            n = ny * width + nx
+            if blocked[n] or (best[n] != -1 and best[n] <= cost):
+                continue
+            best[n] = cost
+            came[n] = k + 1
+            h = abs(nx - gx) + abs(ny - gy)
+            heappush(heap, (cost + h, h, n))
+    else:
+        logging.debug(f"find_route: no route {start} → {goal}")
+        return None
+
+    # 4) Walk back from the goal
+    route = []
+    i = goal_i
+    while i != start_i:
+        direction, dx, dy = STEPS[came[i] - 1]
+        route.append(direction)
+        i -= dy * width + dx
+    route.reverse()
+
+    logging.debug(
+        f"find_route: {start} → {goal} in {len(route)} steps, "
+        f"{(time.perf_counter() - started) * 1000:.2f} ms"
+    )
+    return "".join(route)
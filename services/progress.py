@@ -1,7 +1,9 @@
-from db import Squire, Course, Team, engine, db_session, Team, TravelHistory, Quest, SquireQuestion, SquireRiddleProgress, Riddle, Enemy, Inventory, WizardItem, Job, MapFeature, MultipleChoiceQuestion, TrueFalseQuestion, ShopItem, SquireQuestStatus, TeamMessage, TreasureChest, XpThreshold, ChestHint
+from db import insert_ignore, Squire, Course, Team, engine, db_session, Team, TravelHistory, Quest, SquireQuestion, SquireRiddleProgress, Riddle, Enemy, Inventory, WizardItem, Job, MapFeature, MultipleChoiceQuestion, TrueFalseQuestion, ShopItem, SquireQuestStatus, TeamMessage, TreasureChest, XpThreshold, ChestHint
 from flask import session as flask_session
 from sqlalchemy import or_, func, and_, asc, not_, desc
-from sqlalchemy.dialects.mysql import insert
+from services.world import record_visit
+from services.catalogue import get_catalogue
+from services.capabilities import get_capabilities, BOOTS, BOAT
 
 import logging
 
@@ -42,24 +44,10 @@ def can_enter_tile(db_session, squire_id, new_x, new_y):
         terrain = mf.terrain_type
         if terrain == 'mountain':
             # Require boots
-            return (
-                db_session.query(Inventory)
-                .filter(
-                    Inventory.squire_id == squire_id,
-                    Inventory.item_name.ilike('%Boots%')
-                )
-                .count() > 0
-            )
+            return get_capabilities(db_session, squire_id).has(BOOTS)
         if terrain == 'river':
             # Require boat
-            return (
-                db_session.query(Inventory)
-                .filter(
-                    Inventory.squire_id == squire_id,
-                    Inventory.item_name.ilike('%Boat%')
-                )
-                .count() > 0
-            )
+            return get_capabilities(db_session, squire_id).has(BOAT)
     # Default: allow entry
     return True
 
@@ -99,70 +87,61 @@ def check_for_level_up(squire_id: int, db) -> int | None:
     xp = squire.experience_points or 0
     current_level = squire.level
 
-    thresholds = ( db.query(XpThreshold)
-        .order_by(XpThreshold.level.asc())
-        .all()
-        )
-
-    for threshold in thresholds:
-        if current_level < threshold.level and xp >= threshold.min:
-            squire.level = threshold.level
-            db.commit()
-            return threshold.level
-    return None
+    new_level = get_catalogue().next_level(current_level, xp)
+    if new_level is not None:
+        squire.level = new_level
+        db.commit()
+    return new_level
 
 def update_player_position(db, squire_id: int, direction: str):
     """
     Updates the player's coordinates based on movement direction,
     records travel history, and returns (new_x, new_y, message).
+    Commits once; the caller owns (and closes) the session.
     """
-    try:
-        # 1) Load current position
-        squire = db.query(Squire).get(squire_id)
-        if not squire:
-            logging.error("❌ ERROR: Player not found in update_player_position!")
-            return None
-
-        x_orig, y_orig = squire.x_coordinate, squire.y_coordinate
-
-        # 2) Compute new coords
-        if direction == "N":
-            x, y = x_orig, y_orig + 1
-        elif direction == "S":
-            x, y = x_orig, y_orig - 1
-        elif direction == "E":
-            x, y = x_orig + 1, y_orig
-        elif direction == "W":
-            x, y = x_orig - 1, y_orig
-        elif direction == "V":
-            x, y = 0, 0
-        else:
-            x, y = x_orig, y_orig
-
-        logging.debug(f"Moving {direction} from ({x_orig},{y_orig}) → ({x},{y})")
-
-        # 3) Check tile entry permission
-        if not can_enter_tile(db, squire_id, x, y):
-            message = "❌ Sorry, but you have to take the long way around that map feature."
-            return x_orig, y_orig, message
-
-        # 4) Update squire position
-        squire.x_coordinate = x
-        squire.y_coordinate = y
-        db.commit()
-
-        # 5) Log travel history
-        stmt = insert(TravelHistory).values(
-            squire_id=squire_id,
-            x_coordinate=x,
-            y_coordinate=y
-        ).prefix_with("IGNORE")  # Optional: skip if exists
-
-        db.execute(stmt)
-        db.commit()
-
-        message = f"🌿 You travel unhindered towards the {direction}."
-        return x, y, message
-
-    finally:
-        db.close()
+    # 1) Load current position
+    squire = db.query(Squire).get(squire_id)
+    if not squire:
+        logging.error("❌ ERROR: Player not found in update_player_position!")
+        return None
+
+    x_orig, y_orig = squire.x_coordinate, squire.y_coordinate
+
+    # 2) Compute new coords
+    if direction == "N":
+        x, y = x_orig, y_orig + 1
+    elif direction == "S":
+        x, y = x_orig, y_orig - 1
+    elif direction == "E":
+        x, y = x_orig + 1, y_orig
+    elif direction == "W":
+        x, y = x_orig - 1, y_orig
+    elif direction == "V":
+        x, y = 0, 0
+    else:
+        x, y = x_orig, y_orig
+
+    logging.debug(f"Moving {direction} from ({x_orig},{y_orig}) → ({x},{y})")
+
+    # 3) Check tile entry permission
+    if not can_enter_tile(db, squire_id, x, y):
+        message = "❌ Sorry, but you have to take the long way around that map feature."
+        return x_orig, y_orig, message
+
+    # 4) Update squire position
+    squire.x_coordinate = x
+    squire.y_coordinate = y
+
+    # 5) Log travel history
+    stmt = insert_ignore(TravelHistory, db.get_bind()).values(
+        squire_id=squire_id,
+        x_coordinate=x,
+        y_coordinate=y
+    )  # skip if already visited
+
+    db.execute(stmt)
+    db.commit()
+    record_visit(squire_id, x, y)
+
+    message = f"🌿 You travel unhindered towards the {direction}."
+    return x, y, message
@@ -0,0 +1,141 @@
+from db import db_session, GeneratedQuestion, SquireQuestionAttempt
+from services import jobs, random_pick
+from services.jobs import task
+from utils.api_calls import get_textbook_page, question_from_excerpt, QUESTION_MODEL
+
+import argparse
+import logging
+import os
+import threading
+import time
+
+
+# ────────────── Pre-generated API question pool ──────────────
+#
+# Generating a question inline means opening the textbook PDF and waiting on
+# GPT while the player sits in combat. Instead, each quest keeps a pool of
+# validated GeneratedQuestion rows (with the book, page and model they came
+# from). Combat draws an unseen one instantly; when a squire has fewer than
+# QUESTION_POOL_LOW_WATER unseen questions left, a background job adds
+# QUESTION_POOL_BATCH more, up to QUESTION_POOL_MAX per quest.
+
+QUESTION_POOL_LOW_WATER = int(os.getenv("QUESTION_POOL_LOW_WATER", "5"))
+QUESTION_POOL_BATCH     = int(os.getenv("QUESTION_POOL_BATCH", "5"))
+QUESTION_POOL_MAX       = int(os.getenv("QUESTION_POOL_MAX", "200"))
+
+_refilling      = {}       # quest_id -> time the last refill was enqueued (this process)
+_refill_lock    = threading.Lock()
+REFILL_COOLDOWN = 120      # seconds before the same quest may be refilled again
+
+
+def validate(q) -> bool:
+    """A usable question: text, four distinct non-empty options and a correct letter among them."""
+    if not isinstance(q, dict) or not str(q.get("question", "")).strip():
+        return False
+    options = q.get("options")
+    if not isinstance(options, dict) or set(options) != set("ABCD"):
+        return False
+    values = [str(v).strip() for v in options.values()]
+    if not all(values) or len(set(values)) != 4:
+        return False
+    return q.get("correct_answer") in options
+
+
+@task("refill_question_pool", retries=1, timeout=600)
+def refill(quest_id: int, count: int = QUESTION_POOL_BATCH) -> int:
+    """Generates up to `count` validated questions for the quest; returns how many were stored."""
+    db = db_session.session_factory()
+    try:
+        stored = 0
+        for _ in range(count):
+            # 1) A random textbook page for the quest
+            page = get_textbook_page(quest_id)
+            if not page:
+                break
+            book_name, page_number, text = page
+
+            # 2) Ask GPT and keep only well-formed questions
+            q = question_from_excerpt(quest_id, text)
+            if not validate(q):
+                logging.warning(f"Discarding malformed generated question for quest {quest_id} (page {page_number})")
+                continue
+
+            db.add(GeneratedQuestion(
+                quest_id      = quest_id,
+                question_text = q["question"].strip(),
+                optionA       = str(q["options"]["A"]).strip(),
+                optionB       = str(q["options"]["B"]).strip(),
+                optionC       = str(q["options"]["C"]).strip(),
+                optionD       = str(q["options"]["D"]).strip(),
+                correctAnswer = q["correct_answer"],
+                book_name     = book_name,
+                page_number   = page_number,
+                model         = QUESTION_MODEL
+            ))
+            db.commit()
+            stored += 1
+
+        logging.info(f"Question pool for quest {quest_id}: added {stored} of {count}")
+        return stored
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+        random_pick.invalidate(GeneratedQuestion)
+
+
+def request_refill(quest_id: int, pool_size: int) -> None:
+    """Enqueues a refill for the quest unless one was enqueued recently or the pool is full."""
+    if pool_size >= QUESTION_POOL_MAX:
+        return
+    now = time.monotonic()
+    with _refill_lock:
+        if now - _refilling.get(quest_id, -REFILL_COOLDOWN) < REFILL_COOLDOWN:
+            return
+        _refilling[quest_id] = now
+    jobs.enqueue("refill_question_pool", quest_id, min(QUESTION_POOL_BATCH, QUESTION_POOL_MAX - pool_size))
+
+
+def seen_ids(db, squire_id: int) -> set:
+    """Pool questions the squire has already been asked (recorded as api_generated attempts)."""
+    return {
+        qid for (qid,) in
+        db.query(SquireQuestionAttempt.question_id)
+          .filter(
+              SquireQuestionAttempt.squire_id == squire_id,
+              SquireQuestionAttempt.question_type == 'api_generated',
+              SquireQuestionAttempt.question_id > 0
+          )
+          .all()
+    }
+
+
+def draw(db, squire_id: int, quest_id: int) -> GeneratedQuestion | None:
+    """
+    Returns a random pool question for the quest that the squire hasn't seen,
+    or None if there is none yet. Tops the pool up in the background when the
+    squire is running low.
+    """
+    ids = random_pick.eligible_ids(db, GeneratedQuestion, ("quest", quest_id), GeneratedQuestion.quest_id == quest_id)
+    seen = seen_ids(db, squire_id)
+
+    if len(ids) - len(seen.intersection(ids)) <= QUESTION_POOL_LOW_WATER:
+        request_refill(quest_id, len(ids))
+
+    return random_pick.pick(
+        db, GeneratedQuestion, ("quest", quest_id),
+        GeneratedQuestion.quest_id == quest_id,
+        exclude=seen
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate API questions for a quest.")
+    parser.add_argument("quest_id", type=int)
+    parser.add_argument("--count", type=int, default=20)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from services import question_pool
+    print(f"Stored {question_pool.refill(args.quest_id, args.count)} questions for quest {args.quest_id}")
@@ -0,0 +1,130 @@
+from db import SquireQuestion, SquireRiddleProgress
+
+import logging
+import os
+import random
+import threading
+import time
+
+
+# ────────────── Random pick engine ──────────────
+#
+# ORDER BY RAND() makes MySQL read and sort every row that matches the filter
+# just to return one. The question banks, riddles, enemies and item catalogues
+# only change when an instructor edits content, so we cache the list of
+# eligible primary keys per filter, choose in Python (minus whatever the squire
+# has already answered) and fetch the single winner by primary key.
+
+RANDOM_PICK_TTL = float(os.getenv("RANDOM_PICK_TTL", "300"))
+
+_id_cache = {}    # (tablename, *key) -> (loaded_at, tuple of ids)
+_id_lock  = threading.Lock()
+
+
+def eligible_ids(db, model, key: tuple, *criteria) -> tuple:
+    """
+    Returns the cached ids of `model` rows matching `criteria`.
+    `key` must uniquely describe the criteria (e.g. ("quest", 17)); it is
+    namespaced by table, so callers only need to be unique per model.
+    """
+    cache_key = (model.__tablename__,) + tuple(key)
+    now = time.monotonic()
+
+    with _id_lock:
+        hit = _id_cache.get(cache_key)
+        if hit and now - hit[0] < RANDOM_PICK_TTL:
+            return hit[1]
+
+    ids = tuple(i for (i,) in db.query(model.id).filter(*criteria).order_by(model.id).all())
+    logging.debug(f"random_pick: loaded {len(ids)} ids for {cache_key}")
+
+    with _id_lock:
+        _id_cache[cache_key] = (now, ids)
+    return ids
+
+
+def invalidate(model=None) -> None:
+    """Drops cached id lists for one model, or for every model."""
+    with _id_lock:
+        if model is None:
+            _id_cache.clear()
+            return
+        for k in [k for k in _id_cache if k[0] == model.__tablename__]:
+            del _id_cache[k]
+
+
+def _choose(ids: tuple, exclude, k: int) -> list:
+    """Uniform choice of up to k ids not in `exclude`."""
+    if not exclude:
+        return random.sample(ids, min(k, len(ids)))
+
+    # 1) Mostly-unanswered banks: a few random probes are cheaper than a scan
+    if k == 1 and len(exclude) * 2 < len(ids):
+        for _ in range(8):
+            candidate = random.choice(ids)
+            if candidate not in exclude:
+                return [candidate]
+
+    # 2) Otherwise filter once
+    remaining = [i for i in ids if i not in exclude]
+    return random.sample(remaining, min(k, len(remaining)))
+
+
+def pick(db, model, key: tuple, *criteria, exclude=(), allow_repeats: bool = False):
+    """
+    Returns one random `model` row matching `criteria` whose id is not in
+    `exclude`, or None. With allow_repeats, falls back to the whole set once
+    everything has been excluded.
+    """
+    for attempt in range(2):
+        ids = eligible_ids(db, model, key, *criteria)
+        if not ids:
+            return None
+
+        chosen = _choose(ids, exclude, 1)
+        if not chosen and allow_repeats:
+            chosen = _choose(ids, (), 1)
+        if not chosen:
+            return None
+
+        row = db.get(model, chosen[0])
+        if row is not None:
+            return row
+
+        # the row was deleted since the ids were cached: reload once
+        invalidate(model)
+    return None
+
+
+def sample(db, model, key: tuple, *criteria, k: int, exclude=()) -> list:
+    """Returns up to k distinct random `model` rows matching `criteria`."""
+    ids = eligible_ids(db, model, key, *criteria)
+    chosen = _choose(ids, exclude, k)
+    if not chosen:
+        return []
+
+    rows = {row.id: row for row in db.query(model).filter(model.id.in_(chosen)).all()}
+    return [rows[i] for i in chosen if i in rows]
+
+
+def answered_question_ids(db, squire_id: int, question_type: str) -> set:
+    """Ids of questions of `question_type` the squire has already encountered."""
+    return {
+        qid for (qid,) in
+        db.query(SquireQuestion.question_id)
+          .filter(
+              SquireQuestion.squire_id == squire_id,
+              SquireQuestion.question_type == question_type
+          )
+          .all()
+    }
+
+
+def solved_riddle_ids(db, squire_id: int) -> set:
+    """Ids of riddles the squire has a SquireRiddleProgress row for."""
+    return {
+        rid for (rid,) in
+        db.query(SquireRiddleProgress.riddle_id)
+          .filter(SquireRiddleProgress.squire_id == squire_id)
+          .all()
+    }
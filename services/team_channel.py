@@ -0,0 +1,205 @@
+from db import db_session, TeamMessage
+from collections import deque
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+
+# ────────────── Team message channel ──────────────
+#
+# Map pages used to poll /team_messages every 5 seconds, one query per open
+# tab. Instead, each open tab now holds one Server-Sent Events stream and
+# this per-process broker fans messages out to every stream of the team.
+#
+# - add_team_message() publishes straight into the broker, so players served
+#   by the same worker see a message immediately.
+# - Messages written by other gunicorn workers are picked up by a single
+#   poller thread per process (one query every TEAM_POLL_SECONDS while
+#   anybody is subscribed, however many players are connected).
+# - A reconnecting client sends Last-Event-ID and catches up from the DB.
+#
+# - A new stream starts with an id-only frame at the team's newest message,
+#   so even a stream that saw no messages reconnects with Last-Event-ID and
+#   nothing posted during the reconnect gap is lost.
+#
+# Streams end after TEAM_STREAM_SECONDS and the browser reconnects, so a
+# stream never outlives the worker timeout. An open stream holds whatever
+# serves the request for that long: cheap for a gevent greenlet, but with
+# sync or gthread workers a handful of open tabs would take every slot. So
+# streaming_enabled() only turns SSE on in a gevent-patched worker; elsewhere
+# the map page keeps polling /team_messages every 5 seconds.
+
+TEAM_STREAM_SECONDS = float(os.getenv("TEAM_STREAM_SECONDS", "25"))
+TEAM_POLL_SECONDS   = float(os.getenv("TEAM_POLL_SECONDS", "3"))
+KEEPALIVE_SECONDS   = 10
+CATCH_UP_LIMIT      = 50
+
+_subscribers = {}          # team_id -> set of queue.Queue
+_delivered   = {}          # team_id -> deque of recently delivered ids (dedupe)
+_lock        = threading.Lock()
+_poller      = None
+_high_water  = None        # highest TeamMessage.id the poller has seen
+
+
+def message_payload(tm: TeamMessage) -> dict:
+    return {
+        "id":         tm.id,
+        "message":    tm.message,
+        "created_at": tm.created_at.isoformat() if tm.created_at else None
+    }
+
+
+def publish(team_id: int, payload: dict) -> None:
+    """Delivers a message to every stream subscribed to the team (once)."""
+    with _lock:
+        seen = _delivered.setdefault(team_id, deque(maxlen=200))
+        if payload["id"] in seen:
+            return
+        seen.append(payload["id"])
+        targets = list(_subscribers.get(team_id, ()))
+
+    for q in targets:
+        q.put(payload)
+
+
+def subscribe(team_id: int) -> queue.Queue:
+    q = queue.Queue()
+    with _lock:
+        _subscribers.setdefault(team_id, set()).add(q)
+    _ensure_poller()
+    return q
+
+
+def unsubscribe(team_id: int, q: queue.Queue) -> None:
+    with _lock:
+        subs = _subscribers.get(team_id)
+        if subs:
+            subs.discard(q)
+            if not subs:
+                del _subscribers[team_id]
+
+
+def streaming_enabled() -> bool:
+    """True when this process runs under gevent (GUNICORN_WORKER_CLASS=gevent with gevent installed)."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+def latest_message_id(team_id: int) -> int:
+    db = db_session.session_factory()
+    try:
+        return (
+            db.query(TeamMessage.id)
+              .filter(TeamMessage.team_id == team_id)
+              .order_by(TeamMessage.id.desc())
+              .limit(1)
+              .scalar()
+        ) or 0
+    finally:
+        db.close()
+
+
+def messages_after(team_id: int, last_id: int, limit: int = CATCH_UP_LIMIT) -> list[dict]:
+    """DB catch-up for a reconnecting stream: messages with id > last_id, oldest first."""
+    db = db_session.session_factory()
+    try:
+        rows = (
+            db.query(TeamMessage)
+              .filter(TeamMessage.team_id == team_id, TeamMessage.id > last_id)
+              .order_by(TeamMessage.id.asc())
+              .limit(limit)
+              .all()
+        )
+        return [message_payload(tm) for tm in rows]
+    finally:
+        db.close()
+
+
+def _poll_loop() -> None:
+    """Forwards messages written by other workers; exits once nobody is subscribed."""
+    global _poller, _high_water
+    db = db_session.session_factory()
+    try:
+        _high_water = db.query(TeamMessage.id).order_by(TeamMessage.id.desc()).limit(1).scalar() or 0
+    finally:
+        db.close()
+
+    while True:
+        time.sleep(TEAM_POLL_SECONDS)
+        with _lock:
+            teams = list(_subscribers)
+            if not teams:
+                _poller = None
+                _high_water = None
+                return
+
+        db = db_session.session_factory()
+        try:
+            rows = (
+                db.query(TeamMessage)
+                  .filter(TeamMessage.id > _high_water, TeamMessage.team_id.in_(teams))
+                  .order_by(TeamMessage.id.asc())
+                  .all()
+            )
+            for tm in rows:
+                _high_water = max(_high_water, tm.id)
+                publish(tm.team_id, message_payload(tm))
+        except Exception as e:
+            logging.warning(f"Team channel poll failed: {e}")
+        finally:
+            db.close()
+
+
+def _ensure_poller() -> None:
+    global _poller
+    with _lock:
+        if _poller is None:
+            _poller = threading.Thread(target=_poll_loop, name="team-channel-poller", daemon=True)
+            _poller.start()
+
+
+def _event(payload: dict) -> str:
+    return f"id: {payload['id']}\ndata: {json.dumps(payload)}\n\n"
+
+
+def stream(team_id: int, last_id: int | None = None):
+    """
+    Generator of SSE frames for one client: DB catch-up after last_id (if the
+    client is reconnecting), then live messages until TEAM_STREAM_SECONDS.
+    """
+    q = subscribe(team_id)
+    try:
+        yield "retry: 2000\n\n"
+
+        if last_id is None:
+            # first connection: mark where the client is, so its reconnect catches up from here
+            last_id = latest_message_id(team_id)
+            yield f"id: {last_id}\n\n"
+        else:
+            for payload in messages_after(team_id, last_id):
+                last_id = payload["id"]
+                yield _event(payload)
+
+        deadline = time.monotonic() + TEAM_STREAM_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                payload = q.get(timeout=min(KEEPALIVE_SECONDS, remaining))
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            # skip anything the catch-up already sent
+            if payload["id"] > last_id:
+                last_id = payload["id"]
+                yield _event(payload)
+    finally:
+        unsubscribe(team_id, q)
@@ -0,0 +1,161 @@
+from services.world import get_world_state, load_viewport_snapshot
+from services.movement import DELTAS
+
+import logging
+
+
+# ────────────── Compact map tiles ──────────────
+#
+# The map used to travel as a 225-cell HTML table with an inline style on
+# every <td>, re-sent after every keypress. Instead each cell is one base-32
+# character: the low three bits hold the terrain, the next two the chest
+# overlays. Rows run top (highest y) to bottom, each listing x ascending.
+# The player marker and the fixed landmarks (home, the stronghold, the
+# tourney) are drawn by the client from coordinates.
+#
+# After a one-step move only the strip that scrolled into view is sent;
+# templates/map.html shifts its grid by one and fills in the strip. Tiles that
+# changed in place (visited, hinted, opened) travel as "cells", taken from the
+# world's change log since the version the client last saw (services/world.py).
+# A client on another world token, or too far behind, gets the full viewport.
+# Tokens are per worker (see services/world.py), so a request served by a
+# different gunicorn worker than the last one also gets the full viewport.
+
+VIEWPORT_SIZE = 15
+
+UNSEEN, VISITED, FOREST, MOUNTAIN, RIVER = range(5)
+CHEST_FOUND  = 8    # closed chest the squire has a hint for
+CHEST_OPENED = 16
+
+TERRAIN_CODES = {"forest": FOREST, "mountain": MOUNTAIN, "river": RIVER}
+ALPHABET = "0123456789abcdefghijklmnopqrstuv"
+
+
+def tile_code(terrain: str | None, visited: bool, hinted: bool, opened: bool | None) -> int:
+    """`opened` is None when there is no chest on the tile."""
+    if terrain is not None:
+        code = TERRAIN_CODES.get(terrain, UNSEEN)
+    else:
+        code = VISITED if visited else UNSEEN
+    if opened:
+        code |= CHEST_OPENED
+    elif opened is not None and hinted:
+        code |= CHEST_FOUND
+    return code
+
+
+def _world_code(world, coord) -> int:
+    chest = world.chests.get(coord)
+    return tile_code(
+        world.terrain.get(coord),
+        coord in world.visited,
+        coord in world.hints,
+        chest[2] if chest else None
+    )
+
+
+def _snapshot_code(snapshot: dict, coord) -> int:
+    return tile_code(
+        snapshot["terrain"].get(coord),
+        coord in snapshot["visited"],
+        coord in snapshot["hints"],
+        (coord in snapshot["opened"]) if coord in snapshot["chests"] else None
+    )
+
+
+def encode_snapshot(snapshot: dict) -> dict:
+    """Full viewport from a load_viewport_snapshot / WorldState.viewport snapshot."""
+    x_min, x_max, y_min, y_max = snapshot["bounds"]
+    return {
+        "x0":   x_min,
+        "y0":   y_max,
+        "size": x_max - x_min + 1,
+        "pos":  list(snapshot["position"]),
+        "rows": [
+            "".join(ALPHABET[_snapshot_code(snapshot, (cx, ry))] for cx in range(x_min, x_max + 1))
+            for ry in range(y_max, y_min - 1, -1)
+        ],
+    }
+
+
+def viewport_tiles(db, squire_id: int, quest_id: int, squire_quest_id: int | None,
+                   position: tuple[int, int] | None = None, size: int = VIEWPORT_SIZE) -> dict | None:
+    """
+    Encoded viewport around the squire: drawn from the cached world when the
+    squire_quest and position are known, otherwise in one round trip.
+    """
+    if squire_quest_id and position is not None:
+        world = get_world_state(db, squire_id, squire_quest_id)
+        version = world.version
+        tiles = encode_snapshot(world.viewport(tuple(position), size))
+        tiles["world"], tiles["version"] = world.token, version
+        return tiles
+
+    snapshot = load_viewport_snapshot(db, squire_id, quest_id, size)
+    if not snapshot or not snapshot["has_quest"]:
+        logging.error(f"viewport_tiles: no position or active quest for squire {squire_id}, quest {quest_id}")
+        return None
+    return encode_snapshot(snapshot)
+
+
+def edge_tiles(world, position: tuple[int, int], direction: str, size: int = VIEWPORT_SIZE) -> dict:
+    """
+    The row or column that scrolled into view after one step `direction`
+    onto `position`, plus the new origin so the client can check it is in sync.
+    """
+    x, y = position
+    half = size // 2
+    x_min, y_max = x - half, y + half
+
+    if direction in ("N", "S"):
+        ry = y + half if direction == "N" else y - half
+        strip = [(cx, ry) for cx in range(x - half, x + half + 1)]
+    else:
+        cx = x + half if direction == "E" else x - half
+        strip = [(cx, ry) for ry in range(y + half, y - half - 1, -1)]
+
+    return {
+        "shift": direction,
+        "x0":    x_min,
+        "y0":    y_max,
+        "pos":   [x, y],
+        "strip": "".join(ALPHABET[_world_code(world, c)] for c in strip),
+    }
+
+
+def moved_one_step(before: tuple[int, int], after: tuple[int, int], direction: str) -> bool:
+    dx, dy = DELTAS.get(direction, (0, 0))
+    return (before[0] + dx, before[1] + dy) == tuple(after)
+
+
+def move_tiles(world, before: tuple[int, int], after: tuple[int, int], direction: str,
+               client_world: str | None, client_version, size: int = VIEWPORT_SIZE) -> dict | None:
+    """
+    Map update for a move from `before` to `after`, relative to the world
+    token / version the client sent: the scrolled-in strip (if the squire
+    moved one step) plus every changed tile in view. Returns None when the
+    client is out of sync and needs the full viewport.
+    """
+    if client_world != world.token or not isinstance(client_version, int):
+        return None
+    version = world.version
+    changed = world.changes_since(client_version)
+    if changed is None:
+        return None
+
+    if moved_one_step(before, after, direction):
+        tiles = edge_tiles(world, after, direction, size)
+    elif tuple(before) == tuple(after):
+        tiles = {"pos": list(after)}
+    else:
+        return None
+
+    x, y = after
+    half = size // 2
+    tiles["cells"] = [
+        [cx, cy, ALPHABET[_world_code(world, (cx, cy))]]
+        for cx, cy in sorted(changed)
+        if abs(cx - x) <= half and abs(cy - y) <= half
+    ]
+    tiles["world"], tiles["version"] = world.token, version
+    return tiles
@@ -0,0 +1,331 @@
+from db import Squire, TravelHistory, MapFeature, SquireQuestStatus, TreasureChest, ChestHint
+from sqlalchemy import select, union_all, literal, case, and_, desc, String, Integer
+from collections import OrderedDict, deque
+
+import logging
+import os
+import threading
+import time
+import uuid
+
+
+# viewport
+def load_viewport_snapshot(db, squire_id: int, quest_id: int, viewport_size: int = 15) -> dict | None:
+    """
+    Loads everything needed to draw the viewport around the squire in a single
+    round trip. The squire's position and active quest status are resolved as
+    scalar subqueries, so every layer can be filtered to the bounding box in SQL.
+
+    Returns a dict with the player position, the viewport bounds and one
+    coordinate collection per layer, or None if the squire does not exist.
+    """
+    half = viewport_size // 2
+
+    sx = select(Squire.x_coordinate).where(Squire.id == squire_id).scalar_subquery()
+    sy = select(Squire.y_coordinate).where(Squire.id == squire_id).scalar_subquery()
+    sqs_id = (
+        select(SquireQuestStatus.id)
+        .where(
+            SquireQuestStatus.squire_id == squire_id,
+            SquireQuestStatus.quest_id == quest_id,
+            SquireQuestStatus.status == 'active'
+        )
+        .order_by(desc(SquireQuestStatus.id))
+        .limit(1)
+        .scalar_subquery()
+    )
+
+    def in_view(x_col, y_col):
+        return and_(
+            x_col.between(sx - half, sx + half),
+            y_col.between(sy - half, sy + half)
+        )
+
+    def layer(name, x_col, y_col, detail=None):
+        return (
+            literal(name, String).label("layer"),
+            x_col.label("x"),
+            y_col.label("y"),
+            (detail if detail is not None else literal("", String)).label("detail")
+        )
+
+    # 1) One SELECT per layer, all bounded by the viewport, glued with UNION ALL
+    stmt = union_all(
+        select(*layer(
+            "player", Squire.x_coordinate, Squire.y_coordinate,
+            case((sqs_id.is_(None), literal("no_quest", String)), else_=literal("active", String))
+        )).where(Squire.id == squire_id),
+        select(*layer(
+            "terrain", MapFeature.x_coordinate, MapFeature.y_coordinate, MapFeature.terrain_type
+        )).where(
+            MapFeature.squire_id == squire_id,
+            in_view(MapFeature.x_coordinate, MapFeature.y_coordinate)
+        ),
+        select(*layer(
+            "chest", TreasureChest.x_coordinate, TreasureChest.y_coordinate,
+            case((TreasureChest.is_opened == True, literal("opened", String)), else_=literal("closed", String))
+        )).where(
+            TreasureChest.squire_quest_id == sqs_id,
+            in_view(TreasureChest.x_coordinate, TreasureChest.y_coordinate)
+        ),
+        select(*layer(
+            "hint", ChestHint.chest_x, ChestHint.chest_y
+        )).where(
+            ChestHint.squire_quest_id == sqs_id,
+            in_view(ChestHint.chest_x, ChestHint.chest_y)
+        ),
+        select(*layer(
+            "visited", TravelHistory.x_coordinate, TravelHistory.y_coordinate
+        )).where(
+            TravelHistory.squire_id == squire_id,
+            in_view(TravelHistory.x_coordinate, TravelHistory.y_coordinate)
+        ),
+    )
+
+    rows = db.execute(stmt).all()
+
+    # 2) Fold the rows back into per-layer collections
+    snapshot = {
+        "position": None,
+        "has_quest": False,
+        "terrain": {},
+        "chests": set(),
+        "opened": set(),
+        "hints": set(),
+        "visited": set(),
+    }
+    for name, x, y, detail in rows:
+        if name == "player":
+            snapshot["position"] = (x, y)
+            snapshot["has_quest"] = detail == "active"
+        elif name == "terrain":
+            snapshot["terrain"][(x, y)] = detail
+        elif name == "chest":
+            snapshot["chests"].add((x, y))
+            if detail == "opened":
+                snapshot["opened"].add((x, y))
+        elif name == "hint":
+            snapshot["hints"].add((x, y))
+        elif name == "visited":
+            snapshot["visited"].add((x, y))
+
+    if snapshot["position"] is None:
+        logging.error(f"load_viewport_snapshot: squire {squire_id} not found")
+        return None
+
+    x, y = snapshot["position"]
+    snapshot["bounds"] = (x - half, x + half, y - half, y + half)
+    return snapshot
+
+
+# ────────────── World-state cache ──────────────
+#
+# Terrain never changes once generate_terrain_features_dynamic has run, and the
+# chest / hint / visited layers only change through a handful of write paths.
+# Those paths update the cached copy in place (write-through), so the map hot
+# path can render the viewport without touching the database. Entries also
+# expire after WORLD_CACHE_TTL seconds so a squire whose requests land on a
+# different gunicorn worker never sees drift for long.
+#
+# Every write-through bumps the state's version and logs the changed tile, so
+# the map client (which holds a token + version) can be sent just the tiles
+# that changed since. A client holding another token, or a version older than
+# the log reaches back, gets the whole viewport instead.
+#
+# The token names one in-memory copy, so it is per gunicorn worker (and per
+# reload after expiry): when a squire's requests alternate between workers,
+# each switch costs a full-viewport resync rather than a diff. That is the
+# same payload the map sent before diffs existed, so it stays correct, just
+# not minimal.
+
+WORLD_CACHE_SIZE = int(os.getenv("WORLD_CACHE_SIZE", "512"))
+WORLD_CACHE_TTL  = float(os.getenv("WORLD_CACHE_TTL", "120"))
+WORLD_CHANGE_LOG = int(os.getenv("WORLD_CHANGE_LOG", "64"))
+
+
+class WorldState:
+    """In-memory copy of one squire's world for one squire_quest."""
+
+    def __init__(self, squire_id: int, squire_quest_id: int):
+        self.squire_id       = squire_id
+        self.squire_quest_id = squire_quest_id
+        self.terrain = {}      # (x, y) -> terrain_type
+        self.chests  = {}      # (x, y) -> (chest_id, riddle_id, is_opened)
+        self.hints   = set()   # {(x, y)}
+        self.visited = set()   # {(x, y)}
+        self.terrain_grid = None   # packed terrain, built by services.pathfinding
+        self.loaded_at = time.monotonic()
+
+        self.token   = uuid.uuid4().hex[:8]   # identifies this copy to the map client
+        self.version = 0
+        self.changes = deque(maxlen=WORLD_CHANGE_LOG)   # (version, (x, y))
+
+    def is_fresh(self) -> bool:
+        return time.monotonic() - self.loaded_at < WORLD_CACHE_TTL
+
+    def touch(self, coord: tuple[int, int]) -> None:
+        """Records that the tile at `coord` changed."""
+        self.version += 1
+        self.changes.append((self.version, coord))
+
+    def changes_since(self, version: int) -> set | None:
+        """Tiles changed after `version`, or None if the log doesn't reach back that far."""
+        oldest = self.changes[0][0] - 1 if len(self.changes) == self.changes.maxlen else 0
+        if not oldest <= version <= self.version:
+            return None
+        return {coord for v, coord in self.changes if v > version}
+
+    def viewport(self, position: tuple[int, int], viewport_size: int = 15) -> dict:
+        """Returns a snapshot shaped like load_viewport_snapshot's, from memory."""
+        x, y = position
+        half = viewport_size // 2
+        x_min, x_max, y_min, y_max = x - half, x + half, y - half, y + half
+
+        # Look up the viewport's tiles rather than scanning the whole world
+        window  = [(cx, cy) for cy in range(y_min, y_max + 1) for cx in range(x_min, x_max + 1)]
+        terrain = {}
+        chests, opened, hints, visited = set(), set(), set(), set()
+        for c in window:
+            terrain_type = self.terrain.get(c)
+            if terrain_type is not None:
+                terrain[c] = terrain_type
+            chest = self.chests.get(c)
+            if chest is not None:
+                chests.add(c)
+                if chest[2]:
+                    opened.add(c)
+            if c in self.hints:
+                hints.add(c)
+            if c in self.visited:
+                visited.add(c)
+
+        return {
+            "position":  (x, y),
+            "has_quest": True,
+            "bounds":    (x_min, x_max, y_min, y_max),
+            "terrain":   terrain,
+            "chests":    chests,
+            "opened":    opened,
+            "hints":     hints,
+            "visited":   visited,
+        }
+
+
+_world_cache = OrderedDict()   # (squire_id, squire_quest_id) -> WorldState
+_world_lock  = threading.Lock()
+
+
+def load_world_state(db, squire_id: int, squire_quest_id: int) -> WorldState:
+    """Reads every layer of the squire's world in one UNION ALL round trip."""
+    def layer(name, x_col, y_col, detail=None, ref=None, ref2=None):
+        return (
+            literal(name, String).label("layer"),
+            x_col.label("x"),
+            y_col.label("y"),
+            (detail if detail is not None else literal("", String)).label("detail"),
+            (ref if ref is not None else literal(None, Integer)).label("ref"),
+            (ref2 if ref2 is not None else literal(None, Integer)).label("ref2"),
+        )
+
+    stmt = union_all(
+        select(*layer(
+            "terrain", MapFeature.x_coordinate, MapFeature.y_coordinate, MapFeature.terrain_type
+        )).where(MapFeature.squire_id == squire_id),
+        select(*layer(
+            "chest", TreasureChest.x_coordinate, TreasureChest.y_coordinate,
+            case((TreasureChest.is_opened == True, literal("opened", String)), else_=literal("closed", String)),
+            TreasureChest.id, TreasureChest.riddle_id
+        )).where(TreasureChest.squire_quest_id == squire_quest_id),
+        select(*layer(
+            "hint", ChestHint.chest_x, ChestHint.chest_y
+        )).where(ChestHint.squire_quest_id == squire_quest_id),
+        select(*layer(
+            "visited", TravelHistory.x_coordinate, TravelHistory.y_coordinate
+        )).where(TravelHistory.squire_id == squire_id),
+    )
+
+    state = WorldState(squire_id, squire_quest_id)
+    for name, x, y, detail, ref, ref2 in db.execute(stmt).all():
+        if name == "terrain":
+            state.terrain[(x, y)] = detail
+        elif name == "chest":
+            state.chests[(x, y)] = (ref, ref2, detail == "opened")
+        elif name == "hint":
+            state.hints.add((x, y))
+        elif name == "visited":
+            state.visited.add((x, y))
+    return state
+
+
+def get_world_state(db, squire_id: int, squire_quest_id: int) -> WorldState:
+    """
+    Returns the cached WorldState for (squire_id, squire_quest_id), loading it
+    on a miss or when the entry has expired. Evicts least-recently-used entries
+    beyond WORLD_CACHE_SIZE.
+    """
+    key = (squire_id, squire_quest_id)
+    with _world_lock:
+        state = _world_cache.get(key)
+        if state is not None and state.is_fresh():
+            _world_cache.move_to_end(key)
+            return state
+
+    state = load_world_state(db, squire_id, squire_quest_id)
+    logging.debug(f"World cache miss for squire={squire_id}, squire_quest={squire_quest_id}")
+
+    with _world_lock:
+        _world_cache[key] = state
+        _world_cache.move_to_end(key)
+        while len(_world_cache) > WORLD_CACHE_SIZE:
+            _world_cache.popitem(last=False)
+    return state
+
+
+def _cached_states(squire_id: int | None = None, squire_quest_id: int | None = None):
+    return [
+        state for (sid, sqid), state in _world_cache.items()
+        if (squire_id is None or sid == squire_id)
+        and (squire_quest_id is None or sqid == squire_quest_id)
+    ]
+
+
+def record_visit(squire_id: int, x: int, y: int) -> None:
+    """Write-through for a new TravelHistory row (history is per squire, not per quest)."""
+    with _world_lock:
+        for state in _cached_states(squire_id=squire_id):
+            if (x, y) not in state.visited:
+                state.visited.add((x, y))
+                state.touch((x, y))
+
+
+def record_hint(squire_quest_id: int, x: int, y: int) -> None:
+    """Write-through for a new ChestHint row."""
+    with _world_lock:
+        for state in _cached_states(squire_quest_id=squire_quest_id):
+            if (x, y) not in state.hints:
+                state.hints.add((x, y))
+                state.touch((x, y))
+
+
+def record_chest_opened(squire_quest_id: int, x: int, y: int) -> None:
+    """Write-through for a TreasureChest flipping to is_opened."""
+    with _world_lock:
+        for state in _cached_states(squire_quest_id=squire_quest_id):
+            chest = state.chests.get((x, y))
+            if chest and not chest[2]:
+                state.chests[(x, y)] = (chest[0], chest[1], True)
+                state.touch((x, y))
+
+
+def invalidate_squire(squire_id: int) -> None:
+    """Drops every cached world for the squire (new terrain, cleared history, new quest)."""
+    with _world_lock:
+        for key in [k for k in _world_cache if k[0] == squire_id]:
+            del _world_cache[key]
+
+
+def invalidate_squire_quest(squire_quest_id: int) -> None:
+    """Drops the cached world for one squire_quest (e.g. after new chests are placed)."""
+    with _world_lock:
+        for key in [k for k in _world_cache if k[1] == squire_quest_id]:
+            del _world_cache[key]
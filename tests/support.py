@@ -0,0 +1,31 @@
+"""
+Shared setup for the tests: a throwaway SQLite database seeded with the
+synthetic world from seed.py. Import this module before db / app so the
+engine is built for SQLite (db.py reads DB_BACKEND at import time).
+
+    python -m unittest discover tests
+"""
+import os
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp(prefix="lawyersquest-tests-")
+os.environ["DB_BACKEND"] = "sqlite"
+os.environ["SQLITE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ.setdefault("OPENAI_APIKEY", "test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+_seeded = False
+
+
+def seeded_db() -> None:
+    """Creates the tables and seeds them once per test run."""
+    global _seeded
+    if _seeded:
+        return
+
+    import db
+    import seed
+
+    db.Base.metadata.create_all(db.engine)
+    seed.seed(num_squires=3)
+    _seeded = True
@@ -0,0 +1,22 @@
+import unittest
+
+from tests import support
+
+support.seeded_db()
+
+from db import engine
+from migrate import HOT_QUERIES, full_scans
+
+
+class HotQueryPlanTest(unittest.TestCase):
+    """Every hot lookup path must be served by an index declared in db.py (see migrate.py)."""
+
+    def test_no_full_table_scans(self):
+        with engine.connect() as conn:
+            for name, stmt in HOT_QUERIES.items():
+                with self.subTest(query=name):
+                    self.assertEqual(full_scans(conn, stmt), [], f"{name} reads a whole table")
+
+
+if __name__ == "__main__":
+    unittest.main()
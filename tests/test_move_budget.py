@@ -0,0 +1,56 @@
+import unittest
+from unittest import mock
+
+from tests import support
+
+support.seeded_db()
+
+from flask import request_finished
+from app import app
+from db import statement_count
+
+
+MOVE_STATEMENT_BUDGET = 4
+
+
+class AjaxMoveBudgetTest(unittest.TestCase):
+    """/ajax_move loads once, steps in memory and commits once: at most 4 statements per move."""
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.client.post("/login", data={"squire_id": "squire1"})
+        self.client.post("/start_quest", json={"quest_id": 1})
+        self.client.get("/map_tiles")   # warm the world cache, as the map page does
+
+        self.counts = []
+        request_finished.connect(self._record, app)
+
+    def tearDown(self):
+        request_finished.disconnect(self._record, app)
+
+    def _record(self, sender, response, **extra):
+        self.counts.append(statement_count())
+
+    def test_plain_moves_stay_within_budget(self):
+        plain_moves = 0
+        # no random encounters: their side trips (NPC hints, redirects) are not part of a plain move
+        with mock.patch("services.movement.roll_encounter", return_value=None):
+            for direction in "EEEEEEEENNNNNNNNWWWWSSSS":
+                self.counts.clear()
+                response = self.client.post("/ajax_move", json={"direction": direction})
+                self.assertEqual(response.status_code, 200, response.get_json())
+                body = response.get_json()
+                if body.get("event") or body.get("redirect"):
+                    continue   # chest, town or landmark: the move ends in another screen
+
+                plain_moves += 1
+                self.assertLessEqual(
+                    self.counts[-1], MOVE_STATEMENT_BUDGET,
+                    f"move {direction} to {body.get('position')} ran {self.counts[-1]} statements"
+                )
+
+        self.assertGreater(plain_moves, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,91 +1,224 @@
-import fitz
-from rapidfuzz import fuzz
-import pymysql
+"""
+Fills in missing question hints with the source page that best matches each question.
+
+    python updatehints.py                    # uses hints.json
+    python updatehints.py --config other.json --workers 4
+    python updatehints.py --dry-run          # show the hints without writing them
+    python updatehints.py --overwrite        # recompute hints that are already set
+
+The config names the PDF directory and, per question kind (true_false,
+multiple_choice), a hint template and the sources to match against. A source
+with "quest_ids" is only used for questions of those quests:
+
+    {"pdf_dir": "static", "top_k": 5,
+     "multiple_choice": {"hint": "See Lecture Transcript for {module} on page {page}",
+                         "sources": [{"pdf": "U1L1Transcript.pdf", "module": "Unit 1 Module 1",
+                                      "quest_ids": [1, 2, 3, 4]}]}}
+
+Each PDF is extracted once and indexed with TF-IDF over its pages. A question
+is scored against the inverted index to find its top_k candidate pages, which
+are reranked with rapidfuzz's token_set_ratio when it is installed. All hints
+are written with one batched UPDATE per table and a single commit.
+"""
+import argparse
+import heapq
+import json
+import logging
+import math
 import os
-from dotenv import load_dotenv
-# Load environment variables at the start of the application
-load_dotenv()
-
-def dbconnect():
-    return pymysql.connect(
-        host=os.getenv('DB_HOST'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        database=os.getenv('DB_NAME'),
-        ssl={"ssl": {}},
-        connect_timeout=10
-    )
-
-def extract_text_by_page(pdf_path):
-    doc = fitz.open(pdf_path)
-    page_text = {}
-    for i in range(len(doc)):
-        text = doc[i].get_text()
-        page_text[i+1] = text
-    return page_text
-
-
-def find_best_hint_page(question_text, page_text):
-    best_score = 0
-    best_page = None
-    for page_num, text in page_text.items():
-        score = fuzz.token_set_ratio(question_text.lower(), text.lower())
-        if score > best_score:
-            best_score = score
-            best_page = page_num
-    return best_page, best_score
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
-try:
-    conn = dbconnect()
-    cursor = conn.cursor()
-    page_text = extract_text_by_page('/users/timfaith/sites/static/MNGT140OER.pdf')
+from sqlalchemy import update
 
-    cursor.execute("SELECT id, question from true_false_questions where hint IS NULL;")
-    questions = cursor.fetchall()
+from db import db_session, TrueFalseQuestion, MultipleChoiceQuestion
 
-    for id, q in questions:
+try:
+    from rapidfuzz import fuzz
+except ImportError:  # optional; candidates then keep their TF-IDF order
+    fuzz = None
 
-        best_page, best_score = find_best_hint_page(q,page_text)
 
-        hint = f"See textbook page {best_page}"
-        cursor.execute(
-            "UPDATE true_false_questions SET hint = %s WHERE id = %s",
-            (hint, id)
-        )
-        conn.commit()
+# kind -> (model, question text column)
+QUESTION_KINDS = {
+    "true_false":      (TrueFalseQuestion, TrueFalseQuestion.question),
+    "multiple_choice": (MultipleChoiceQuestion, MultipleChoiceQuestion.question_text),
+}
 
-    cursor.execute("SELECT id, question_text,quest_id FROM multiple_choice_questions WHERE hint IS NULL;")
-    mcs = cursor.fetchall()
+STOPWORDS = frozenset("""
+    the and for are but not you all any can had her was one our out has have him his how its may new now
+    own say she too use who why with that this from they will would there their what about which when
+    your than then them these been were into more some such only other also does each most must should
+    under over after before between both same very where while
+""".split())
 
-    for id, q, qid in mcs:
-        #based on qid, identify the appropriate lecture transcript from a dictionary
+_TOKEN = re.compile(r"[a-z0-9]+")
 
-        if qid in (1,2,3,4):
-            page_text = extract_text_by_page('/users/timfaith/sites/static/U1L1Transcript.pdf')
-            module = "Unit 1 Module 1"
 
-        if qid in (5,6,7):
-            page_text = extract_text_by_page('/users/timfaith/sites/static/U1L2Transcript.pdf')
-            module = "Unit 1 Module 2"
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) > 2 and t not in STOPWORDS]
 
-        if qid in (8,9):
-            page_text = extract_text_by_page('/users/timfaith/sites/static/U1L3Transcript.pdf')
-            module = "Unit 1 Module 3"
 
-        if qid in (10,12,13):
-            page_text = extract_text_by_page('/users/timfaith/sites/static/U1L4Transcript.pdf')
-            module = "Unit 1 Module 4"
+class PageIndex:
+    """TF-IDF inverted index over the pages of one document."""
 
-        best_page, best_score = find_best_hint_page(q,page_text)
+    def __init__(self, pages: dict[int, str]):
+        self.pages = {n: text.lower() for n, text in pages.items()}
 
+        tfs = {n: Counter(tokenize(text)) for n, text in pages.items()}
+        df = Counter(term for tf in tfs.values() for term in tf)
+        self.idf = {term: math.log((1 + len(pages)) / (1 + d)) + 1 for term, d in df.items()}
 
-        hint = f"See Lecture Transcript for {module} on page {best_page}"
-        cursor.execute(
-            "UPDATE multiple_choice_questions SET hint = %s WHERE id = %s",
-            (hint, id)
-        )
-        conn.commit()
+        # term -> [(page, normalized weight)]
+        self.postings = {}
+        for n, tf in tfs.items():
+            weights = {term: count * self.idf[term] for term, count in tf.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term, w in weights.items():
+                self.postings.setdefault(term, []).append((n, w / norm))
 
+    def candidates(self, text: str, k: int) -> list[tuple[int, float]]:
+        """The k pages with the highest cosine similarity to `text`."""
+        tf = Counter(t for t in tokenize(text) if t in self.idf)
+        weights = {term: count * self.idf[term] for term, count in tf.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+
+        scores = {}
+        for term, qw in weights.items():
+            for page, pw in self.postings[term]:
+                scores[page] = scores.get(page, 0.0) + qw * pw / norm
+        return heapq.nlargest(k, scores.items(), key=lambda ps: ps[1])
 
-except Exception as e:
-    print(f"Oh shit {e}")
+    def best_page(self, text: str, k: int) -> tuple[int | None, float]:
+        """Best matching page and its score (fuzz ratio, or TF-IDF similarity x 100)."""
+        top = self.candidates(text, k)
+        if not top:
+            return None, 0.0
+        if fuzz is None:
+            return top[0][0], round(top[0][1] * 100, 1)
+        q = text.lower()
+        return max(((page, fuzz.token_set_ratio(q, self.pages[page])) for page, _ in top), key=lambda ps: ps[1])
+
+
+# ── ranking, optionally across processes ──
+
+_worker_index = None
+_worker_k     = None
+
+
+def _init_worker(index: PageIndex, k: int) -> None:
+    global _worker_index, _worker_k
+    _worker_index, _worker_k = index, k
+
+
+def _rank(batch: list[tuple[int, str]]) -> list[tuple[int, int | None, float]]:
+    return [(qid, *_worker_index.best_page(text, _worker_k)) for qid, text in batch]
+
+
+def rank(index: PageIndex, questions: list[tuple[int, str]], k: int, workers: int = 1):
+    """(question id, page, score) for every question."""
+    if workers <= 1 or len(questions) < workers * 10:
+        _init_worker(index, k)
+        return _rank(questions)
+
+    size = math.ceil(len(questions) / workers)
+    batches = [questions[i:i + size] for i in range(0, len(questions), size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(index, k)) as pool:
+        return [r for ranked in pool.map(_rank, batches) for r in ranked]
+
+
+# ── sources ──
+
+_indexes = {}
+
+
+def page_index(path: str) -> PageIndex:
+    """Extracts and indexes a PDF once per run."""
+    if path not in _indexes:
+        import fitz
+        with fitz.open(path) as doc:
+            pages = {i + 1: page.get_text() for i, page in enumerate(doc)}
+        _indexes[path] = PageIndex(pages)
+        logging.info(f"Indexed {path}: {len(pages)} pages")
+    return _indexes[path]
+
+
+def plan_hints(db, config: dict, kind: str, workers: int = 1, overwrite: bool = False) -> list[dict]:
+    """[{id, hint}] for the questions of one kind that the config's sources cover."""
+    section = config.get(kind)
+    if not section:
+        return []
+    model, text_column = QUESTION_KINDS[kind]
+
+    # 1) Questions still without a hint
+    query = db.query(model.id, text_column, model.quest_id)
+    if not overwrite:
+        query = query.filter(model.hint.is_(None))
+    rows = query.all()
+
+    # 2) Match each source against the questions it covers
+    updates, assigned = [], set()
+    for source in section["sources"]:
+        quest_ids = source.get("quest_ids")
+        batch = [
+            (qid, text) for qid, text, quest_id in rows
+            if qid not in assigned and text and (quest_ids is None or quest_id in quest_ids)
+        ]
+        if not batch:
+            continue
+
+        path = os.path.join(config.get("pdf_dir", "static"), source["pdf"])
+        if not os.path.exists(path):
+            logging.error(f"PDF file not found: {path}")
+            continue
+
+        for qid, page, score in rank(page_index(path), batch, config.get("top_k", 5), workers):
+            if page is None:
+                continue
+            assigned.add(qid)
+            updates.append({
+                "id":   qid,
+                "hint": section["hint"].format(page=page, module=source.get("module", ""), pdf=source["pdf"])
+            })
+
+    skipped = len(rows) - len(assigned)
+    logging.info(f"{model.__tablename__}: {len(updates)} hints, {skipped} questions without a matching source")
+    return updates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill in question hints from textbook pages.")
+    parser.add_argument("--config", default="hints.json")
+    parser.add_argument("--workers", type=int, default=1, help="processes used to rank questions")
+    parser.add_argument("--dry-run", action="store_true", help="print the hints instead of writing them")
+    parser.add_argument("--overwrite", action="store_true", help="also recompute hints that are already set")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with open(args.config) as f:
+        config = json.load(f)
+    if fuzz is None:
+        logging.warning("rapidfuzz is not installed; ranking by TF-IDF only")
+
+    db = db_session()
+    try:
+        planned = {kind: plan_hints(db, config, kind, args.workers, args.overwrite) for kind in QUESTION_KINDS}
+
+        if args.dry_run:
+            for kind, updates in planned.items():
+                for u in updates:
+                    print(f"{kind} {u['id']}: {u['hint']}")
+        else:
+            # one executemany UPDATE ... WHERE id = ? per table, one commit
+            for kind, updates in planned.items():
+                if updates:
+                    db.execute(update(QUESTION_KINDS[kind][0]), updates)
+            db.commit()
+            print({kind: len(updates) for kind, updates in planned.items()})
+
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
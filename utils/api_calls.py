@@ -1,27 +1,34 @@
 from db import db_session, Squire, TrueFalseQuestion, SquireQuestion, MultipleChoiceQuestion, Team, Quest, TextExtract
 from services.progress import update_squire_progress
+from services.catalogue import get_catalogue
+from utils.http_clients import openai_client
+from utils import textbook_store
+from services.jobs import task
 from sqlalchemy import func
 import random
 import logging
-import fitz
-from openai import OpenAI
 import json
 import os
 import re
 
-client = OpenAI(api_key=os.getenv("OPENAI_APIKEY"))
 
+QUESTION_MODEL = "gpt-4"
 
-def get_textbook_excerpt(quest_id):
+
+def get_textbook_page(quest_id):
+    """
+    Picks a random page from the quest's TextExtract range.
+    Returns (book_name, page_number, text), or None if it can't be read.
+    """
     #need to identify the quest learning objective and identify the appropriate section to send to API for quest generation
 
     # get the appropriate extract from TextExtract
     # and the applicable start and end pages based on the quest
     # randomly select a page from the range to extract to text
-    # read with pdf reader
+    # read it from the pre-extracted page store (utils.textbook_store)
     # return extract
 
-    db = db_session()
+    db = db_session.session_factory()
 
     try:
         te = db.query(TextExtract).filter_by(quest_id=quest_id).one_or_none()
@@ -37,23 +44,11 @@ def get_textbook_excerpt(quest_id):
 
         page_num = random.randint(start, end)
 
-        # 3. Load the PDF from the /static folder
-        pdf_path = os.path.join("static", te.book_name)
-        if not os.path.exists(pdf_path):
-            logging.error(f"PDF file not found: {pdf_path}")
-            return None
-
-        doc = fitz.open(pdf_path)
-
-        if page_num - 1 >= len(doc):
-            logging.error(f"Page {page_num} is out of bounds for file {te.book_name}")
+        # 3. Read the page from the pre-extracted store (built from /static on first use)
+        page = textbook_store.read_page(te.book_name, page_num)
+        if page is None:
             return None
-
-        # 4. Extract the text from the chosen page
-        page = doc[page_num - 1].get_text()  # fitz is zero-indexed
-        doc.close()
-        return page
-
+        return te.book_name, page_num, page
 
     except Exception as e:
         logging.error(f"Error returning text section for extract {e}")
@@ -62,6 +57,12 @@ def get_textbook_excerpt(quest_id):
         db.close()
 
 
+def get_textbook_excerpt(quest_id):
+    page = get_textbook_page(quest_id)
+    return page[2] if page else None
+
+
+@task("generate_openai_question", retries=1, timeout=90)
 def generate_openai_question(quest_id):
 
     excerpt = get_textbook_excerpt(quest_id)
@@ -70,18 +71,19 @@ def generate_openai_question(quest_id):
         logging.error(f"Error returning excerpt from text to send to API.")
         return None
 
+    return question_from_excerpt(quest_id, excerpt)
+
+
+def question_from_excerpt(quest_id, excerpt):
+    """Asks GPT for one multiple choice question about `excerpt`; returns the parsed JSON or None."""
     # Get learning objective from quest
-    db = db_session()
     try:
-
-        lo = db.query(Quest).filter_by(id=quest_id).one_or_none()
+        lo = get_catalogue().quest(quest_id)
         objective = lo.learning_objective if lo else "Unknown Learning Objective"
 
     except Exception as e:
         logging.error(f"Could not retrieve learning objective: {e}")
         objective = "Unknown Objective"
-    finally:
-        db.close()
 
     system_prompt = f"You are an expert instructional designer that is generating items for game play in an educational game."
 
@@ -111,7 +113,7 @@ Excerpt:
     """
 
     try:
-        response = client.chat.completions.create(model="gpt-4",
+        response = openai_client().chat.completions.create(model=QUESTION_MODEL,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
@@ -174,7 +176,7 @@ def generate_npc_response(npc_type, context):
 
     # ✅ Call GPT
     try:
-        response = client.chat.completions.create(
+        response = openai_client().chat.completions.create(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": npc_data["system"]},
@@ -214,6 +216,47 @@ def generate_npc_response(npc_type, context):
     }
 
 
+@task("blacksmith_haggle", retries=1, timeout=60)
+def blacksmith_haggle(context, fallback_offer):
+    """Blacksmith's haggling reply; uses `fallback_offer` when GPT names no counteroffer."""
+    result = generate_npc_response("blacksmith", context)
+    return {
+        "reply":  result["reply_text"],
+        "offer":  result.get("counteroffer") or fallback_offer,
+        "rounds": context["rounds"]
+    }
+
+
+@task("npc_haggle", retries=1, timeout=60)
+def generate_haggle_reply(npc_type, item, offer, base_price):
+    """GPT reply for /negotiate/<npc_type>; raises on API errors so the job is retried."""
+    personality = {
+        "blacksmith": "gruff but fair, values honesty",
+        "trader": "wily, smooth-talking, always looking for a profit"
+    }.get(npc_type, "neutral")
+
+    system_prompt = f"You are a {npc_type}, {personality}. You're haggling over an item in a fantasy town."
+
+    user_prompt = (
+        f"The player offered {offer} gold for '{item}', normally worth {base_price} gold. "
+        "Respond as a clever NPC, and include a number for your counteroffer in the reply. "
+        "Your response should be short, and end with: [Counteroffer: <amount>]"
+    )
+
+    response = openai_client().chat.completions.create(model="gpt-4",
+    messages=[
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ])
+    npc_reply = response.choices[0].message.content
+
+    match = re.search(r"\[Counteroffer:\s*(\d+)", npc_reply)
+    counteroffer = int(match.group(1)) if match else base_price
+    logging.debug(f"NPC reply: {npc_reply} / parsed counteroffer: {counteroffer}")
+
+    return {"npc_reply": npc_reply, "counteroffer": counteroffer}
+
+
 def parse_counteroffer(text):
     """Extracts a numeric counteroffer from GPT response using [Counteroffer: X] pattern."""
     match = re.search(r"\[Counteroffer:\s*(\d+)\]", text)
@@ -0,0 +1,23 @@
+from sendgrid.helpers.mail import Mail
+from services.jobs import task
+from utils.http_clients import sendgrid_client
+
+
+@task("send_verification_email", retries=3, timeout=30)
+def send_verification_email(squire_email, squire_name, token):
+    """Sends the registration confirmation link; raises on failure so the job is retried."""
+    confirm_url = f"https://lawyersquest.proffaith.com/verify?token={token}"
+    message = Mail(
+        from_email='tim@faithatlaw.com',
+        to_emails=squire_email,
+        subject='🛡️ Confirm your registration for Lawyer’s Quest',
+        html_content=f"""
+        <p>Hail, noble {squire_name}!</p>
+        <p>Thank you for registering for <strong>Lawyer’s Quest</strong>.</p>
+        <p>Before you may embark on your legal adventure, you must confirm your email address.</p>
+        <p><a href="{confirm_url}">Click here to verify your account</a></p>
+        <hr>
+        <p>If you did not register for the game, please ignore this message.</p>
+        """
+    )
+    sendgrid_client().send(message)
@@ -0,0 +1,70 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from openai import OpenAI
+from sendgrid import SendGridAPIClient
+
+
+# ────────────── Shared outbound HTTP clients ──────────────
+#
+# One pooled client per third-party service, created lazily and shared by every
+# request in the process, each with explicit timeouts. A slow reCAPTCHA,
+# SendGrid or OpenAI call then costs one thread (or greenlet) for a bounded
+# time, instead of a fresh TLS handshake plus an unbounded wait.
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT    = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_TIMEOUT         = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+OPENAI_TIMEOUT     = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "1"))
+SENDGRID_TIMEOUT   = float(os.getenv("SENDGRID_TIMEOUT", "10"))
+
+_lock     = threading.Lock()
+_session  = None
+_openai   = None
+_sendgrid = None
+
+
+def http_session() -> requests.Session:
+    """Keep-alive requests session; retries only on failed connects (safe for POSTs)."""
+    global _session
+    with _lock:
+        if _session is None:
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "10")),
+                max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def openai_client() -> OpenAI:
+    """Process-wide OpenAI client (its httpx pool is reused across calls)."""
+    global _openai
+    with _lock:
+        if _openai is None:
+            _openai = OpenAI(
+                api_key=os.getenv("OPENAI_APIKEY"),
+                timeout=OPENAI_TIMEOUT,
+                max_retries=OPENAI_MAX_RETRIES
+            )
+        return _openai
+
+
+def sendgrid_client() -> SendGridAPIClient:
+    """SendGrid client with a request timeout (the library default is none)."""
+    global _sendgrid
+    with _lock:
+        if _sendgrid is None:
+            client = SendGridAPIClient(os.environ.get('SENDGRID_API_KEY'))
+            client.client.timeout = SENDGRID_TIMEOUT
+            _sendgrid = client
+        return _sendgrid
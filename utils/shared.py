@@ -9,10 +9,15 @@ from dotenv import load_dotenv
 from db import Squire, Course, Team, engine, db_session, Team, TravelHistory, Quest, SquireQuestion, SquireRiddleProgress, Riddle, Enemy, Inventory, WizardItem, Job, MapFeature, MultipleChoiceQuestion, TrueFalseQuestion, ShopItem, SquireQuestStatus, TeamMessage, TreasureChest, XpThreshold, ChestHint, SquireQuestionAttempt
 from sqlalchemy import or_, func, and_, asc, not_, desc, select
 from sqlalchemy.orm import Session
-from sqlalchemy.dialects.mysql import insert
+from sqlalchemy import insert
 from decimal import Decimal
 
 from services.progress import update_squire_progress
+from services import random_pick, team_channel, leaderboard
+from services.combat_profile import team_rank_bonus
+from services.catalogue import get_catalogue
+from services.capabilities import get_capabilities, RIDDLE_HINT, WORD_LENGTH_HINT, WORD_COUNT_HINT, LEXICON, LEXICONIS
+from services.world import load_viewport_snapshot, get_world_state, record_chest_opened, invalidate_squire, invalidate_squire_quest
 
 # Load environment variables
 load_dotenv()
@@ -33,28 +38,17 @@ def generate_random_coordinates(difficulty):
     else:  # Hard
         return random.randint(-35, 35), random.randint(-35, 35)
 
-def generate_rewards(difficulty,level):
-    """Assigns rewards based on riddle difficulty."""
+def special_item_pools(level):
+    """Returns (medium, hard) special-item name pools for a squire level."""
+    catalogue = get_catalogue()
+    medium_special = [item.item_name for item in catalogue.shop_items_for_level(level, 'gear')]
+    hard_special = [item.item_name for item in catalogue.wizard_items_for_level(level)]
+    return medium_special, hard_special
 
-    db = db_session()
-
-    medium_special = (
-        db.query(ShopItem.item_name)
-        .filter(ShopItem.item_type.ilike('gear'))
-        .filter(ShopItem.min_level <= level)
-        .all()
-    )
-    medium_special = [item[0] for item in medium_special]
-    print("Available medium special items:", medium_special)
+def generate_rewards(difficulty, level, pools=None):
+    """Assigns rewards based on riddle difficulty (pools from special_item_pools)."""
 
-    hard_special = (
-        db.query(WizardItem.item_name)
-        .filter(WizardItem.min_level <= level)
-        .all()
-
-    )
-
-    hard_special = [item[0] for item in hard_special]
+    medium_special, hard_special = pools or special_item_pools(level)
 
     if difficulty == "Easy":
         return random.randint(10, 20), random.randint(5, 15), random.randint(5, 10), None
@@ -90,27 +84,60 @@ def insert_treasure_chests(quest_id: int, squire_quest_id: int, level: int) -> s
               )
               .all()
         )
+        if not riddles:
+            return message
+
+        # 3) Tiles a chest must not land on: terrain, other chests, town and landmarks
+        squire_id = (
+            select(SquireQuestStatus.squire_id)
+            .where(SquireQuestStatus.id == squire_quest_id)
+            .scalar_subquery()
+        )
+        restricted = {
+            (x, y) for x, y in
+            db.query(MapFeature.x_coordinate, MapFeature.y_coordinate)
+              .filter(MapFeature.squire_id == squire_id)
+              .union_all(
+                  db.query(TreasureChest.x_coordinate, TreasureChest.y_coordinate)
+                    .filter(TreasureChest.squire_quest_id == squire_quest_id)
+              )
+        }
+        restricted.update({ (0, 0), (40, 40), (-35, -35), (-25, 50) })
 
-        # 3) Insert chests for each missing riddle
+        # 4) Draw coordinates and rewards for every missing riddle in one pass
+        pools = special_item_pools(level)
+        rows = []
         for riddle_id, difficulty in riddles:
-            x, y = generate_random_coordinates(difficulty)
-            gold, xp, food, special_item = generate_rewards(difficulty, level)
-
-            chest = TreasureChest(
-                x_coordinate     = x,
-                y_coordinate     = y,
-                riddle_id        = riddle_id,
-                gold_reward      = gold,
-                xp_reward        = xp,
-                food_reward      = food,
-                special_item     = special_item,
-                squire_quest_id  = squire_quest_id
-            )
-            db.add(chest)
-
-        if riddles:
-            db.commit()
-            message = "✅ Treasure chests inserted successfully!"
+            for _ in range(50):
+                x, y = generate_random_coordinates(difficulty)
+                if (x, y) not in restricted:
+                    break
+            else:
+                logging.warning(f"No free tile for riddle {riddle_id} ({difficulty}) in squire_quest {squire_quest_id}; skipping its chest")
+                continue
+            restricted.add((x, y))
+
+            gold, xp, food, special_item = generate_rewards(difficulty, level, pools)
+            rows.append({
+                "x_coordinate":    x,
+                "y_coordinate":    y,
+                "riddle_id":       riddle_id,
+                "gold_reward":     gold,
+                "xp_reward":       xp,
+                "food_reward":     food,
+                "special_item":    special_item,
+                "squire_quest_id": squire_quest_id
+            })
+
+        if not rows:
+            return message
+
+        # 5) One executemany INSERT for all of them (Core insert on the table: the ORM
+        #    bulk path would split rows whose special_item is None into separate batches)
+        db.execute(insert(TreasureChest.__table__), rows)
+        db.commit()
+        message = "✅ Treasure chests inserted successfully!"
+        invalidate_squire_quest(squire_quest_id)
         return message
 
     except Exception as e:
@@ -136,123 +163,96 @@ def generate_terrain_features_dynamic(
     max_mountains: int = 45,
 ):
     """
-    ORM-based rewrite of dynamic terrain generation:
+    Dynamic terrain generation:
     - Rivers, forest clusters, and mountain ranges are placed around the map center.
     - Avoids overlapping existing map features and unopened treasure chests.
+    - Keeps a running count per terrain type and writes every new feature
+      with a single executemany INSERT.
     """
     # 1. Fetch squire level
     level = session.query(Squire.level).filter(Squire.id == squire_id).scalar()
     placement_radius = 10 + level * 2
 
-    # 2. Build restricted set of coordinates
-    restricted = set(
-        session.query(MapFeature.x_coordinate, MapFeature.y_coordinate)
+    # 2. Existing features give both the restricted set and the per-type counts
+    restricted = set()
+    counts = {'river': 0, 'forest': 0, 'mountain': 0}
+    for x, y, terrain in (
+        session.query(MapFeature.x_coordinate, MapFeature.y_coordinate, MapFeature.terrain_type)
         .filter(MapFeature.squire_id == squire_id)
-        .all()
-    )
+    ):
+        restricted.add((x, y))
+        counts[terrain] = counts.get(terrain, 0) + 1
+
     treasure_coords = session.query(TreasureChest.x_coordinate, TreasureChest.y_coordinate)\
         .filter(
             TreasureChest.squire_quest_id == squire_quest_id,
             TreasureChest.is_opened == False
         ).all()
-    restricted.update(treasure_coords)
+    restricted.update((x, y) for x, y in treasure_coords)
     restricted.update({ (0, 0), (40, 40), (-35,-35) })
 
-    to_add = []  # collect new MapFeature instances
+    rows = []  # new map_features rows, inserted in one batch
+    added = {'river': 0, 'forest': 0, 'mountain': 0}
+
+    def place(x, y, terrain):
+        if (x, y) in restricted:
+            return
+        rows.append({
+            "x_coordinate": x,
+            "y_coordinate": y,
+            "squire_id": squire_id,
+            "terrain_type": terrain
+        })
+        restricted.add((x, y))
+        added[terrain] += 1
 
     # 3. River
-    river_exists = session.query(MapFeature).filter_by(squire_id=squire_id, terrain_type='river').count()
-    if river_exists == 0:
+    if counts['river'] == 0:
         x = -placement_radius
         y = random.randint(-placement_radius, placement_radius)
         for _ in range(25 + level * 2):
-            if (x, y) not in restricted:
-                to_add.append(MapFeature(
-                    x_coordinate=x,
-                    y_coordinate=y,
-                    squire_id=squire_id,
-                    terrain_type='river'
-                ))
-                restricted.add((x, y))
+            place(x, y, 'river')
             x += 1
             y += random.choice([-1, 0, 1])
 
     # 4. Forest clusters
-    existing_forests = session.query(MapFeature).filter_by(squire_id=squire_id, terrain_type='forest').count()
-    forests_needed = max_forests - existing_forests
+    forests_needed = max_forests - counts['forest']
     clusters = min(num_forest_clusters, forests_needed // cluster_size)
 
-    # Ensure forest near (-35, -35)
-    pinned_cluster_center = (-35, -35)
+    # Ensure forest near (-35, -35) and (40, 40)
     pinned_cluster_size = min(cluster_size, forests_needed)
-    for _ in range(pinned_cluster_size):
-        fx = pinned_cluster_center[0] + random.randint(-2, 2)
-        fy = pinned_cluster_center[1] + random.randint(-2, 2)
-        if (fx, fy) not in restricted:
-            to_add.append(MapFeature(
-                x_coordinate=fx,
-                y_coordinate=fy,
-                squire_id=squire_id,
-                terrain_type='forest'
-            ))
-            restricted.add((fx, fy))
-
-    pinned_cluster_center = (40, 40)
-    pinned_cluster_size = min(cluster_size, forests_needed)
-    for _ in range(pinned_cluster_size):
-        fx = pinned_cluster_center[0] + random.randint(-2, 2)
-        fy = pinned_cluster_center[1] + random.randint(-2, 2)
-        if (fx, fy) not in restricted:
-            to_add.append(MapFeature(
-                x_coordinate=fx,
-                y_coordinate=fy,
-                squire_id=squire_id,
-                terrain_type='forest'
-            ))
-            restricted.add((fx, fy))
+    for pinned_cluster_center in ((-35, -35), (40, 40)):
+        for _ in range(pinned_cluster_size):
+            fx = pinned_cluster_center[0] + random.randint(-2, 2)
+            fy = pinned_cluster_center[1] + random.randint(-2, 2)
+            place(fx, fy, 'forest')
 
     for _ in range(clusters):
         cx = random.randint(-placement_radius, placement_radius)
         cy = random.randint(-placement_radius, placement_radius)
         for _ in range(cluster_size):
-            fx = cx + random.randint(-2, 2)
-            fy = cy + random.randint(-2, 2)
-            if len([f for f in to_add if f.terrain_type=='forest']) >= forests_needed:
+            if added['forest'] >= forests_needed:
                 break
-            if (fx, fy) not in restricted:
-                to_add.append(MapFeature(
-                    x_coordinate=fx,
-                    y_coordinate=fy,
-                    squire_id=squire_id,
-                    terrain_type='forest'
-                ))
-                restricted.add((fx, fy))
+            place(cx + random.randint(-2, 2), cy + random.randint(-2, 2), 'forest')
 
     # 5. Mountain ranges
-    existing_mountains = session.query(MapFeature).filter_by(squire_id=squire_id, terrain_type='mountain').count()
-    mountains_needed = max_mountains - existing_mountains
+    mountains_needed = max_mountains - counts['mountain']
     ranges = min(num_mountain_ranges, mountains_needed // mountain_range_length)
     for _ in range(ranges):
         mx = random.randint(-placement_radius, placement_radius)
         my = random.randint(-placement_radius, placement_radius)
         horizontal = random.choice([True, False])
         for i in range(mountain_range_length):
-            x = mx + (i if horizontal else 0)
-            y = my + (0 if horizontal else i)
-            if len([m for m in to_add if m.terrain_type=='mountain']) >= mountains_needed:
+            if added['mountain'] >= mountains_needed:
                 break
-            if (x, y) not in restricted:
-                to_add.append(MapFeature(
-                    x_coordinate=x,
-                    y_coordinate=y,
-                    squire_id=squire_id,
-                    terrain_type='mountain'
-                ))
-                restricted.add((x, y))
-
-    # 6. Persist all new features in one batch
-    session.add_all(to_add)
+            place(mx + (i if horizontal else 0), my + (0 if horizontal else i), 'mountain')
+
+    # 6. Persist all new features in one executemany INSERT
+    if rows:
+        session.execute(insert(MapFeature), rows)
     session.commit()
+    invalidate_squire(squire_id)
+    logging.debug(f"Terrain for squire {squire_id}: {added}")
 
 
 def generate_river_path(start_x, start_y, length, bendiness=0.6, restricted=set()):
@@ -360,6 +360,7 @@ def add_team_message(team_id: int, message: str) -> TeamMessage:
         db.add(tm)
         db.commit()        # you can also session.flush() if you want bulk commits later
         db.refresh(tm)     # ensure tm.id and created_at are populated
+        team_channel.publish(team_id, team_channel.message_payload(tm))
         return tm
     finally:
         db.close()
@@ -367,119 +368,100 @@ def add_team_message(team_id: int, message: str) -> TeamMessage:
 
 
 
-def get_viewport_map(db, squire_id: int, quest_id: int, viewport_size: int = 15) -> str:
+def get_viewport_map(db, squire_id: int, quest_id: int, viewport_size: int = 15,
+                     squire_quest_id: int | None = None, position: tuple[int, int] | None = None) -> str:
     """
     Builds a little HTML table (15×15 by default) around the player’s position,
     showing visited dots, terrain icons, and the player marker.
+    When the caller knows the squire_quest_id (and ideally the position), the
+    map is drawn from the cached world state instead of the database.
     """
     try:
-        # ———————— find the linking row ————————
-        sqs = (
-            db.query(SquireQuestStatus)
-              .filter_by(squire_id=squire_id, quest_id=quest_id, status='active')
-              .order_by(desc(SquireQuestStatus.id))
-              .first()
-        )
-        if not sqs:
-            return "<p>⚠️ Error: No active quest status found for that player/quest.</p>"
-
-        # now we actually have the PK to filter treasure & hints
-        squire_quest_id = sqs.id
-
-        # 0) All treasure chests for this quest
-        chests = db.query(TreasureChest) \
-                   .filter_by(squire_quest_id=squire_quest_id) \
-                   .all()
-        chest_coords = {(c.x_coordinate, c.y_coordinate): c for c in chests}
-        # Of those, split out which are opened vs. just discovered
-        opened_coords = {coord for coord, c in chest_coords.items() if c.is_opened}
-
-        hints = db.query(ChestHint) \
-                  .filter_by(squire_quest_id=squire_quest_id) \
-                  .all()
-        hint_coords = {(h.chest_x, h.chest_y) for h in hints}
-
-        ICONS = {
-          'player': "📍",
-          'home':   "🏰",
-          'forest': "🌲", 'mountain': "🏔️", 'river': "🌊",
-          'visited': "•",
-          'unseen':  "⬜",
-          # treasure states:
-          'closed_chest': "🎁",
-          'opened_chest': "🗝️",
-          'hint_marker':  "❓",
-        }
-
-
-
-        # 1) All visited coords
-        visited = {
-            (h.x_coordinate, h.y_coordinate)
-            for h in db.query(TravelHistory)
-                       .filter_by(squire_id=squire_id)
-                       .all()
-        }
+        if squire_quest_id:
+            # ———————— cached world: zero reads when warm and position is known ————————
+            if position is None:
+                position = (
+                    db.query(Squire.x_coordinate, Squire.y_coordinate)
+                      .filter(Squire.id == squire_id)
+                      .one()
+                )
+            state = get_world_state(db, squire_id, squire_quest_id)
+            return render_viewport_html(state.viewport(tuple(position), viewport_size))
 
-        # 2) Player pos
-        squire = db.query(Squire).get(squire_id)
-        if not squire:
+        # ———————— one round trip for every layer inside the viewport ————————
+        snapshot = load_viewport_snapshot(db, squire_id, quest_id, viewport_size)
+        if not snapshot:
             return "<p>⚠️ Error: Player position not found.</p>"
-        x, y = squire.x_coordinate, squire.y_coordinate
+        if not snapshot["has_quest"]:
+            return "<p>⚠️ Error: No active quest status found for that player/quest.</p>"
 
-        # 3) All terrain features for this squire
-        features = db.query(MapFeature).filter_by(squire_id=squire_id).all()
-        feature_map = {
-            (f.x_coordinate, f.y_coordinate): f.terrain_type
-            for f in features
-        }
-
-        # 4) Compute bounds
-        half = viewport_size // 2
-        x_min, x_max = x - half, x + half
-        y_min, y_max = y - half, y + half
-
-        # 5) Build HTML
-        out = ['<table class="game-map" style="border-collapse: collapse;">']
-        for ry in range(y_max, y_min - 1, -1):
-            out.append("<tr>")
-            for cx in range(x_min, x_max + 1):
-                if (cx, ry) == (x, y):
-                    char = "📍"
-                elif (cx, ry) == (0, 0):
-                    char = "🏰"
-                elif (cx, ry) == (40, 40):
-                    char = "🧌"
-                elif (cx, ry) == (-35,-35):
-                    char = "🏇"
-                # 3) Already opened chest?
-                elif (cx,ry) in opened_coords:
-                    char = ICONS['opened_chest']
-
-                # 4) Chest you’ve discovered (visited but not yet opened)
-                elif (cx,ry) in chest_coords and (cx,ry) in hint_coords:
-                    char = ICONS['closed_chest']
-                elif (cx, ry) in feature_map:
-                    t = feature_map[(cx, ry)]
-                    char = {"forest":"🌲","mountain":"🏔️","river":"🌊"}.get(t, "⬜")
-                elif (cx, ry) in visited:
-                    char = "•"
-                else:
-                    char = "⬜"
-                out.append(
-                    f'<td style="width:30px;height:30px;text-align:center;'
-                    f'border:1px solid #333">{char}</td>'
-                )
-            out.append("</tr>")
-        out.append("</table>")
-        out.append(
-            """<p>📍=You | •=Visited | 🏰=Home | 🌲=Forest | 🏔️=Mountain | 🌊=River | 🎁 Chest | 🗝️ Solved Chest</p>"""
-        )
-        return "\n".join(out)
+        return render_viewport_html(snapshot)
 
     except Exception as e:
         print(f"viewport map {e}")
 
+def render_viewport_html(snapshot: dict) -> str:
+    """
+    Renders a viewport snapshot (see services.world.load_viewport_snapshot)
+    as the HTML map table.
+    """
+    ICONS = {
+      'player': "📍",
+      'home':   "🏰",
+      'forest': "🌲", 'mountain': "🏔️", 'river': "🌊",
+      'visited': "•",
+      'unseen':  "⬜",
+      # treasure states:
+      'closed_chest': "🎁",
+      'opened_chest': "🗝️",
+      'hint_marker':  "❓",
+    }
+
+    x, y = snapshot["position"]
+    x_min, x_max, y_min, y_max = snapshot["bounds"]
+    feature_map   = snapshot["terrain"]
+    chest_coords  = snapshot["chests"]
+    opened_coords = snapshot["opened"]
+    hint_coords   = snapshot["hints"]
+    visited       = snapshot["visited"]
+
+    out = ['<table class="game-map" style="border-collapse: collapse;">']
+    for ry in range(y_max, y_min - 1, -1):
+        out.append("<tr>")
+        for cx in range(x_min, x_max + 1):
+            if (cx, ry) == (x, y):
+                char = "📍"
+            elif (cx, ry) == (0, 0):
+                char = "🏰"
+            elif (cx, ry) == (40, 40):
+                char = "🧌"
+            elif (cx, ry) == (-35,-35):
+                char = "🏇"
+            # 3) Already opened chest?
+            elif (cx,ry) in opened_coords:
+                char = ICONS['opened_chest']
+
+            # 4) Chest you’ve discovered (visited but not yet opened)
+            elif (cx,ry) in chest_coords and (cx,ry) in hint_coords:
+                char = ICONS['closed_chest']
+            elif (cx, ry) in feature_map:
+                t = feature_map[(cx, ry)]
+                char = {"forest":"🌲","mountain":"🏔️","river":"🌊"}.get(t, "⬜")
+            elif (cx, ry) in visited:
+                char = "•"
+            else:
+                char = "⬜"
+            out.append(
+                f'<td style="width:30px;height:30px;text-align:center;'
+                f'border:1px solid #333">{char}</td>'
+            )
+        out.append("</tr>")
+    out.append("</table>")
+    out.append(
+        """<p>📍=You | •=Visited | 🏰=Home | 🌲=Forest | 🏔️=Mountain | 🌊=River | 🎁 Chest | 🗝️ Solved Chest</p>"""
+    )
+    return "\n".join(out)
+
 def display_travel_map(squire_id: int, quest_id: int) -> str:
     """
     Generates an HTML-based map showing forests, visited locations, and the player,
@@ -565,42 +547,18 @@ def display_travel_map(squire_id: int, quest_id: int) -> str:
 
 # TREASURE! AAAARRRRRRRRRRRRR.
 def ishint(db_session, squire_id):
-    """Returns True if the squire has any item with a name containing 'Scroll' (e.g., hint scrolls)"""
-    return (
-        db_session.query(func.count(Inventory.id))
-        .filter(
-            Inventory.squire_id == squire_id,
-            or_(
-                Inventory.item_name.ilike('%banishment%'),
-                Inventory.item_name.ilike('%decoder%')
-            )
-        )
-        .scalar() > 0
-    )
+    """Returns True if the squire holds a banishment or decoder item (riddle hints)"""
+    return get_capabilities(db_session, squire_id).has(RIDDLE_HINT)
 
 
 def iswordlengthhint(db_session, squire_id):
     """Returns True if the squire can see word length hints"""
-    return (
-        db_session.query(func.count(Inventory.id))
-                  .filter(
-                      Inventory.squire_id == squire_id,
-                      Inventory.item_name == 'four-leaf clover'
-                  )
-                  .scalar() > 0
-    )
+    return get_capabilities(db_session, squire_id).has(WORD_LENGTH_HINT)
 
 
 def iswordcounthint(db_session, squire_id):
     """Returns True if the squire can see word count hints"""
-    return (
-        db_session.query(func.count(Inventory.id))
-                  .filter(
-                      Inventory.squire_id == squire_id,
-                      Inventory.item_name.ilike('%Keys to the Kingdom%')
-                  )
-                  .scalar() > 0
-    )
+    return get_capabilities(db_session, squire_id).has(WORD_COUNT_HINT)
 
 
 def check_for_treasure_at_location(
@@ -707,15 +665,7 @@ def open_treasure_chest(squire_id: int, chest_id: int) -> str:
         print(f"\n📜 Riddle: {riddle.riddle_text}")
 
         # Check for lexiconis hint item
-        magic_count = (
-            db.query(Inventory)
-              .filter(
-                  Inventory.squire_id == squire_id,
-                  Inventory.item_name.ilike("%lexiconis%")
-              )
-              .count()
-        )
-        if magic_count > 0:
+        if get_capabilities(db, squire_id).has(LEXICONIS):
             print(f"💡 Clue: {riddle.word_length_hint} (Number of letters in each word)")
 
         # Prompt for answer
@@ -795,6 +745,7 @@ def open_treasure_chest(squire_id: int, chest_id: int) -> str:
         chest.is_opened = True
 
         db.commit()
+        record_chest_opened(chest.squire_quest_id, chest.x_coordinate, chest.y_coordinate)
         return " ".join(msgs)
 
     except Exception as e:
@@ -824,12 +775,8 @@ def calculate_riddle_reward(squire_id: int, riddle_id: int) -> str:
         logging.debug(f"Calc Riddle Reward: level={level}")
 
         # 2) Pick a random WizardItem up to that level
-        item = (
-            db.query(WizardItem)
-              .filter(WizardItem.min_level <= level)
-              .order_by(func.random())
-              .first()
-        )
+        wizard_items = get_catalogue().wizard_items_for_level(level)
+        item = random.choice(wizard_items) if wizard_items else None
         if not item:
             return "nothing because knowledge is its own reward."
 
@@ -975,17 +922,12 @@ def calculate_hit_chance(squire_id: int, level: int) -> float:
     """
     db = db_session()
     try:
-        # 1) Total T/F questions
-        total_tf = db.query(func.count(TrueFalseQuestion.id)).scalar() or 0
-
-        # 2) Total riddles
-        total_r = db.query(func.count(Riddle.id)).scalar() or 0
-
-        allqs = total_tf + total_r
+        # 1) Total T/F questions and riddles (cached with the catalogue)
+        allqs = get_catalogue().question_bank_size()
         if allqs == 0:
             return 0.0  # no questions means no bonus
 
-        # 3) Distinct correctly answered questions
+        # 2) Distinct correctly answered questions
         correct = (
             db.query(func.count(func.distinct(SquireQuestion.question_id)))
               .filter(
@@ -995,13 +937,13 @@ def calculate_hit_chance(squire_id: int, level: int) -> float:
               .scalar() or 0
         )
 
-        # 4) Compute combat modifier
+        # 3) Compute combat modifier
         combatmod = correct / allqs
 
-        # 5) Base hit chance: 2% per level plus combatmod
+        # 4) Base hit chance: 2% per level plus combatmod
         base_hit = (level * 2) + combatmod
 
-        # 6) Cap at 95%
+        # 5) Cap at 95%
         return min(base_hit, 95.0)
     finally:
         db.close()
@@ -1047,31 +989,11 @@ def combat_mods(squire_id: int, enemy_name: str, level: int) -> int:
         level_mod = 2 * level
 
         # 4) Team rank contribution
-        team_rank_mod = 0
-        team = (
-            db.query(Team)
-              .join(Squire, Team.id == Squire.team_id)
-              .filter(Squire.id == squire_id)
-              .one_or_none()
-        )
-
-        if team:
-            # Get all teams ranked by reputation descending
-            ranked_teams = db.query(Team.id).order_by(Team.reputation.desc()).all()
-            team_ids = [t.id for t in ranked_teams]
-            rank = team_ids.index(team.id) + 1  # 1-based rank
-
-            # Apply tiered bonuses
-            if rank <= 3:
-                team_rank_mod = 5
-            elif rank <= 8:
-                team_rank_mod = 3
-            elif rank <= 18:
-                team_rank_mod = 1
-            else:
-                team_rank_mod = 0
-
-            logging.debug(f"Team {team.id} rank={rank}, bonus={team_rank_mod}")
+        team_id = db.query(Squire.team_id).filter(Squire.id == squire_id).scalar()
+        rank = leaderboard.team_rank(team_id)
+        team_rank_mod = team_rank_bonus(rank)
+        if rank is not None:
+            logging.debug(f"Team {team_id} rank={rank}, bonus={team_rank_mod}")
 
         # Final total mods
         total_mods = base_mod + (enemy_mod * 5) + level_mod + team_rank_mod
@@ -1117,15 +1039,7 @@ def hunger_mods(squire_id: int) -> int:
     """
     db = db_session()
     try:
-        count = (
-            db.query(func.count(Inventory.id))
-              .filter(
-                  Inventory.squire_id == squire_id,
-                  Inventory.item_name == 'gold coin pouch'
-              )
-              .scalar()
-            or 0
-        )
+        count = get_capabilities(db, squire_id).pouches
         logging.debug(f"hunger_mods → squire={squire_id}, count={count}")
         return count
     finally:
@@ -1523,7 +1437,7 @@ def complete_quest(squire_id: int, quest_id: int) -> tuple[bool, list[str]]:
         messages.append("🎉 Congratulations! You have completed this quest!")
 
         # 2) Grant special reward from Quest table
-        quest = db.query(Quest).get(quest_id)
+        quest = get_catalogue().quest(quest_id)
         if quest and quest.reward:
             inv = Inventory(
                 squire_id=squire_id,
@@ -1569,6 +1483,7 @@ def complete_quest(squire_id: int, quest_id: int) -> tuple[bool, list[str]]:
 
         # 6) Commit all changes
         db.commit()
+        invalidate_squire(squire_id)
         return True, messages
 
     except Exception:
@@ -1610,33 +1525,25 @@ def get_random_riddle(quest_id: int, squire_id: int):
         else:
             difficulty = "Hard"
 
-        # 3) Build a subquery of already answered riddle IDs
-        answered_subq = (
-            db.query(SquireRiddleProgress.riddle_id)
-              .filter(SquireRiddleProgress.squire_id == squire_id)
+        # 3) Fetch one random unanswered riddle of that difficulty
+        riddle = random_pick.pick(
+            db, Riddle, ("quest", quest_id, difficulty),
+            Riddle.quest_id == quest_id,
+            Riddle.difficulty == difficulty,
+            exclude=random_pick.solved_riddle_ids(db, squire_id)
         )
 
-        # 4) Fetch one random unanswered riddle of that difficulty
-        riddle = (
-            db.query(
-                Riddle.id,
-                Riddle.riddle_text,
-                Riddle.difficulty,
-                Riddle.answer,
-                Riddle.hint,
-                Riddle.word_length_hint
-            )
-            .filter(
-                Riddle.quest_id == quest_id,
-                Riddle.difficulty == difficulty,
-                ~Riddle.id.in_(answered_subq)
-            )
-            .order_by(func.rand())
-            .first()
-        )
-
-        # 5) Return as dict or None
-        return dict(riddle._asdict()) if riddle else None
+        # 4) Return as dict or None
+        if not riddle:
+            return None
+        return {
+            "id":               riddle.id,
+            "riddle_text":      riddle.riddle_text,
+            "difficulty":       riddle.difficulty,
+            "answer":           riddle.answer,
+            "hint":             riddle.hint,
+            "word_length_hint": riddle.word_length_hint,
+        }
 
     finally:
         db.close()
@@ -1666,15 +1573,7 @@ def encounter_riddle(quest_id: int, squire_id: int) -> str:
         print(f"\n📜 Riddle ({riddle['difficulty']}): {riddle['riddle_text']}")
 
         # 3) Check for 'Lexicon' in inventory to show word-length hint
-        magic_count = (
-            db.query(func.count(Inventory.id))
-              .filter(
-                  Inventory.squire_id == squire_id,
-                  Inventory.item_name.ilike("%Lexicon%")
-              )
-              .scalar() or 0
-        )
-        if magic_count > 0:
+        if get_capabilities(db, squire_id).has(LEXICON):
             print(f"💡 Clue: {riddle['word_length_hint']} (Number of letters in each word)")
 
         # 4) Prompt for answer
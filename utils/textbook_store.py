@@ -0,0 +1,162 @@
+import argparse
+import logging
+import os
+import struct
+import threading
+import zlib
+
+
+# ────────────── Pre-extracted textbook pages ──────────────
+#
+# Opening a multi-megabyte PDF with fitz to pull out one page is the slow part
+# of question generation. Each book in static/ is extracted once into a
+# <book>.pages file under TEXTBOOK_STORE_DIR:
+#
+#   header   magic, page count, source PDF size and mtime
+#   index    page_count + 1 offsets into the data section
+#   data     the zlib-compressed UTF-8 text of every page, back to back
+#
+# Reading a page is then a header read, one index lookup and one compressed
+# blob, with no PDF parsing. A store whose recorded size/mtime no longer match
+# the PDF is stale and gets rebuilt on the next read (or by the CLI):
+#
+#     python -m utils.textbook_store            # every book referenced by TextExtract
+#     python -m utils.textbook_store "140 Module 1.pdf" --force
+
+PDF_DIR            = "static"
+TEXTBOOK_STORE_DIR = os.getenv("TEXTBOOK_STORE_DIR", "textbook_store")
+
+_MAGIC  = b"LQPAGES1"
+_HEADER = struct.Struct("<8sIqd")   # magic, page_count, source size, source mtime
+_OFFSET = struct.Struct("<Q")
+
+_build_lock = threading.Lock()
+
+
+def pdf_path(book_name: str) -> str:
+    return os.path.join(PDF_DIR, book_name)
+
+
+def store_path(book_name: str) -> str:
+    return os.path.join(TEXTBOOK_STORE_DIR, os.path.basename(book_name) + ".pages")
+
+
+def _read_header(f):
+    raw = f.read(_HEADER.size)
+    if len(raw) != _HEADER.size:
+        return None
+    magic, page_count, size, mtime = _HEADER.unpack(raw)
+    return (page_count, size, mtime) if magic == _MAGIC else None
+
+
+def is_fresh(book_name: str) -> bool:
+    """True if the book's store exists and was built from the current PDF."""
+    try:
+        st = os.stat(pdf_path(book_name))
+        with open(store_path(book_name), "rb") as f:
+            header = _read_header(f)
+    except OSError:
+        return False
+    return header is not None and header[1] == st.st_size and header[2] == st.st_mtime
+
+
+def build(book_name: str) -> int:
+    """Extracts every page of the PDF into its store; returns the page count."""
+    import fitz  # only needed when (re)building
+
+    source = pdf_path(book_name)
+    st = os.stat(source)
+
+    with fitz.open(source) as doc:
+        blobs = [zlib.compress(page.get_text().encode("utf-8")) for page in doc]
+
+    offsets = [0]
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+
+    # write to a temp file and swap it in, so readers never see a partial store
+    os.makedirs(TEXTBOOK_STORE_DIR, exist_ok=True)
+    target = store_path(book_name)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(blobs), st.st_size, st.st_mtime))
+        f.write(b"".join(_OFFSET.pack(o) for o in offsets))
+        f.writelines(blobs)
+    os.replace(tmp, target)
+
+    logging.info(f"Built textbook store for {book_name}: {len(blobs)} pages")
+    return len(blobs)
+
+
+def ensure(book_name: str) -> bool:
+    """Builds the book's store if it is missing or stale; False if the PDF can't be read."""
+    if is_fresh(book_name):
+        return True
+    with _build_lock:
+        if is_fresh(book_name):
+            return True
+        if not os.path.exists(pdf_path(book_name)):
+            logging.error(f"PDF file not found: {pdf_path(book_name)}")
+            return False
+        try:
+            build(book_name)
+        except Exception as e:
+            logging.error(f"Could not build textbook store for {book_name}: {e}")
+            return False
+    return True
+
+
+def page_count(book_name: str) -> int | None:
+    if not ensure(book_name):
+        return None
+    with open(store_path(book_name), "rb") as f:
+        header = _read_header(f)
+    return header[0] if header else None
+
+
+def read_page(book_name: str, page_number: int) -> str | None:
+    """Text of a 1-based page, or None if the book or page doesn't exist."""
+    if not ensure(book_name):
+        return None
+
+    with open(store_path(book_name), "rb") as f:
+        header = _read_header(f)
+        if header is None:
+            return None
+        count = header[0]
+        if not 1 <= page_number <= count:
+            logging.error(f"Page {page_number} is out of bounds for file {book_name}")
+            return None
+
+        # 1) The page's slice of the data section
+        f.seek(_HEADER.size + (page_number - 1) * _OFFSET.size)
+        start, end = struct.unpack("<QQ", f.read(2 * _OFFSET.size))
+
+        # 2) Only that page is read and decompressed
+        f.seek(_HEADER.size + (count + 1) * _OFFSET.size + start)
+        return zlib.decompress(f.read(end - start)).decode("utf-8")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the pre-extracted textbook page store.")
+    parser.add_argument("books", nargs="*", help="PDF file names in static/ (default: every TextExtract book)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the store is up to date")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    books = args.books
+    if not books:
+        from db import db_session, TextExtract
+        db = db_session()
+        try:
+            books = sorted({name for (name,) in db.query(TextExtract.book_name).distinct()})
+        finally:
+            db.close()
+
+    for book in books:
+        if not args.force and is_fresh(book):
+            print(f"up to date  {book}")
+        elif os.path.exists(pdf_path(book)):
+            print(f"built       {book} ({build(book)} pages)")
+        else:
+            print(f"missing     {book}")